@@ -35,11 +35,18 @@ def create_app():
     
     from app.routes import auth, food, recommendation, profile, progress
     from app.commands import register_commands
+    from app.benchmarks import register_benchmarks
     
     register_commands(app)
+    register_benchmarks(app)
     app.register_blueprint(auth.bp)
     app.register_blueprint(food.bp)
     app.register_blueprint(recommendation.bp)
     app.register_blueprint(profile.bp)
     app.register_blueprint(progress.bp)
+
+    if app.config.get('ML_MODEL_PRELOAD'):
+        from app.utils.model_registry import model_registry
+        with app.app_context():
+            model_registry.get()
     return app
\ No newline at end of file
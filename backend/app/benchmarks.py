@@ -0,0 +1,668 @@
+import click
+import os
+import random
+import time
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+from app.models.user import User
+from app.models.recommendation import DietGoal, Recommendation
+from app.models.food import Food
+from app.models.progress import DailyNutritionRollup
+from app.utils import food_keywords
+from app.utils.food_catalog import FoodCatalog, get_food_catalog, NUTRIENT_COLUMNS, FLAG_COLUMNS
+from app.utils.food_keywords import KEYWORD_SETS, name_matches
+from app.utils.hybrid_recommender import HybridDietRecommender
+from app.utils.collaborative_filtering import DietCollaborativeFiltering, UserProfileStore
+from app.utils.neighbor_index import NEIGHBOR_BACKENDS
+from app.routes.recommendation import _replace_daily_recommendations
+from app.utils.ml_features import FEATURE_COLUMNS, FeatureMatrixBuilder, encode_food_features
+from app.utils.model_registry import model_registry, SignatureScoreCache
+from app.utils.scoring_batcher import ScoringBatcher
+from app.utils.food_classifier import FoodClassifier
+from app.utils.food_importer import FOOD_SOURCES, read_food_chunks
+from app.utils.decision_tree import NutritionDecisionTree
+from app.utils.preference_index import INDEX_MEDICAL_CONDITIONS
+from app.utils.nutrition_rollup import apply_consumption_change
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import event, func
+
+
+@contextmanager
+def _count_statements():
+    """Hitung statement SQL yang dikirim ke database di dalam blok."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _users_with_active_goals(limit):
+    users = User.query.join(DietGoal).filter(DietGoal.status == 'active').limit(limit).all()
+    pairs = []
+    for user in users:
+        goal = DietGoal.query.filter_by(user_id=user.id, status='active').order_by(DietGoal.created_at.desc()).first()
+        if goal:
+            pairs.append((user, goal))
+    return pairs
+
+
+@click.command('bench-keyword-index')
+@click.option('--users', default=10, help='Jumlah pengguna yang disimulasikan.')
+@with_appcontext
+def bench_keyword_index_command(users):
+    """Bandingkan pemindaian kata kunci per request dengan indeks kata kunci katalog."""
+    catalog = get_food_catalog()
+    names = catalog.names_lower
+    keyword_count = sum(len(keywords) for keywords in KEYWORD_SETS.values())
+    click.echo(f"Katalog: {catalog.size} makanan, {len(KEYWORD_SETS)} set kata kunci ({keyword_count} kata kunci).")
+
+    start = time.perf_counter()
+    FoodCatalog.from_database()
+    click.echo(f"Memuat katalog + indeks kata kunci: {(time.perf_counter() - start) * 1000:.2f} ms (sekali per pemuatan)")
+
+    # Pekerjaan string per request sebelum indeks: setiap scorer memindai setiap nama makanan
+    start = time.perf_counter()
+    for set_name in KEYWORD_SETS:
+        for name in names:
+            name_matches(name, set_name)
+    legacy_ms = (time.perf_counter() - start) * 1000
+    click.echo(f"Pemindaian string per request (tanpa indeks): {catalog.size * keyword_count} pengecekan substring, {legacy_ms:.2f} ms")
+
+    start = time.perf_counter()
+    for set_name in KEYWORD_SETS:
+        catalog.keyword_mask(set_name).sum()
+    click.echo(f"Lookup indeks per request: 0 pengecekan substring, {(time.perf_counter() - start) * 1000:.3f} ms")
+
+    pairs = _users_with_active_goals(users)
+    if not pairs:
+        click.echo("Tidak ada pengguna dengan tujuan aktif, lewati simulasi request.")
+        return
+
+    recommender = HybridDietRecommender()
+    scans_before = food_keywords.string_scan_count
+    start = time.perf_counter()
+    for user, goal in pairs:
+        recommender.get_recommendations(user=user, goal=goal, preferences=[])
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    click.echo(
+        f"Rekomendasi hybrid untuk {len(pairs)} pengguna: {elapsed_ms / len(pairs):.2f} ms/request, "
+        f"pemindaian string = {food_keywords.string_scan_count - scans_before}"
+    )
+    db.session.rollback()
+
+
+@click.command('bench-cf-queries')
+@with_appcontext
+def bench_cf_queries_command():
+    """Pastikan jumlah query collaborative filtering tidak bertambah seiring jumlah user."""
+    user_count = User.query.count()
+    cf = DietCollaborativeFiltering(profile_store=UserProfileStore())
+
+    with _count_statements() as statements:
+        start = time.perf_counter()
+        cf._create_user_profile_matrix()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    matrix_queries = len(statements)
+    click.echo(f"Matriks profil untuk {user_count} user: {matrix_queries} query, {elapsed_ms:.2f} ms")
+
+    sample_user = User.query.first()
+    if not sample_user:
+        click.echo("Tidak ada user, lewati pengecekan request.")
+        return
+    cf.profile_store.ensure_loaded(cf)
+    with _count_statements() as statements:
+        cf.get_recommendations(sample_user.id, n_recommendations=50)
+    request_queries = len(statements)
+    click.echo(f"Rekomendasi CF (matriks sudah dimuat): {request_queries} query")
+
+    # Satu query untuk matriks, satu query IN untuk makanan yang disukai tetangga
+    if matrix_queries > 1 or request_queries > 2:
+        raise click.ClickException('Jumlah query CF bertambah; periksa query per user (N+1).')
+    db.session.rollback()
+
+
+def _synthetic_profiles(count, seed):
+    """Profil user sintetis dengan distribusi yang sama seperti perintah seed-users."""
+    rng = random.Random(seed)
+    cf = DietCollaborativeFiltering(profile_store=UserProfileStore())
+    matrix = np.zeros((count, len(cf._profile_vector(
+        SimpleNamespace(height=170.0, weight=70.0, age=30, activity_level='light'), 'none', 0
+    ))))
+    for idx in range(count):
+        user = SimpleNamespace(
+            age=rng.randint(18, 80),
+            weight=rng.uniform(45.0, 120.0),
+            height=rng.uniform(150.0, 190.0),
+            activity_level=rng.choice(['sedentary', 'light', 'moderate', 'active', 'very_active'])
+        )
+        medical_condition = rng.choice(['none', 'diabetes', 'hypertension', 'obesity'])
+        matrix[idx] = cf._profile_vector(user, medical_condition, 0)
+    return matrix, list(range(1, count + 1))
+
+
+@click.command('bench-cf-neighbors')
+@click.option('--users', default=20000, help='Jumlah user sintetis (distribusi seed-users).')
+@click.option('--from-db', is_flag=True, help='Pakai user di database, bukan user sintetis.')
+@click.option('--queries', default=200, help='Jumlah query tetangga per backend.')
+@click.option('--k', default=5, help='Jumlah tetangga (sama dengan n_neighbors CF).')
+@click.option('--seed', default=42, help='Seed data sintetis dan user yang di-query.')
+@with_appcontext
+def bench_cf_neighbors_command(users, from_db, queries, k, seed):
+    """Bandingkan recall@k dan latensi setiap backend tetangga CF terhadap brute force."""
+    if from_db:
+        matrix, user_ids = DietCollaborativeFiltering(profile_store=UserProfileStore())._create_user_profile_matrix()
+    else:
+        matrix, user_ids = _synthetic_profiles(users, seed)
+    if len(user_ids) < k:
+        click.echo(f"Hanya {len(user_ids)} user, butuh minimal {k}.")
+        return
+    query_ids = random.Random(seed).sample(user_ids, min(queries, len(user_ids)))
+    click.echo(f"{len(user_ids)} user, {len(query_ids)} query, k={k}")
+
+    # Recall berbasis jarak: tetangga dihitung benar jika jaraknya tidak lebih jauh dari
+    # tetangga ke-k yang exact (banyak profil identik, sehingga urutan seri bisa berbeda)
+    unit = UserProfileStore._normalize_rows(matrix)
+    row_of = {user_id: idx for idx, user_id in enumerate(user_ids)}
+
+    def distances_of(user_id, found_ids):
+        query = unit[row_of[user_id]]
+        return 1.0 - unit[[row_of[i] for i in found_ids]] @ query
+
+    exact = None
+    for backend in NEIGHBOR_BACKENDS:
+        store = UserProfileStore(backend=backend)
+        start = time.perf_counter()
+        store._set_matrix(matrix, user_ids)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        latencies = []
+        results = []
+        for user_id in query_ids:
+            start = time.perf_counter()
+            results.append(store.nearest_users(user_id, k))
+            latencies.append((time.perf_counter() - start) * 1000)
+        if exact is None:
+            exact = results  # backend pertama (brute) menjadi acuan recall
+        recall = np.mean([
+            np.sum(distances_of(user_id, found) <= distances_of(user_id, truth).max() + 1e-12) / len(truth)
+            for user_id, found, truth in zip(query_ids, results, exact)
+        ])
+        click.echo(
+            f"{backend:>10}: build {build_ms:8.2f} ms | query rata-rata {np.mean(latencies):7.3f} ms, "
+            f"p95 {np.percentile(latencies, 95):7.3f} ms | recall@{k} {recall:.3f}"
+        )
+
+
+def _synthetic_catalog(size, seed):
+    """Katalog makanan sintetis berukuran bebas (tanpa database)."""
+    rng = random.Random(seed)
+    rows = []
+    for food_id in range(1, size + 1):
+        row = {'id': food_id, 'food_code': f'SYN{food_id:06d}', 'name': f'makanan sintetis {food_id}'}
+        row.update({col: rng.uniform(0, 500) for col in NUTRIENT_COLUMNS})
+        row.update({'food_status': 'Olahan', 'food_group': 'Serealia', 'meal_type': 'Makan Siang'})
+        row.update({col: rng.random() < 0.5 for col in FLAG_COLUMNS})
+        rows.append(row)
+    return FoodCatalog(rows)
+
+
+@click.command('bench-hybrid-merge')
+@click.option('--sizes', default='10000,100000', help='Ukuran katalog sintetis, dipisah koma.')
+@click.option('--cf', 'cf_count', default=700, help='Jumlah hasil CF yang digabung.')
+@click.option('--legacy-sample', default=200, help='Jumlah lookup linear yang diukur untuk ekstrapolasi cara lama.')
+@click.option('--seed', default=42, help='Seed data sintetis.')
+@with_appcontext
+def bench_hybrid_merge_command(sizes, cf_count, legacy_sample, seed):
+    """Ukur biaya penggabungan skor nutrisi + CF di HybridDietRecommender per ukuran katalog."""
+    recommender = HybridDietRecommender()
+    for size in [int(value) for value in sizes.split(',') if value.strip()]:
+        catalog = _synthetic_catalog(size, seed)
+        rng = np.random.default_rng(seed)
+        candidate_positions = catalog.select(['caloric_value'])
+        eligible = np.zeros(catalog.size, dtype=bool)
+        eligible[candidate_positions] = True
+        nutrition_positions = rng.permutation(candidate_positions)
+        nutrition_scores = np.sort(rng.random(len(nutrition_positions)))[::-1]
+        cf_food_ids = rng.choice(catalog.ids, size=min(cf_count, size), replace=False).tolist()
+        cf_scores = rng.random(len(cf_food_ids)).tolist()
+
+        start = time.perf_counter()
+        food_scores = recommender.merge_candidates(
+            catalog, eligible, nutrition_positions, nutrition_scores, cf_food_ids, cf_scores
+        )
+        merge_ms = (time.perf_counter() - start) * 1000
+
+        # Cara lama: next(...) linear atas daftar makanan untuk setiap hasil
+        filtered_foods = catalog.foods_at(candidate_positions)
+        sample_ids = catalog.ids[nutrition_positions[:legacy_sample]].tolist()
+        start = time.perf_counter()
+        for food_id in sample_ids:
+            next((f for f in filtered_foods if f.id == food_id), None)
+        per_lookup_ms = (time.perf_counter() - start) * 1000 / max(1, len(sample_ids))
+        legacy_ms = per_lookup_ms * (len(nutrition_positions) + len(cf_food_ids))
+
+        click.echo(
+            f"{size:>7} makanan: merge {merge_ms:9.2f} ms ({merge_ms * 1e6 / len(food_scores):.0f} ns/kandidat) | "
+            f"lookup linear ~{legacy_ms:12.2f} ms (ekstrapolasi dari {len(sample_ids)} lookup)"
+        )
+
+
+@click.command('bench-menu-writes')
+@click.option('--items', default=40, help='Jumlah rekomendasi per menu harian.')
+@with_appcontext
+def bench_menu_writes_command(items):
+    """Hitung round-trip database untuk menyimpan satu menu harian (tanpa commit)."""
+    user = User.query.first()
+    catalog = get_food_catalog()
+    if not user or not catalog.size:
+        click.echo("Butuh minimal satu user dan satu makanan.")
+        return
+    today = date.today()
+    rows = [
+        {'user_id': user.id, 'food_id': int(food_id), 'score': 0.5,
+         'recommendation_date': today, 'meal_type': 'Makan Siang'}
+        for food_id in catalog.ids[:items].tolist()
+    ]
+
+    # Cara lama: add + flush per baris untuk mendapatkan id
+    with _count_statements() as statements:
+        start = time.perf_counter()
+        Recommendation.query.filter_by(user_id=user.id, recommendation_date=today).delete()
+        for row in rows:
+            db.session.add(Recommendation(**row))
+            db.session.flush()
+        legacy_ms = (time.perf_counter() - start) * 1000
+    legacy_count = len(statements)
+    db.session.rollback()
+
+    # Makanan yang sudah dikonsumsi dikeluarkan dari rollup: satu UPDATE per hari konsumsi + satu DELETE
+    consumed_days = db.session.query(func.count(func.distinct(Recommendation.consumed_date))).filter(
+        Recommendation.user_id == user.id, Recommendation.recommendation_date == today
+    ).scalar()
+    rollup_statements = consumed_days + 1 if consumed_days else 0
+
+    with _count_statements() as statements:
+        start = time.perf_counter()
+        _, new_ids = _replace_daily_recommendations(rows[0]['user_id'], today, rows)
+        bulk_ms = (time.perf_counter() - start) * 1000
+    bulk_count = len(statements)
+    db.session.rollback()
+
+    click.echo(f"Per baris + flush: {legacy_count} statement, {legacy_ms:.2f} ms")
+    click.echo(f"Insert massal    : {bulk_count} statement, {bulk_ms:.2f} ms ({len(new_ids)} id)")
+    # Cek rating lama, agregat konsumsi untuk rollup, DELETE, INSERT multi-baris, SELECT id
+    if bulk_count > 5 + rollup_statements or len(new_ids) != len(rows):
+        raise click.ClickException('Penyimpanan menu harian tidak lagi memakai insert massal.')
+
+
+@click.command('bench-ml-features')
+@click.option('--users', default=10, help='Jumlah pengguna yang disimulasikan.')
+@with_appcontext
+def bench_ml_features_command(users):
+    """Ukur waktu penyusunan matriks fitur prediksi MLDecisionTreeRecommender per request."""
+    catalog = get_food_catalog()
+    positions = catalog.select(['caloric_value', 'protein', 'carbohydrates', 'fat'])
+    builder = FeatureMatrixBuilder(FEATURE_COLUMNS)
+
+    start = time.perf_counter()
+    encode_food_features(catalog)
+    click.echo(f"Encode fitur {catalog.size} makanan: {(time.perf_counter() - start) * 1000:.2f} ms (sekali per versi katalog)")
+
+    pairs = _users_with_active_goals(users)
+    if not pairs:
+        click.echo("Tidak ada pengguna dengan tujuan aktif.")
+        return
+    builder.build(pairs[0][0], pairs[0][1], [], catalog, positions)  # Isi cache matriks makanan
+
+    start = time.perf_counter()
+    for user, goal in pairs:
+        features = builder.build(user, goal, ['halal'], catalog, positions)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(pairs)
+    click.echo(
+        f"Matriks prediksi {features.shape[0]}x{features.shape[1]} ({features.dtype}, "
+        f"contiguous={features.flags['C_CONTIGUOUS']}): {elapsed_ms:.3f} ms/request"
+    )
+    db.session.rollback()
+
+
+@click.command('bench-ml-signature-cache')
+@click.option('--model', 'model_source', default=None, help='Direktori/file model (default: dataset-diet).')
+@click.option('--users', default=200, help='Jumlah pengguna yang disimulasikan.')
+@with_appcontext
+def bench_ml_signature_cache_command(model_source, users):
+    """Bandingkan skor ML tanpa cache dengan cache per path signature user."""
+    loaded = model_registry.get(model_source)
+    if loaded is None or loaded.tree is None:
+        click.echo("Model decision tree tidak tersedia.")
+        return
+    pairs = _users_with_active_goals(users)
+    if not pairs:
+        click.echo("Tidak ada pengguna dengan tujuan aktif.")
+        return
+
+    catalog = get_food_catalog()
+    positions = catalog.select(['caloric_value', 'protein', 'carbohydrates', 'fat'])
+    builder = loaded.feature_builder
+    cache = SignatureScoreCache(loaded.tree, builder, max_entries=len(pairs))
+    user_vectors = [builder.user_vector(user, goal, ['halal']) for user, goal in pairs]
+    builder.build_for_user_vector(user_vectors[0], catalog, positions)  # Isi cache matriks makanan
+
+    start = time.perf_counter()
+    direct = [loaded.tree.predict_positive(builder.build_for_user_vector(v, catalog, positions)) for v in user_vectors]
+    direct_ms = (time.perf_counter() - start) * 1000 / len(pairs)
+
+    start = time.perf_counter()
+    cached = [cache.probabilities(v, catalog, positions) for v in user_vectors]
+    cached_ms = (time.perf_counter() - start) * 1000 / len(pairs)
+
+    start = time.perf_counter()
+    for v in user_vectors:
+        cache.probabilities(v, catalog, positions)
+    warm_ms = (time.perf_counter() - start) * 1000 / len(pairs)
+
+    identical = all(np.array_equal(a, b) for a, b in zip(direct, cached))
+    click.echo(f"{len(pairs)} user, {len(positions)} makanan, {len(cache._node_features)} node split pada fitur user")
+    click.echo(f"Signature unik: {cache.misses} (hit rate putaran pertama {1 - cache.misses / len(pairs):.1%})")
+    click.echo(f"Tanpa cache: {direct_ms:.3f} ms/request")
+    click.echo(f"Cache (putaran pertama): {cached_ms:.3f} ms/request")
+    click.echo(f"Cache (hangat): {warm_ms:.3f} ms/request")
+    click.echo(f"Skor identik: {identical}")
+    db.session.rollback()
+
+
+@click.command('bench-ml-batching')
+@click.option('--model', 'model_source', default=None, help='Direktori/file model (default: dataset-diet).')
+@click.option('--requests', 'n_requests', default=512, help='Jumlah request scoring (user unik, tanpa cache signature).')
+@click.option('--threads', default=64, help='Jumlah request yang berjalan bersamaan.')
+@click.option('--batch-size', default=None, type=int, help='Ukuran batch maksimum (default: ML_BATCH_MAX_SIZE).')
+@click.option('--max-wait-ms', default=None, type=float, help='Waktu tunggu batch maksimum (default: ML_BATCH_MAX_WAIT_MS).')
+@click.option('--idle-rounds', default=50, help='Jumlah request yang datang tepat setelah idle timeout worker.')
+@click.option('--seed', default=42, help='Seed variasi fitur user.')
+@with_appcontext
+def bench_ml_batching_command(model_source, n_requests, threads, batch_size, max_wait_ms, idle_rounds, seed):
+    """
+    Throughput scoring ML per request dibandingkan micro-batching antar request, dan request
+    yang datang saat worker berhenti karena idle (harus dilayani worker baru, bukan fallback).
+    """
+    loaded = model_registry.get(model_source)
+    if loaded is None or loaded.tree is None:
+        click.echo("Model decision tree tidak tersedia.")
+        return
+    pairs = _users_with_active_goals(20)
+    if not pairs:
+        click.echo("Tidak ada pengguna dengan tujuan aktif.")
+        return
+
+    config = current_app.config
+    batch_size = batch_size or config.get('ML_BATCH_MAX_SIZE', 32)
+    max_wait_ms = config.get('ML_BATCH_MAX_WAIT_MS', 2.0) if max_wait_ms is None else max_wait_ms
+    catalog = get_food_catalog()
+    builder = loaded.feature_builder
+    positions = np.arange(catalog.size)
+
+    # User unik: variasi umur/berat/tinggi dari user di database
+    rng = np.random.default_rng(seed)
+    numeric = np.array([i for i, col in enumerate(builder.user_columns) if col in ('user_age', 'user_weight', 'user_height')])
+    base_vectors = [builder.user_vector(user, goal, ['halal']) for user, goal in pairs]
+    user_vectors = []
+    for i in range(n_requests):
+        vector = base_vectors[i % len(base_vectors)].copy()
+        vector[numeric] *= rng.uniform(0.8, 1.2, len(numeric)).astype(np.float32)
+        user_vectors.append(vector)
+    builder.build_for_user_vector(user_vectors[0], catalog, positions)  # Isi cache matriks makanan
+
+    def per_request(vector):
+        return loaded.tree.predict_positive(builder.build_for_user_vector(vector, catalog, positions))
+
+    batcher = ScoringBatcher(loaded.tree, builder, max_size=batch_size, max_wait_ms=max_wait_ms)
+
+    def batched(item):
+        i, vector = item
+        with batcher.active():
+            return batcher.score(i.to_bytes(4, 'little'), vector, catalog)
+
+    results = {}
+    for label, fn, items in (
+        ('Per request', per_request, user_vectors),
+        (f'Micro-batch (maks {batch_size}, tunggu {max_wait_ms:g} ms)', batched, list(enumerate(user_vectors)))
+    ):
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            start = time.perf_counter()
+            results[label] = list(pool.map(fn, items))
+            elapsed = time.perf_counter() - start
+        click.echo(f"{label}: {n_requests / elapsed:,.0f} request/detik ({elapsed * 1000:.1f} ms total)")
+
+    direct, batch_scores = results.values()
+    identical = all(np.array_equal(a, b) for a, b in zip(direct, batch_scores))
+    click.echo(f"{batcher.batches} batch, rata-rata {batcher.requests / max(batcher.batches, 1):.1f} request/batch")
+    click.echo(f"Skor identik: {identical}")
+
+    # Request berikutnya datang di sekitar idle timeout, saat worker sedang memutuskan berhenti
+    idle_batcher = ScoringBatcher(
+        loaded.tree, builder, max_size=batch_size, max_wait_ms=max_wait_ms, idle_seconds=0.02
+    )
+    idle_mismatches = 0
+    for _ in range(idle_rounds):
+        time.sleep(idle_batcher.idle_seconds * rng.uniform(0.9, 1.2))
+        with idle_batcher.active():
+            scores = idle_batcher.score(b'idle', user_vectors[0], catalog)
+        idle_mismatches += not np.array_equal(scores, direct[0])
+    click.echo(
+        f"Setelah idle timeout: {idle_rounds} request, {idle_batcher.fallbacks} fallback "
+        f"(timeout {idle_batcher.timeout * 1000:g} ms), {idle_mismatches} skor berbeda"
+    )
+    db.session.rollback()
+    if idle_batcher.fallbacks or idle_mismatches:
+        raise click.ClickException("Request setelah idle timeout tidak dilayani oleh worker batcher.")
+
+
+@click.command('bench-food-classifier')
+@click.option('--names', 'count', default=100000, help='Jumlah nama makanan sintetis.')
+@click.option('--source-dir', default=None, help='Direktori dataset bawaan untuk cek paritas (default: app/dataset-diet).')
+@click.option('--seed', default=42, help='Seed data sintetis.')
+@with_appcontext
+def bench_food_classifier_command(count, source_dir, seed):
+    """
+    Waktu klasifikasi FoodClassifier untuk nama makanan sintetis, dan paritas automaton dengan
+    pencarian substring biasa untuk setiap set kata kunci pada nama di dataset bawaan dan sintetis.
+    """
+    start = time.perf_counter()
+    classifier = FoodClassifier()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Nama sintetis: gabungan kata dari nama di katalog dan daftar kata kunci classifier
+    rng = random.Random(seed)
+    catalog_words = [word for name in get_food_catalog().names_lower for word in name.split()]
+    words = catalog_words + classifier.vegetarian_keywords + classifier.strict_non_veg_identifiers + classifier.soy_keywords
+    groups = ['Sayur', 'Buah', 'Kacang', 'Daging', 'Ikan dsb', 'Susu', 'Telur', 'Serealia', None]
+    foods = [
+        (' '.join(rng.choice(words) for _ in range(rng.randint(1, 5))), rng.choice(groups))
+        for _ in range(count)
+    ]
+
+    start = time.perf_counter()
+    vegetarian = sum(classifier.classify_name(name, group)['is_vegetarian'] for name, group in foods)
+    elapsed = time.perf_counter() - start
+    click.echo(f"Automaton dibangun dalam {build_ms:.1f} ms")
+    click.echo(
+        f"{count} nama diklasifikasi dalam {elapsed:.2f} s ({elapsed / count * 1e6:.1f} µs/nama), "
+        f"{vegetarian} vegetarian"
+    )
+    db.session.rollback()
+
+    # Paritas: setiap bit hasil scan() harus sama dengan any(kw in name for kw in set)
+    source_dir = source_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset-diet')
+    names = []
+    for source in FOOD_SOURCES:
+        file_path = os.path.join(source_dir, source.filename)
+        if not os.path.exists(file_path):
+            click.echo(f"Dataset {source.filename} tidak ditemukan di {source_dir}, dilewati")
+            continue
+        names += [name for chunk in read_food_chunks(file_path, source) for name in chunk['name'].dropna()]
+    bundled = len(names)
+    names += [name for name, _ in foods]
+
+    keyword_sets = classifier._keyword_sets()
+    bits = classifier._matcher.bits
+    mismatches = []
+    for name in names:
+        name_lower = name.lower()
+        found = classifier._matcher.scan(name_lower)
+        for set_name, keywords in keyword_sets.items():
+            if bool(found & bits[set_name]) != any(keyword in name_lower for keyword in keywords):
+                mismatches.append((name, set_name))
+    click.echo(f"Paritas: {bundled} nama dataset bawaan + {count} sintetis x {len(keyword_sets)} set kata kunci")
+    if mismatches:
+        raise click.ClickException(
+            f"{len(mismatches)} hasil automaton berbeda dengan pencarian substring (nama, set): {mismatches[:10]}"
+        )
+    click.echo("Paritas: OK (setiap set kata kunci identik dengan pencarian substring)")
+
+
+@click.command('bench-nutrition-scoring')
+@click.option('--users', default=20, help='Jumlah user dengan goal aktif yang diuji.')
+@with_appcontext
+def bench_nutrition_scoring_command(users):
+    """
+    Paritas dan waktu skor nutrisi: score_positions (NumPy) vs _score_foods_scalar untuk
+    setiap user x kondisi medis. Id, urutan dan skor harus identik persis.
+    """
+    pairs = _users_with_active_goals(users)
+    catalog = get_food_catalog()
+    if not pairs or not catalog.size:
+        click.echo("Butuh minimal satu user dengan goal aktif dan satu makanan.")
+        return
+    recommender = NutritionDecisionTree()
+    positions = catalog.select(['caloric_value', 'protein', 'carbohydrates', 'fat'])
+    foods = catalog.foods_at(positions)
+    scalar_time = vector_time = 0.0
+    mismatches = []
+    for user, goal in pairs:
+        for medical_condition in INDEX_MEDICAL_CONDITIONS:
+            condition_goal = SimpleNamespace(target_weight=goal.target_weight, medical_condition=medical_condition)
+            needs = recommender._calculate_nutritional_needs(user, condition_goal)
+
+            start = time.perf_counter()
+            scalar = recommender._score_foods_scalar(foods, needs)
+            scalar_time += time.perf_counter() - start
+            start = time.perf_counter()
+            vector_positions, vector_scores = recommender.score_positions(catalog, positions, needs)
+            vector_time += time.perf_counter() - start
+
+            scalar_pairs = [(rec['food_id'], rec['nutrition_score']) for rec in scalar]
+            vector_pairs = list(zip(catalog.ids[vector_positions].tolist(), vector_scores.tolist()))
+            ranked = [
+                [(rec['food_id'], rec['nutrition_score']) for rec in recommender.get_nutrition_recommendations(
+                    user, condition_goal, n_recommendations=len(positions), vectorized=vectorized
+                )]
+                for vectorized in (False, True)
+            ]
+            if scalar_pairs != vector_pairs or ranked[0] != ranked[1]:
+                mismatches.append((user.id, medical_condition))
+
+    cases = len(pairs) * len(INDEX_MEDICAL_CONDITIONS)
+    click.echo(f"{cases} kasus ({len(pairs)} user x {len(INDEX_MEDICAL_CONDITIONS)} kondisi), {len(positions)} makanan per kasus")
+    click.echo(f"Skalar : {scalar_time / cases * 1000:.2f} ms/kasus")
+    click.echo(f"NumPy  : {vector_time / cases * 1000:.2f} ms/kasus ({scalar_time / max(vector_time, 1e-9):.1f}x)")
+    if mismatches:
+        raise click.ClickException(
+            f"{len(mismatches)} kasus berbeda antara score_positions dan _score_foods_scalar (user, kondisi): {mismatches[:10]}"
+        )
+    click.echo("Paritas: OK (id, urutan dan skor identik)")
+
+
+@click.command('bench-progress-rollup')
+@click.option('--user-id', default=None, type=int, help='User yang diukur. Default: user dengan hari konsumsi terbanyak')
+@click.option('--repeats', default=20, help='Jumlah pengulangan per ukuran rentang.')
+@with_appcontext
+def bench_progress_rollup_command(user_id, repeats):
+    """Bandingkan agregasi Recommendation x Food dengan pembacaan rollup harian untuk /progress."""
+    if user_id is None:
+        user_id = db.session.query(DailyNutritionRollup.user_id).group_by(DailyNutritionRollup.user_id)\
+            .order_by(func.count().desc()).limit(1).scalar()
+    if user_id is None:
+        click.echo("Rollup kosong; jalankan backfill-nutrition-rollup atau beri feedback konsumsi terlebih dahulu.")
+        return
+    end_date = date.today()
+
+    def from_recommendations(start_date):
+        return dict(db.session.query(Recommendation.consumed_date, func.sum(Food.caloric_value)).join(
+            Food, Recommendation.food_id == Food.id
+        ).filter(
+            Recommendation.user_id == user_id,
+            Recommendation.consumed_date >= start_date,
+            Recommendation.consumed_date <= end_date
+        ).group_by(Recommendation.consumed_date).all())
+
+    def from_rollup(start_date):
+        return dict(db.session.query(DailyNutritionRollup.date, DailyNutritionRollup.kcal).filter(
+            DailyNutritionRollup.user_id == user_id,
+            DailyNutritionRollup.date >= start_date,
+            DailyNutritionRollup.date <= end_date
+        ).all())
+
+    click.echo(f"User {user_id}")
+    for days in (7, 30, 365, 3 * 365):
+        start_date = end_date - timedelta(days=days - 1)
+        timings = {}
+        for name, read in (('agregasi', from_recommendations), ('rollup', from_rollup)):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                result = read(start_date)
+            timings[name] = ((time.perf_counter() - start) / repeats * 1000, result)
+        expected, actual = timings['agregasi'][1], timings['rollup'][1]
+        click.echo(
+            f"{days:5d} hari: agregasi {timings['agregasi'][0]:.2f} ms, rollup {timings['rollup'][0]:.2f} ms "
+            f"({len(actual)} baris rollup)"
+        )
+        if _rollup_drift(expected, actual):
+            raise click.ClickException('Rollup berbeda dengan agregasi rekomendasi; jalankan backfill-nutrition-rollup.')
+
+    # Menu harian dibuat ulang setelah makanan dikonsumsi: rekomendasi hari itu dihapus dan
+    # rollup harus ikut berkurang (dalam transaksi yang di-rollback)
+    recommendation = Recommendation.query.filter_by(user_id=user_id)\
+        .order_by(Recommendation.consumed_date.is_(None), Recommendation.id.desc()).first()
+    if recommendation is None:
+        db.session.rollback()
+        return
+    if recommendation.consumed_date is None:
+        recommendation.is_consumed = True
+        recommendation.feedback_date = datetime.utcnow()
+        recommendation.sync_consumed_date()
+        apply_consumption_change(recommendation, None)
+    _replace_daily_recommendations(user_id, recommendation.recommendation_date, [])
+    start_date = date(1970, 1, 1)
+    expected, actual = from_recommendations(start_date), from_rollup(start_date)
+    db.session.rollback()
+    click.echo(f"Menu {recommendation.recommendation_date} dibuat ulang: {len(actual)} baris rollup")
+    if _rollup_drift(expected, actual):
+        raise click.ClickException('Rollup tidak diperbarui saat menu harian dibuat ulang.')
+
+
+def _rollup_drift(expected, actual):
+    """True jika kalori per hari dari rollup berbeda dengan agregasi rekomendasi."""
+    return set(expected) != set(actual) or any(abs((expected[day] or 0) - actual[day]) > 1e-6 for day in expected)
+
+def register_benchmarks(app):
+    app.cli.add_command(bench_keyword_index_command)
+    app.cli.add_command(bench_cf_queries_command)
+    app.cli.add_command(bench_cf_neighbors_command)
+    app.cli.add_command(bench_hybrid_merge_command)
+    app.cli.add_command(bench_menu_writes_command)
+    app.cli.add_command(bench_ml_features_command)
+    app.cli.add_command(bench_ml_signature_cache_command)
+    app.cli.add_command(bench_ml_batching_command)
+    app.cli.add_command(bench_food_classifier_command)
+    app.cli.add_command(bench_progress_rollup_command)
+    app.cli.add_command(bench_nutrition_scoring_command)
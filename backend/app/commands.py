@@ -5,17 +5,24 @@ from app.models.user import User # Pastikan User diimpor jika seed_users_command
 from app.models.recommendation import DietGoal, Recommendation # Pastikan DietGoal dan Recommendation diimpor
 from datetime import datetime, timedelta
 import random
+import time
 from sqlalchemy import func
-import csv
 import os
 from app.models.food import Food
 from app.utils.food_classifier import FoodClassifier # Jika masih digunakan
 from app.utils.decision_tree import NutritionDecisionTree
-import pandas as pd
+from app.utils.food_catalog import get_food_catalog, invalidate_food_catalog
+from app.utils.food_importer import import_food_csv, import_food_sources, CURATED_COLUMNS, FOOD_SOURCES, FOOD_SOURCES_BY_NAME
+from app.utils.compiled_tree import CompiledDecisionTree
+from app.utils.ml_features import FeatureMatrixBuilder, FEATURE_COLUMNS
+from app.utils.training_data import FoodArrays, TrainingDataWriter, generate_training_data, load_training_matrix, relabel_training_data
+from app.utils.model_training import next_model_version, save_model_artifact, train_decision_tree
+from app.utils.model_registry import default_model_dir
+from app.utils.query_audit import audit_hot_queries
+from app.utils.nutrition_rollup import rebuild_nutrition_rollup
 import numpy as np
 
-# Definisi KJ_TO_KCAL tidak diperlukan lagi jika energi sudah dalam kkal
-# KJ_TO_KCAL = 1 / 4.184 
+# Konversi kJ -> kkal untuk dataset berenergi kJ ada di FOOD_SOURCES (app.utils.food_importer)
 
 @click.command('seed-users')
 @click.option('--count', default=10, help='Number of users to create')
@@ -62,170 +69,101 @@ def seed_users_command(count):
 @click.option('--source', default='dataset-diet', help='Source directory for data files. Default: dataset-diet')
 @click.option('--filename', default='dataset_nutrisi_kurasi_final.csv', help='Filename of the CSV data. Default: dataset_nutrisi_kurasi_final')
 @click.option('--classify', default=True, type=bool, help='Run food classifier after import. Default: True')
+@click.option('--chunk-size', default=1000, help='Rows per streamed chunk (one upsert + commit per chunk). Default: 1000')
 @with_appcontext
-def import_nutrition_data_command(source, filename, classify):
-    """Import nutrition data from the specified CSV dataset."""
-    try:
-        # Hapus semua data rekomendasi yang terkait dengan makanan yang ada
-        # Ini penting jika ID makanan berubah atau makanan lama dihapus
-        num_deleted_recs = Recommendation.query.delete()
-        db.session.commit()
-        click.echo(f"Deleted {num_deleted_recs} existing recommendation records.")
-
-        # Hapus semua data makanan yang ada untuk menghindari duplikasi dan memastikan data segar
-        num_deleted_foods = Food.query.delete()
-        db.session.commit()
-        click.echo(f"Deleted {num_deleted_foods} existing food records.")
-
-        script_dir = os.path.dirname(os.path.abspath(__file__)) # e.g., c:\project\diet-recommendation\backend\app
-        base_dir_for_source = os.path.abspath(os.path.join(script_dir, '..')) # e.g., c:\project\diet-recommendation\backend
-        file_path = os.path.join(base_dir_for_source, source, filename)
-        
-        click.echo(f"Attempting to open file at: {file_path}")
-        
-        count = 0
-        
-        # Indeks kolom berdasarkan file dataset_nutrisi_kurasi_final_v1.csv
-        # kode,nama_makanan,energi_kal,protein_g,lemak_g,karbohidrat_g,serat_g,kalsium_mg,
-        # fosfor_mg,besi_mg,natrium_mg,kalium_mg,tembaga_mg,seng_mg,retinol_mcg,thiamin_mg,
-        # riboflavin_mg,niasin_mg,vitamin_c_mg,status_makanan,kelompok_makanan,meal_type
-        
-        IDX_KODE = 0
-        IDX_NAMA_MAKANAN = 1
-        IDX_ENERGI_KAL = 2
-        IDX_PROTEIN_G = 3
-        IDX_LEMAK_G = 4
-        IDX_KARBOHIDRAT_G = 5
-        IDX_SERAT_G = 6
-        IDX_KALSIUM_MG = 7
-        IDX_FOSFOR_MG = 8
-        IDX_BESI_MG = 9
-        IDX_NATRIUM_MG = 10
-        IDX_KALIUM_MG = 11
-        IDX_TEMBAGA_MG = 12
-        IDX_SENG_MG = 13
-        IDX_RETINOL_MCG = 14
-        IDX_THIAMIN_MG = 15
-        IDX_RIBOFLAVIN_MG = 16
-        IDX_NIASIN_MG = 17
-        IDX_VITAMIN_C_MG = 18
-        IDX_STATUS_MAKANAN = 19
-        IDX_KELOMPOK_MAKANAN = 20
-        IDX_MEAL_TYPE = 21
-        
-        EXPECTED_COLUMNS = 22 # Jumlah kolom yang diharapkan
-
-        with open(file_path, 'r', encoding='utf-8-sig') as f:
-            reader = csv.reader(f)
-            header = next(reader) 
-            click.echo(f"CSV Header: {header}")
-
-            if len(header) < EXPECTED_COLUMNS:
-                click.echo(f"Error: CSV file '{filename}' does not have the expected number of columns (at least {EXPECTED_COLUMNS}). Found {len(header)} columns.")
-                click.echo(f"Expected header like: kode,nama_makanan,... (total {EXPECTED_COLUMNS})")
-                return
-
-            for row_number, row in enumerate(reader, 1):
-                try:
-                    if not any(field.strip() for field in row): # Lewati baris kosong
-                        click.echo(f"Skipping empty row {row_number}.")
-                        continue
-
-                    if len(row) < EXPECTED_COLUMNS:
-                        click.echo(f"Skipping row {row_number} due to insufficient columns ({len(row)} found, {EXPECTED_COLUMNS} expected): {row}")
-                        continue
-
-                    food_code_val = row[IDX_KODE].strip()
-                    name_val = row[IDX_NAMA_MAKANAN].strip()
-                    
-                    if not name_val:
-                        click.echo(f"Skipping row {row_number} due to empty food name.")
-                        continue
-                        
-                    def safe_float_conversion(value_str, default=None): # Default ke None jika tidak bisa konversi
-                        if value_str is None or str(value_str).strip() == '':
-                            return default
-                        try:
-                            cleaned_value_str = str(value_str).replace(',', '.').strip()
-                            return float(cleaned_value_str)
-                        except ValueError:
-                            # click.echo(f"Warning: Could not convert '{value_str}' to float for food '{name_val}'. Using default {default}.")
-                            return default
-                    
-                    # Membuat instance Food
-                    food = Food(
-                        food_code=food_code_val if food_code_val else None,
-                        name=name_val,
-                        caloric_value=safe_float_conversion(row[IDX_ENERGI_KAL]),
-                        protein=safe_float_conversion(row[IDX_PROTEIN_G]),
-                        fat=safe_float_conversion(row[IDX_LEMAK_G]),
-                        carbohydrates=safe_float_conversion(row[IDX_KARBOHIDRAT_G]),
-                        dietary_fiber=safe_float_conversion(row[IDX_SERAT_G]),
-                        calcium=safe_float_conversion(row[IDX_KALSIUM_MG]),
-                        phosphorus=safe_float_conversion(row[IDX_FOSFOR_MG]),
-                        iron=safe_float_conversion(row[IDX_BESI_MG]),
-                        sodium=safe_float_conversion(row[IDX_NATRIUM_MG]),
-                        potassium=safe_float_conversion(row[IDX_KALIUM_MG]),
-                        copper=safe_float_conversion(row[IDX_TEMBAGA_MG]),
-                        zinc=safe_float_conversion(row[IDX_SENG_MG]),
-                        retinol_mcg=safe_float_conversion(row[IDX_RETINOL_MCG]),
-                        thiamin_mg=safe_float_conversion(row[IDX_THIAMIN_MG]), # Menggunakan nama field baru
-                        riboflavin_mg=safe_float_conversion(row[IDX_RIBOFLAVIN_MG]), # Menggunakan nama field baru
-                        niacin_mg=safe_float_conversion(row[IDX_NIASIN_MG]),
-                        vitamin_c=safe_float_conversion(row[IDX_VITAMIN_C_MG]),
-                        food_status=row[IDX_STATUS_MAKANAN].strip() if row[IDX_STATUS_MAKANAN] else None,
-                        food_group=row[IDX_KELOMPOK_MAKANAN].strip() if row[IDX_KELOMPOK_MAKANAN] else None,
-                        meal_type=row[IDX_MEAL_TYPE].strip() if row[IDX_MEAL_TYPE] else None,
-                        # Kolom lain yang tidak ada di CSV ini akan default ke None/nilai default model
-                        # seperti pufa, cholesterol, vitamin_a, vitamin_e, dll.
-                        # origin dan image_url juga akan None kecuali diisi cara lain
-                    )
-                    db.session.add(food)
-                    count += 1
-
-                    if count % 200 == 0: # Commit setiap 200 baris untuk efisiensi
-                        db.session.commit()
-                        click.echo(f"Processed and committed {count} foods...")
-
-                except IndexError:
-                    click.echo(f"Error processing row {row_number}: {row}. IndexError. Ensure CSV format is correct and has {EXPECTED_COLUMNS} columns.")
-                except ValueError as e:
-                    click.echo(f"Error processing row {row_number}: {row}. ValueError: {str(e)}. Check data types.")
-                except Exception as e:
-                    click.echo(f"An unexpected error occurred at row {row_number}: {row}. Error: {str(e)}")
-                    db.session.rollback() # Rollback jika ada error di tengah batch
-
-        db.session.commit() # Commit sisa data
-        click.echo(f"Successfully imported {count} food items from {file_path}.")
-
-        if classify and count > 0: 
-            click.echo("Classifying foods for dietary preferences and allergens...")
-            try:
-                classifier = FoodClassifier() # Pastikan FoodClassifier kompatibel dengan model baru
-                classifier.classify_foods()
-                click.echo("Food classification complete.")
-            except Exception as e:
-                click.echo(f"Error during food classification: {str(e)}")
-        elif not classify:
-            click.echo("Skipping food classification as per --classify=False.")
-        elif count == 0:
-            click.echo("No food data imported, skipping classification.")
+def import_nutrition_data_command(source, filename, classify, chunk_size):
+    """
+    Import nutrition data from the specified CSV dataset.
+    Rows are upserted by food_code: new foods are inserted, changed foods are updated in place
+    and identical rows are left untouched, so food ids and recommendation history stay valid.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__)) # e.g., c:\project\diet-recommendation\backend\app
+    base_dir_for_source = os.path.abspath(os.path.join(script_dir, '..')) # e.g., c:\project\diet-recommendation\backend
+    file_path = os.path.join(base_dir_for_source, source, filename)
+    click.echo(f"Attempting to open file at: {file_path}")
 
+    try:
+        stats = import_food_csv(file_path, CURATED_COLUMNS, chunk_size)
     except FileNotFoundError:
         click.echo(f"Error: File not found at {file_path}. Please ensure the dataset exists at this location relative to the backend directory.")
         click.echo("Current working directory might affect relative paths. Try providing an absolute path if issues persist.")
+        return
+    except Exception as e:
+        click.echo(f"An unexpected error occurred during import: {str(e)}")
+        return
+
+    click.echo(f"Imported {file_path}: {stats.summary()}")
+    if stats.changed:
+        invalidate_food_catalog()
+
+    if classify and stats.changed:
+        click.echo("Classifying foods for dietary preferences and allergens...")
+        try:
+            classifier = FoodClassifier() # Pastikan FoodClassifier kompatibel dengan model baru
+            classifier.classify_foods()
+            click.echo("Food classification complete.")
+        except Exception as e:
+            click.echo(f"Error during food classification: {str(e)}")
+    elif not classify:
+        click.echo("Skipping food classification as per --classify=False.")
+    else:
+        click.echo("No food rows changed, skipping classification.")
+
+
+@click.command('import-food-sources')
+@click.option('--source', default='dataset-diet', help='Source directory for data files. Default: dataset-diet')
+@click.option('--sources', default=','.join(source.name for source in FOOD_SOURCES),
+              help='Comma-separated datasets in priority order. Default: all known datasets')
+@click.option('--classify', default=True, type=bool, help='Run food classifier after import. Default: True')
+@click.option('--chunk-size', default=1000, help='Rows per streamed chunk (one upsert + commit per chunk). Default: 1000')
+@with_appcontext
+def import_food_sources_command(source, sources, classify, chunk_size):
+    """
+    Merge several nutrition datasets into foods in one pass.
+    Each dataset has a declarative column mapping and unit conversion (see FOOD_SOURCES);
+    the same food appearing in several datasets is taken from the first one only.
+    """
+    names = [name.strip() for name in sources.split(',') if name.strip()]
+    unknown = [name for name in names if name not in FOOD_SOURCES_BY_NAME]
+    if unknown:
+        click.echo(f"Unknown dataset(s): {', '.join(unknown)}. Available: {', '.join(FOOD_SOURCES_BY_NAME)}")
+        return
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    source_dir = os.path.join(os.path.abspath(os.path.join(script_dir, '..')), source)
+    try:
+        results = import_food_sources(source_dir, [FOOD_SOURCES_BY_NAME[name] for name in names], chunk_size)
+    except FileNotFoundError as e:
+        click.echo(f"Error: {str(e)}")
+        return
     except Exception as e:
-        db.session.rollback()
         click.echo(f"An unexpected error occurred during import: {str(e)}")
+        return
+
+    for name, stats in results.items():
+        click.echo(f"{name}: {stats.summary()}")
+    changed = sum(stats.changed for stats in results.values())
+    if changed:
+        invalidate_food_catalog()
+
+    if classify and changed:
+        click.echo("Classifying foods for dietary preferences and allergens...")
+        try:
+            FoodClassifier().classify_foods()
+            click.echo("Food classification complete.")
+        except Exception as e:
+            click.echo(f"Error during food classification: {str(e)}")
 
 
 @click.command('classify-foods')
+@click.option('--force', is_flag=True, help='Reclassify every food, not only foods changed since the last run')
+@click.option('--workers', default=None, type=int, help='Process pool size for large batches. Default: CPU count')
 @with_appcontext
-def classify_foods_command():
+def classify_foods_command(force, workers):
     """Classify foods based on dietary preferences and allergies"""
     try:
         classifier = FoodClassifier()
-        classifier.classify_foods()
+        classifier.classify_foods(force=force, workers=workers)
         click.echo(
             'Successfully classified foods for vegetarian, halal, and allergen content')
     except Exception as e:
@@ -343,203 +281,320 @@ def get_nutrition_score_for_single_food(nutrition_recommender, user, goal, food_
 
 
 @click.command('generate-dt-dataset')
-@click.option('--output-file', default='decision_tree_training_data.csv', help='Nama file CSV output.')
-@click.option('--threshold', default=0.5, type=float, help='Ambang batas skor nutrisi untuk label biner (akan ditentukan setelah melihat distribusi).')
+@click.option('--output-file', default='decision_tree_training_data.csv', help='Nama file output (.csv, atau .parquet jika pyarrow terpasang).')
+@click.option('--threshold', default=0.5, type=float, help='Ambang batas skor nutrisi untuk label biner (bisa diubah nanti dengan relabel-dt-dataset).')
 @click.option('--user-sample-size', default=None, type=int, help='Jumlah sampel pengguna (opsional, ambil semua jika None).')
 @click.option('--food-sample-size', default=None, type=int, help='Jumlah sampel makanan per pengguna (opsional, ambil semua jika None).')
+@click.option('--workers', default=None, type=int, help='Jumlah process untuk shard pengguna. Default: jumlah CPU')
+@click.option('--shard-size', default=64, help='Jumlah pengguna per shard (satu chunk output per shard). Default: 64')
+@click.option('--seed', default=None, type=int, help='Seed sampling makanan (opsional).')
+@click.option('--verify-samples', default=0, help='Cocokkan N skor acak dengan get_nutrition_score_for_single_food. Default: 0')
 @with_appcontext
-def generate_dt_dataset_command(output_file, threshold, user_sample_size, food_sample_size):
-    """Membuat dataset CSV untuk melatih Decision Tree dan menampilkan statistik skor mentah."""
-    click.echo(f"Memulai pembuatan dataset. Threshold awal (mungkin diabaikan): {threshold}")
-    click.echo("Fokus utama adalah mendapatkan statistik skor mentah terlebih dahulu.")
-
+def generate_dt_dataset_command(output_file, threshold, user_sample_size, food_sample_size, workers, shard_size, seed, verify_samples):
+    """Membuat dataset untuk melatih Decision Tree dan menampilkan statistik skor mentah."""
     nutrition_recommender = NutritionDecisionTree()
 
     users_with_goals_query = User.query.join(DietGoal).filter(DietGoal.status == 'active')
     if user_sample_size:
         users_with_goals_query = users_with_goals_query.limit(user_sample_size)
-    users_with_goals = users_with_goals_query.all()
+    users_with_goals = list({user.id: user for user in users_with_goals_query.all()}.values())
 
     if not users_with_goals:
         click.echo("Tidak ada pengguna dengan tujuan diet aktif ditemukan.")
         return
 
-    all_foods = Food.query.all()
-    if not all_foods:
+    catalog = get_food_catalog()
+    if not catalog.size:
         click.echo("Tidak ada data makanan ditemukan.")
         return
 
-    click.echo(f"Ditemukan {len(users_with_goals)} pengguna dengan tujuan aktif dan {len(all_foods)} makanan.")
+    click.echo(f"Ditemukan {len(users_with_goals)} pengguna dengan tujuan aktif dan {catalog.size} makanan.")
 
     script_dir = os.path.dirname(os.path.abspath(__file__))
     base_dir_for_output = os.path.abspath(os.path.join(script_dir, '..', 'dataset-diet'))
     os.makedirs(base_dir_for_output, exist_ok=True)
-    csv_file_path = os.path.join(base_dir_for_output, output_file)
-
-    user_feature_names = [
-        'user_age', 'user_weight', 'user_height', 'user_bmi',
-        'user_gender_F', 'user_gender_M',
-        'user_activity_level_sedentary', 'user_activity_level_light', 
-        'user_activity_level_moderate', 'user_activity_level_active', 'user_activity_level_very_active',
-        'user_medical_condition_none', 'user_medical_condition_diabetes', 
-        'user_medical_condition_hypertension', 'user_medical_condition_obesity',
-        'user_target_weight',
-        'user_daily_calories_need', 'user_protein_need_g', 'user_carbs_need_g', 'user_fat_need_g'
-    ]
-    food_feature_names = [
-        'food_caloric_value', 'food_protein_g', 'food_lemak_g', 'food_karbohidrat_g', 'food_serat_g',
-        'food_kalsium_mg', 'food_fosfor_mg', 'food_besi_mg', 'food_natrium_mg', 'food_kalium_mg',
-        'food_tembaga_mg', 'food_seng_mg', 'food_retinol_mcg', 'food_thiamin_mg',
-        'food_riboflavin_mg', 'food_niasin_mg', 'food_vitamin_c_mg',
-        'food_status_makanan_Olahan', 'food_status_makanan_Tunggal', 'food_status_makanan_Bahan_Dasar', # underscore
-        'food_kelompok_makanan_Buah', 'food_kelompok_makanan_Sayur', 'food_kelompok_makanan_Kacang',
-        'food_kelompok_makanan_Serealia', 'food_kelompok_makanan_Umbi', 'food_kelompok_makanan_Daging',
-        'food_kelompok_makanan_Ikan_dsb', 'food_kelompok_makanan_Susu', 'food_kelompok_makanan_Telur', # underscore
-        'food_is_vegetarian', 'food_is_halal', 'food_contains_dairy', 'food_contains_nuts',
-        'food_contains_seafood', 'food_contains_eggs', 'food_contains_soy'
-    ]
-    
-    possible_genders = ['M', 'F']
-    possible_activity_levels = ['sedentary', 'light', 'moderate', 'active', 'very_active']
-    possible_medical_conditions = ['none', 'diabetes', 'hypertension', 'obesity']
-    # PASTIKAN NILAI INI SESUAI DENGAN DATA ANDA
-    possible_food_statuses = ['Olahan', 'Tunggal', 'Bahan Dasar'] 
-    possible_food_groups = [ 
-        'Buah', 'Sayur', 'Kacang', 'Serealia', 'Umbi', 
-        'Daging', 'Ikan dsb', 'Susu', 'Telur' 
-    ]
-
-    header = user_feature_names + food_feature_names + ['raw_nutrition_score', 'label_recommended'] # Tambah raw_nutrition_score
-    
-    dataset_rows = []
-    all_raw_scores = [] # Untuk menyimpan semua skor mentah
-    processed_count = 0
-
+    output_path = os.path.join(base_dir_for_output, output_file)
+
+    # Fitur memakai skema yang sama dengan saat serving (FEATURE_COLUMNS)
+    builder = FeatureMatrixBuilder(FEATURE_COLUMNS)
+    foods = FoodArrays(catalog, FEATURE_COLUMNS)
+    rng = np.random.default_rng(seed)
+
+    # Goal aktif terbaru per pengguna
+    active_goals = {}
+    for goal in DietGoal.query.filter(
+        DietGoal.status == 'active', DietGoal.user_id.in_([user.id for user in users_with_goals])
+    ).order_by(DietGoal.created_at.desc()).all():
+        active_goals.setdefault(goal.user_id, goal)
+
+    tasks = []
+    samples = []
+    skipped = 0
     for user in users_with_goals:
-        active_goal = DietGoal.query.filter_by(user_id=user.id, status='active').order_by(DietGoal.created_at.desc()).first()
+        active_goal = active_goals.get(user.id)
         if not active_goal:
             continue
+        if not (user.weight and user.height and user.age and user.gender and active_goal.target_weight and active_goal.target_date):
+            skipped += 1
+            continue
 
-        nutritional_needs = nutrition_recommender._calculate_nutritional_needs(user, active_goal)
-        user_features = {
-            'user_age': user.age, 'user_weight': user.weight, 'user_height': user.height,
-            'user_bmi': calculate_bmi(user.weight, user.height),
-            'user_target_weight': active_goal.target_weight,
-            'user_daily_calories_need': nutritional_needs['daily_calories'],
-            'user_protein_need_g': nutritional_needs['protein_g_per_day'],
-            'user_carbs_need_g': nutritional_needs['carbs_g_per_day'],
-            'user_fat_need_g': nutritional_needs['fat_g_per_day']
-        }
-        for gender_val in possible_genders: user_features[f'user_gender_{gender_val}'] = 1 if user.gender == gender_val else 0
-        for level_val in possible_activity_levels: user_features[f'user_activity_level_{level_val.replace(" ", "_")}'] = 1 if user.activity_level == level_val else 0
-        for med_val in possible_medical_conditions: user_features[f'user_medical_condition_{med_val}'] = 1 if active_goal.medical_condition == med_val else 0
-        
-        current_foods_to_process = all_foods
-        if food_sample_size and len(all_foods) > food_sample_size:
-            current_foods_to_process = random.sample(all_foods, food_sample_size)
-
-        for food in current_foods_to_process:
-            nutrition_score = get_nutrition_score_for_single_food(nutrition_recommender, user, active_goal, food)
-            all_raw_scores.append(nutrition_score) # Simpan skor mentah
-
-            # Label akan ditentukan nanti setelah melihat distribusi skor
-            # Untuk sementara, kita bisa set default atau menggunakan threshold awal
-            label = 1 if nutrition_score >= threshold else 0 # Threshold ini akan kita sesuaikan
-
-            food_features = {
-                'food_caloric_value': food.caloric_value, 'food_protein_g': food.protein,
-                'food_lemak_g': food.fat, 'food_karbohidrat_g': food.carbohydrates,
-                'food_serat_g': food.dietary_fiber, 'food_kalsium_mg': food.calcium,
-                'food_fosfor_mg': food.phosphorus, 'food_besi_mg': food.iron,
-                'food_natrium_mg': food.sodium, 'food_kalium_mg': food.potassium,
-                'food_tembaga_mg': food.copper, 'food_seng_mg': food.zinc,
-                'food_retinol_mcg': food.retinol_mcg, 'food_thiamin_mg': food.thiamin_mg,
-                'food_riboflavin_mg': food.riboflavin_mg, 'food_niasin_mg': food.niacin_mg,
-                'food_vitamin_c_mg': food.vitamin_c,
-                'food_is_vegetarian': 1 if food.is_vegetarian else 0,
-                'food_is_halal': 1 if food.is_halal else 0,
-                'food_contains_dairy': 1 if food.contains_dairy else 0,
-                'food_contains_nuts': 1 if food.contains_nuts else 0,
-                'food_contains_seafood': 1 if food.contains_seafood else 0,
-                'food_contains_eggs': 1 if food.contains_eggs else 0,
-                'food_contains_soy': 1 if food.contains_soy else 0
-            }
-            for status_val in possible_food_statuses: food_features[f'food_status_makanan_{status_val.replace(" ", "_")}'] = 1 if food.food_status == status_val else 0
-            for group_val in possible_food_groups: food_features[f'food_kelompok_makanan_{group_val.replace(" ", "_").replace("dsb", "dll")}'] = 1 if food.food_group == group_val else 0
-            
-            row_data = []
-            for feature_name in user_feature_names: row_data.append(user_features.get(feature_name, 0 if 'user_gender' in feature_name or 'user_activity_level' in feature_name or 'user_medical_condition' in feature_name else None))
-            for feature_name in food_feature_names:
-                default_val_food = 0 if 'food_status_makanan' in feature_name or 'food_kelompok_makanan' in feature_name or feature_name.startswith('food_is_') or feature_name.startswith('food_contains_') else None
-                row_data.append(food_features.get(feature_name, default_val_food))
-            
-            row_data.append(nutrition_score) # Tambahkan skor mentah ke baris CSV
-            row_data.append(label)
-            dataset_rows.append(row_data)
-            
-            processed_count += 1
-            if processed_count % 1000 == 0: # Kurangi frekuensi print
-                click.echo(f"Memproses pasangan pengguna-makanan ke-{processed_count}...")
+        positions = None
+        if food_sample_size and catalog.size > food_sample_size:
+            positions = np.sort(rng.choice(catalog.size, food_sample_size, replace=False))
+        user_row = builder.user_rows(builder.user_vector(user, active_goal, [])[None, :])[0]
+        tasks.append((user_row, nutrition_recommender._calculate_nutritional_needs(user, active_goal), positions))
+        samples.append((user, active_goal, positions))
 
-    # Tampilkan statistik skor mentah
-    if all_raw_scores:
-        click.echo(f"\n--- Statistik Skor Mentah (Total {len(all_raw_scores)} skor) ---")
-        click.echo(f"Min Skor: {np.min(all_raw_scores):.4f}")
-        click.echo(f"Max Skor: {np.max(all_raw_scores):.4f}")
-        click.echo(f"Mean Skor: {np.mean(all_raw_scores):.4f}")
-        click.echo(f"Median Skor: {np.median(all_raw_scores):.4f}")
-        click.echo(f"25th Percentile: {np.percentile(all_raw_scores, 25):.4f}")
-        click.echo(f"50th Percentile (Median): {np.percentile(all_raw_scores, 50):.4f}")
-        click.echo(f"75th Percentile: {np.percentile(all_raw_scores, 75):.4f}")
-        click.echo(f"90th Percentile: {np.percentile(all_raw_scores, 90):.4f}")
-        click.echo(f"95th Percentile: {np.percentile(all_raw_scores, 95):.4f}")
-        click.echo(f"Jumlah skor > 0.5: {sum(s > 0.5 for s in all_raw_scores)}")
-        click.echo(f"Jumlah skor > 0.6: {sum(s > 0.6 for s in all_raw_scores)}")
-        click.echo(f"Jumlah skor > 0.7: {sum(s > 0.7 for s in all_raw_scores)}")
-        click.echo("----------------------------------------------------")
-        click.echo("\nSARAN: Gunakan statistik di atas untuk menentukan --threshold yang lebih baik saat menjalankan ulang perintah ini untuk membuat CSV final.")
-    else:
+    if skipped:
+        click.echo(f"{skipped} pengguna dilewati karena profil/goal tidak lengkap.")
+    if not tasks:
         click.echo("Tidak ada skor mentah yang dihasilkan.")
+        return
 
-    # Tulis ke file CSV (masih menggunakan threshold awal, atau threshold yang Anda tentukan)
-    # Anda mungkin ingin menjalankan ulang perintah ini dengan threshold yang disesuaikan setelah melihat statistik
     try:
-        with open(csv_file_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(header)
-            # Jika Anda ingin memperbarui label berdasarkan threshold baru di sini, Anda perlu loop lagi
-            # atau simpan dataset_rows dengan skor mentah dan hitung ulang label sebelum menulis.
-            # Untuk sekarang, kita tulis dengan label berdasarkan threshold awal.
-            # Untuk pembuatan CSV final, Anda akan menjalankan ulang perintah dengan threshold yang lebih baik.
-            updated_dataset_rows = []
-            if all_raw_scores and dataset_rows: # Pastikan ada data
-                # Jika Anda ingin langsung menggunakan threshold baru dari statistik (misal median)
-                # new_threshold_from_stats = np.median(all_raw_scores)
-                # click.echo(f"Menggunakan threshold baru dari median skor: {new_threshold_from_stats:.4f} untuk CSV.")
-                # for i, row in enumerate(dataset_rows):
-                #     raw_score_idx = header.index('raw_nutrition_score')
-                #     label_idx = header.index('label_recommended')
-                #     row[label_idx] = 1 if row[raw_score_idx] >= new_threshold_from_stats else 0
-                #     updated_dataset_rows.append(row)
-                # writer.writerows(updated_dataset_rows)
-                writer.writerows(dataset_rows) # Untuk saat ini, tulis dengan threshold awal
-            else:
-                 writer.writerows(dataset_rows)
-
-
-        click.echo(f"\nDataset (mungkin dengan label sementara) berhasil dibuat dan disimpan di: {csv_file_path}")
-        click.echo(f"Total {len(dataset_rows)} baris data dihasilkan.")
-        click.echo(f"PERHATIAN: Label di CSV ini mungkin perlu diperbarui dengan menjalankan ulang perintah menggunakan --threshold yang lebih sesuai berdasarkan statistik skor mentah di atas.")
-
+        writer = TrainingDataWriter(output_path, FEATURE_COLUMNS)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    try:
+        all_raw_scores = generate_training_data(tasks, foods, writer, threshold, shard_size=max(1, shard_size), workers=workers)
     except IOError as e:
-        click.echo(f"Gagal menulis ke file CSV: {e}")
+        click.echo(f"Gagal menulis file dataset: {e}")
+        return
+    elapsed = time.perf_counter() - start
+    click.echo(f"{writer.rows} baris dihasilkan dalam {elapsed:.2f} detik ({writer.rows / max(elapsed, 1e-9):,.0f} baris/detik, {workers} worker).")
+
+    if verify_samples:
+        # Cek paritas dengan versi skalar pada pasangan pengguna-makanan acak
+        foods_by_id = {food.id: food for food in Food.query.all()}
+        offsets = np.cumsum([0] + [catalog.size if positions is None else len(positions) for _, _, positions in samples])
+        mismatches = 0
+        for row in rng.choice(len(all_raw_scores), min(verify_samples, len(all_raw_scores)), replace=False):
+            user_idx = int(np.searchsorted(offsets, row, side='right')) - 1
+            user, active_goal, positions = samples[user_idx]
+            position = row - offsets[user_idx]
+            position = position if positions is None else positions[position]
+            expected = get_nutrition_score_for_single_food(
+                nutrition_recommender, user, active_goal, foods_by_id[int(catalog.ids[position])]
+            )
+            # Toleransi 1e-12: versi skalar memakai pow() libm yang bisa berbeda 1 ULP dari x*x NumPy
+            if abs(expected - all_raw_scores[row]) > 1e-12:
+                mismatches += 1
+        if mismatches:
+            raise click.ClickException(f"{mismatches} skor berbeda dengan get_nutrition_score_for_single_food.")
+        click.echo(f"Paritas dengan get_nutrition_score_for_single_food: OK ({min(verify_samples, len(all_raw_scores))} sampel)")
+
+    # Tampilkan statistik skor mentah
+    click.echo(f"\n--- Statistik Skor Mentah (Total {len(all_raw_scores)} skor) ---")
+    click.echo(f"Min Skor: {np.min(all_raw_scores):.4f}")
+    click.echo(f"Max Skor: {np.max(all_raw_scores):.4f}")
+    click.echo(f"Mean Skor: {np.mean(all_raw_scores):.4f}")
+    click.echo(f"Median Skor: {np.median(all_raw_scores):.4f}")
+    click.echo(f"25th Percentile: {np.percentile(all_raw_scores, 25):.4f}")
+    click.echo(f"50th Percentile (Median): {np.percentile(all_raw_scores, 50):.4f}")
+    click.echo(f"75th Percentile: {np.percentile(all_raw_scores, 75):.4f}")
+    click.echo(f"90th Percentile: {np.percentile(all_raw_scores, 90):.4f}")
+    click.echo(f"95th Percentile: {np.percentile(all_raw_scores, 95):.4f}")
+    click.echo(f"Jumlah skor > 0.5: {int(np.sum(all_raw_scores > 0.5))}")
+    click.echo(f"Jumlah skor > 0.6: {int(np.sum(all_raw_scores > 0.6))}")
+    click.echo(f"Jumlah skor > 0.7: {int(np.sum(all_raw_scores > 0.7))}")
+    click.echo("----------------------------------------------------")
+
+    click.echo(f"\nDataset berhasil dibuat dan disimpan di: {output_path}")
+    click.echo(f"Label memakai threshold {threshold} ({int(np.sum(all_raw_scores >= threshold))} positif).")
+    click.echo("SARAN: Gunakan statistik di atas lalu jalankan relabel-dt-dataset --threshold <nilai> untuk mengganti label tanpa menghitung ulang skor.")
+
+
+@click.command('relabel-dt-dataset')
+@click.option('--input-file', default='decision_tree_training_data.csv', help='File dataset (.csv/.parquet) di direktori dataset-diet.')
+@click.option('--output-file', default=None, help='File hasil. Default: menimpa --input-file.')
+@click.option('--threshold', required=True, type=float, help='Ambang batas baru untuk raw_nutrition_score.')
+@click.option('--chunk-size', default=200000, help='Baris per chunk yang dibaca/ditulis. Default: 200000')
+@with_appcontext
+def relabel_dt_dataset_command(input_file, output_file, threshold, chunk_size):
+    """Hitung ulang label_recommended dari raw_nutrition_score dengan threshold baru."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    base_dir = os.path.abspath(os.path.join(script_dir, '..', 'dataset-diet'))
+    input_path = os.path.join(base_dir, input_file)
+    output_path = os.path.join(base_dir, output_file or input_file)
+    if not os.path.exists(input_path):
+        raise click.ClickException(f"File tidak ditemukan: {input_path}")
+    try:
+        rows, positives = relabel_training_data(input_path, output_path, threshold, chunk_size)
+    except (RuntimeError, KeyError) as e:
+        raise click.ClickException(f"Gagal relabel dataset: {e}")
+    click.echo(f"{rows} baris dilabel ulang dengan threshold {threshold}: {positives} positif, {rows - positives} negatif.")
+    click.echo(f"Disimpan di: {output_path}")
+
+
+def _parity_samples(tree: CompiledDecisionTree, samples: int, seed: int = 42) -> np.ndarray:
+    """Baris uji acak yang banyak jatuh tepat di/di sekitar threshold setiap split."""
+    rng = np.random.default_rng(seed)
+    n_features = len(tree.feature_columns)
+    X = rng.uniform(-1.0, 1.0, size=(samples, n_features)).astype(np.float32)
+    for column in range(n_features):
+        thresholds = tree.threshold[(tree.feature == column) & ~tree.is_leaf].astype(np.float32)
+        if not len(thresholds):
+            continue
+        candidates = np.concatenate([
+            thresholds,
+            np.nextafter(thresholds, np.float32(np.inf)),
+            np.nextafter(thresholds, np.float32(-np.inf)),
+            rng.uniform(thresholds.min() - 1, thresholds.max() + 1, size=len(thresholds)).astype(np.float32)
+        ])
+        X[:, column] = rng.choice(candidates, size=samples)
+    return X
+
+
+@click.command('export-model')
+@click.option('--model', 'model_path', required=True, help='Path artefak DecisionTreeClassifier (.joblib).')
+@click.option('--output', default=None, help='Path .npz hasil. Default: decision_tree_compiled_v<N>.npz di direktori model.')
+@click.option('--samples', default=20000, help='Jumlah baris acak untuk uji paritas dengan predict_proba.')
+@with_appcontext
+def export_model_command(model_path, output, samples):
+    """Ratakan decision tree menjadi array NumPy untuk inferensi tanpa sklearn/pandas."""
+    import joblib
+    import re
+    import warnings
+
+    model = joblib.load(model_path)
+    if not hasattr(model, 'tree_'):
+        raise click.ClickException(f'{type(model).__name__} bukan decision tree, tidak bisa dikompilasi.')
+    feature_names = getattr(model, 'feature_names_in_', None)
+    tree = CompiledDecisionTree.from_sklearn(model, list(feature_names) if feature_names is not None else None)
+    click.echo(f"Tree: {len(tree.feature)} node, kedalaman {tree.max_depth}, {len(tree.feature_columns)} fitur")
+
+    # Uji paritas: baris di sekitar threshold + matriks fitur nyata dari katalog
+    checks = [_parity_samples(tree, samples)]
+    catalog = get_food_catalog()
+    if feature_names is not None and catalog.size:
+        builder = FeatureMatrixBuilder(tree.feature_columns)
+        positions = catalog.select(['caloric_value', 'protein', 'carbohydrates', 'fat'])
+        for goal in DietGoal.query.filter_by(status='active').limit(20).all():
+            user = User.query.get(goal.user_id)
+            if user and user.weight and user.height and goal.target_date:
+                checks.append(builder.build(user, goal, [], catalog, positions))
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        for X in checks:
+            if not np.array_equal(tree.predict_proba(X), model.predict_proba(X)):
+                raise click.ClickException('Hasil tree terkompilasi berbeda dengan predict_proba; artefak tidak ditulis.')
+    click.echo(f"Paritas dengan predict_proba: OK ({sum(len(X) for X in checks)} baris)")
+
+    if output is None:
+        match = re.search(r'_v(\d+)\.joblib$', model_path)
+        if not match:
+            raise click.ClickException('Versi tidak bisa dibaca dari nama model; gunakan --output.')
+        output = os.path.join(os.path.dirname(model_path), f'decision_tree_compiled_v{match.group(1)}.npz')
+    # Tulis ke file sementara lalu rename, agar registry tidak pernah membaca artefak setengah jadi
+    temp_path = output + '.tmp'
+    tree.save(temp_path)
+    os.replace(temp_path, output)
+    click.echo(f"Artefak tersimpan di: {output} ({os.path.getsize(output)} byte)")
+
+
+@click.command('train-model')
+@click.option('--input-file', default='decision_tree_training_data.csv', help='Dataset hasil generate-dt-dataset (.csv/.parquet) di direktori dataset-diet.')
+@click.option('--model-dir', default=None, help='Direktori artefak model. Default: direktori yang dibaca MLDecisionTreeRecommender.')
+@click.option('--cv', default=5, help='Jumlah fold cross-validation. Default: 5')
+@click.option('--n-jobs', default=-1, help='Jumlah proses GridSearchCV (-1 = semua core). Default: -1')
+@click.option('--test-size', default=0.2, type=float, help='Proporsi data uji. Default: 0.2')
+@click.option('--scoring', default='accuracy', help='Metrik pemilihan model GridSearchCV. Default: accuracy')
+@click.option('--seed', default=42, help='Seed untuk split, fold dan tree. Default: 42')
+@click.option('--chunk-size', default=200000, help='Baris per chunk saat membaca dataset. Default: 200000')
+@with_appcontext
+def train_model_command(input_file, model_dir, cv, n_jobs, test_size, scoring, seed, chunk_size):
+    """Latih Decision Tree dengan pencarian hyperparameter dan simpan artefak berversi ke registry model."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    input_path = os.path.join(os.path.abspath(os.path.join(script_dir, '..', 'dataset-diet')), input_file)
+    if not os.path.exists(input_path):
+        raise click.ClickException(f"Dataset tidak ditemukan: {input_path} (jalankan generate-dt-dataset terlebih dahulu)")
+    model_dir = model_dir or default_model_dir()
+
+    start = time.perf_counter()
+    try:
+        X, y, feature_columns = load_training_matrix(input_path, chunk_size)
+    except (KeyError, ValueError) as e:
+        raise click.ClickException(f"Dataset tidak valid: {e}")
+    click.echo(f"Dataset dimuat: {X.shape[0]} baris, {X.shape[1]} fitur ({X.nbytes / 1e6:.1f} MB float32) dalam {time.perf_counter() - start:.2f} detik")
+    if len(np.unique(y)) < 2:
+        raise click.ClickException("Dataset hanya berisi satu kelas; sesuaikan threshold dengan relabel-dt-dataset.")
+    unknown_columns = sorted(set(feature_columns) - set(FEATURE_COLUMNS))
+    if unknown_columns:
+        click.echo(f"PERINGATAN: kolom tidak dikenal saat serving (akan bernilai 0): {', '.join(unknown_columns)}")
+
+    model, report = train_decision_tree(X, y, feature_columns, cv=cv, n_jobs=n_jobs, test_size=test_size, scoring=scoring, seed=seed)
+    report['dataset'] = input_path
+    version = next_model_version(model_dir)
+    paths = save_model_artifact(model, feature_columns, report, model_dir, version)
+
+    search = report['search']
+    click.echo(f"Parameter terbaik: {search['best_params']} (CV {scoring} {search['best_cv_score']:.4f}, {search['candidates']} kandidat x {cv} fold dalam {search['search_time_s']:.2f} detik)")
+    click.echo(f"Waktu fit model final: {report['fit_time_s']:.3f} detik, kedalaman {report['tree_depth']}, {report['tree_nodes']} node")
+    click.echo(f"Akurasi uji: {report['test_accuracy']:.4f} (balanced {report['test_balanced_accuracy']:.4f})")
+    latency = report['inference_ms_per_1k_rows']
+    click.echo(f"Latensi inferensi per 1k baris: predict_proba {latency['sklearn_predict_proba']:.3f} ms, tree terkompilasi {latency['compiled_tree']:.3f} ms")
+    click.echo(f"Model v{version} tersimpan di: {paths['model']}")
+    click.echo(f"Manifest fitur: {paths['manifest']}")
+    click.echo(f"Laporan: {paths['report']}")
+
+
+@click.command('db-explain')
+@click.option('--user-id', default=None, type=int, help='User contoh untuk parameter query. Default: user dengan rekomendasi terbanyak')
+@click.option('--show-sql', is_flag=True, help='Tampilkan SQL setiap query')
+@click.option('--fail-on-scan', is_flag=True, help='Keluar dengan status gagal jika ada full table scan')
+@with_appcontext
+def db_explain_command(user_id, show_sql, fail_on_scan):
+    """Jalankan EXPLAIN pada query hot path dan tandai full table scan."""
+    if user_id is None:
+        user_id = db.session.query(Recommendation.user_id).group_by(Recommendation.user_id)\
+            .order_by(func.count().desc()).limit(1).scalar()
+        user_id = user_id or db.session.query(func.min(User.id)).scalar() or 1
+
+    results = audit_hot_queries(user_id)
+    click.echo(f"Dialek: {db.engine.dialect.name}, user contoh: {user_id}")
+    for result in results:
+        status = 'FULL SCAN ' + ', '.join(result['full_scans']) if result['full_scans'] else 'OK'
+        click.echo(f"\n[{status}] {result['name']}")
+        if show_sql:
+            click.echo('  ' + result['sql'].replace('\n', '\n  '))
+        for line in result['plan']:
+            click.echo(f"    {line}")
+
+    if not results[0]['supported']:
+        click.echo(f"\nPERINGATAN: deteksi full scan belum didukung untuk dialek {db.engine.dialect.name}; periksa plan secara manual.")
+    scanned = [result['name'] for result in results if result['full_scans']]
+    click.echo(f"\n{len(results) - len(scanned)}/{len(results)} query memakai index, {len(scanned)} full scan")
+    if scanned and fail_on_scan:
+        raise click.ClickException(f"Full table scan pada: {', '.join(scanned)} (jalankan 'flask db upgrade')")
+
+
+@click.command('backfill-nutrition-rollup')
+@click.option('--user-id', default=None, type=int, help='Bangun ulang hanya untuk user ini. Default: semua user')
+@with_appcontext
+def backfill_nutrition_rollup_command(user_id):
+    """Bangun ulang tabel daily_nutrition_rollup dari rekomendasi yang sudah dikonsumsi."""
+    start = time.perf_counter()
+    try:
+        rows = rebuild_nutrition_rollup(user_id)
+        db.session.commit()
     except Exception as e:
-        click.echo(f"Terjadi kesalahan saat menulis CSV: {e}")
+        db.session.rollback()
+        raise click.ClickException(f"Gagal membangun rollup nutrisi: {e}")
+    target = f"user {user_id}" if user_id is not None else "semua user"
+    click.echo(f"Rollup nutrisi harian ({target}): {rows} baris dalam {time.perf_counter() - start:.2f} detik")
 
 
 def register_commands(app):
     app.cli.add_command(seed_users_command)
     app.cli.add_command(import_nutrition_data_command) # Nama perintah diperbarui
+    app.cli.add_command(import_food_sources_command)
     app.cli.add_command(classify_foods_command)
     app.cli.add_command(generate_dt_dataset_command)
+    app.cli.add_command(relabel_dt_dataset_command)
+    app.cli.add_command(export_model_command)
+    app.cli.add_command(train_model_command)
+    app.cli.add_command(db_explain_command)
+    app.cli.add_command(backfill_nutrition_rollup_command)
 
@@ -47,6 +47,8 @@ class Food(db.Model):
     contains_seafood = db.Column(db.Boolean, default=False)
     contains_eggs = db.Column(db.Boolean, default=False)
     contains_soy = db.Column(db.Boolean, default=False)
+    # Hash input klasifikasi terakhir (nama, kelompok, versi aturan) untuk klasifikasi inkremental
+    classification_hash = db.Column(db.String(40), nullable=True)
 
 
     # Timestamp (logika aplikasi)
@@ -3,6 +3,9 @@ from datetime import datetime
 
 class WeightProgress(db.Model):
     __tablename__ = 'weight_progress'
+    __table_args__ = (
+        db.Index('ix_weight_progress_user_date', 'user_id', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -23,4 +26,25 @@ class WeightProgress(db.Model):
         
         if previous:
             return self.weight - previous.weight
-        return 0
\ No newline at end of file
+        return 0
+
+class DailyNutritionRollup(db.Model):
+    """
+    Total nutrisi makanan yang dikonsumsi per user per hari (berdasarkan Recommendation.consumed_date).
+    Diperbarui inkremental oleh /feedback; bisa dibangun ulang dengan `flask backfill-nutrition-rollup`.
+    Baris hanya ada untuk hari dengan minimal satu makanan dikonsumsi.
+    """
+    __tablename__ = 'daily_nutrition_rollup'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    kcal = db.Column(db.Float, nullable=False, default=0.0)
+    protein = db.Column(db.Float, nullable=False, default=0.0)
+    carbs = db.Column(db.Float, nullable=False, default=0.0)
+    fat = db.Column(db.Float, nullable=False, default=0.0)
+    fiber = db.Column(db.Float, nullable=False, default=0.0)
+    sodium = db.Column(db.Float, nullable=False, default=0.0)
+    items = db.Column(db.Integer, nullable=False, default=0) # Jumlah makanan dikonsumsi pada hari itu
+
+    def __repr__(self):
+        return f'<DailyNutritionRollup User {self.user_id} {self.date}: {self.items} items>'
@@ -3,6 +3,10 @@ from datetime import datetime
 
 class DietGoal(db.Model):
     __tablename__ = 'diet_goals'
+    __table_args__ = (
+        # Goal aktif terbaru per user
+        db.Index('ix_diet_goals_user_status_created', 'user_id', 'status', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -20,6 +24,9 @@ class DietGoal(db.Model):
 
 class FoodPreference(db.Model):
     __tablename__ = 'food_preferences'
+    __table_args__ = (
+        db.Index('ix_food_preferences_user_active', 'user_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -38,6 +45,14 @@ class FoodPreference(db.Model):
 
 class Recommendation(db.Model):
     __tablename__ = 'recommendations'
+    __table_args__ = (
+        # Menu harian dan makanan terbaru user
+        db.Index('ix_recommendations_user_date', 'user_id', 'recommendation_date'),
+        # Progress: makanan yang dikonsumsi per tanggal (covering untuk join ke foods)
+        db.Index('ix_recommendations_user_consumed', 'user_id', 'consumed_date', 'food_id'),
+        # Rata-rata rating dan makanan favorit (CF), covering untuk agregat per user
+        db.Index('ix_recommendations_user_rating', 'user_id', 'rating'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -49,6 +64,7 @@ class Recommendation(db.Model):
     is_consumed = db.Column(db.Boolean, default=False)
     rating = db.Column(db.Integer, nullable=True) # Rating bisa null jika belum diberi
     feedback_date = db.Column(db.DateTime, nullable=True) # Tanggal feedback diberikan
+    consumed_date = db.Column(db.Date, nullable=True) # Tanggal feedback_date jika is_consumed, selain itu NULL
     
     # Klasifikasi dari ML (hanya meal_type sekarang)
     meal_type = db.Column(db.String(50), nullable=True) # Misal: 'Sarapan', 'Makan Siang', 'Makan Malam', 'Cemilan'
@@ -59,5 +75,9 @@ class Recommendation(db.Model):
     user = db.relationship('User', backref=db.backref('recommendations', lazy=True))
     food = db.relationship('Food', backref=db.backref('recommendations', lazy=True))
 
+    def sync_consumed_date(self):
+        """Perbarui consumed_date setelah is_consumed/feedback_date berubah (dipakai endpoint /progress)."""
+        self.consumed_date = self.feedback_date.date() if self.is_consumed and self.feedback_date else None
+
     def __repr__(self):
         return f'<Recommendation {self.id} for User {self.user_id} - Food {self.food_id}>'
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.models.user import User
 from app import db
+from app.utils.collaborative_filtering import user_profile_store
 from flask_jwt_extended import create_access_token
 import re
 
@@ -122,6 +123,7 @@ def register():
         
         db.session.add(user)
         db.session.commit()
+        user_profile_store.update_user(user.id)
         
         return jsonify({'message': 'Pendaftaran berhasil'}), 201
         
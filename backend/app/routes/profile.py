@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app import db
+from app.utils.collaborative_filtering import user_profile_store
+from app.utils.menu_cache import daily_menu_cache
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import os
@@ -71,6 +73,8 @@ def update_profile():
         user.medical_condition = data.get('medical_condition', user.medical_condition)
         
         db.session.commit()
+        user_profile_store.update_user(user.id)
+        daily_menu_cache.invalidate(user.id)
         
         return jsonify({
             'id': user.id,
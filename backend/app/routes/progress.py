@@ -1,15 +1,50 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
-from app.models.recommendation import DietGoal, Recommendation
-from app.models.progress import WeightProgress
-from app.models.food import Food
+from app.models.recommendation import DietGoal
+from app.models.progress import WeightProgress, DailyNutritionRollup
 from app import db
 from datetime import datetime, timedelta
 from sqlalchemy import func
 
 bp = Blueprint('progress', __name__)
 
+
+# Periode tren: jumlah periode default dan maksimum
+TREND_PERIODS = {
+    'week': (12, 104),
+    'month': (12, 60),
+    'year': (3, 10),
+}
+TREND_NUTRIENTS = ['kcal', 'protein', 'carbs', 'fat', 'fiber', 'sodium']
+
+
+def _rollup_between(user_id, start_date, end_date, *columns):
+    """Baris rollup harian user dalam rentang setengah terbuka [start_date, end_date + 1 hari)."""
+    return db.session.query(*columns).filter(
+        DailyNutritionRollup.user_id == user_id,
+        DailyNutritionRollup.date >= start_date,
+        DailyNutritionRollup.date < end_date + timedelta(days=1)
+    )
+
+
+def _period_start(day, period):
+    """Hari pertama periode (minggu mulai Senin) yang memuat `day`."""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def _previous_period_start(start, period):
+    if period == 'week':
+        return start - timedelta(days=7)
+    if period == 'month':
+        return (start - timedelta(days=1)).replace(day=1)
+    return start.replace(year=start.year - 1)
+
+
 @bp.route('/progress/weight', methods=['GET', 'POST'])
 @jwt_required()
 def weight_progress():
@@ -88,33 +123,19 @@ def calorie_consumption():
         end_date = datetime.utcnow().date()
         start_date = end_date - timedelta(days=days-1)
         
-        # Get consumed food with ratings within date range
-        consumed_data = db.session.query(
-            func.date(Recommendation.feedback_date).label('date'),
-            func.sum(Food.caloric_value).label('total_calories')
-        ).join(
-            Food, Recommendation.food_id == Food.id
-        ).filter(
-            Recommendation.user_id == user_id,
-            Recommendation.is_consumed == True,
-            func.date(Recommendation.feedback_date) >= start_date,
-            func.date(Recommendation.feedback_date) <= end_date
-        ).group_by(
-            func.date(Recommendation.feedback_date)
-        ).all()
+        # Satu baris rollup per hari yang punya konsumsi
+        calories_by_date = dict(_rollup_between(
+            user_id, start_date, end_date, DailyNutritionRollup.date, DailyNutritionRollup.kcal
+        ).all())
         
         # Create result with all dates in range
         result = []
-        current_date = start_date
-        while current_date <= end_date:
-            # Find if we have data for this date
-            day_data = next((item for item in consumed_data if item.date == current_date), None)
-            
+        for offset in range(days):
+            current_date = start_date + timedelta(days=offset)
             result.append({
                 'date': current_date.isoformat(),
-                'calories': day_data.total_calories if day_data else 0
+                'calories': calories_by_date.get(current_date, 0)
             })
-            current_date += timedelta(days=1)
         
         return jsonify(result), 200
         
@@ -132,18 +153,12 @@ def nutrition_stats():
         end_date = datetime.utcnow().date()
         start_date = end_date - timedelta(days=6)  # Last 7 days
         
-        # Get nutrition data for consumed food
-        nutrition_data = db.session.query(
-            func.sum(Food.protein).label('protein'),
-            func.sum(Food.carbohydrates).label('carbs'),
-            func.sum(Food.fat).label('fat')
-        ).join(
-            Recommendation, Food.id == Recommendation.food_id
-        ).filter(
-            Recommendation.user_id == user_id,
-            Recommendation.is_consumed == True,
-            func.date(Recommendation.feedback_date) >= start_date,
-            func.date(Recommendation.feedback_date) <= end_date
+        # Get nutrition data for consumed food (maksimal 7 baris rollup)
+        nutrition_data = _rollup_between(
+            user_id, start_date, end_date,
+            func.sum(DailyNutritionRollup.protein).label('protein'),
+            func.sum(DailyNutritionRollup.carbs).label('carbs'),
+            func.sum(DailyNutritionRollup.fat).label('fat')
         ).first()
         
         # Get daily averages
@@ -172,44 +187,36 @@ def streak_info():
         
         # Get dates of food consumption
         consumption_dates = db.session.query(
-            func.date(Recommendation.feedback_date).label('date')
+            DailyNutritionRollup.date
         ).filter(
-            Recommendation.user_id == user_id,
-            Recommendation.is_consumed == True
-        ).distinct().order_by(
-            func.date(Recommendation.feedback_date).desc()
+            DailyNutritionRollup.user_id == user_id
+        ).order_by(
+            DailyNutritionRollup.date.desc()
         ).all()
         
         # Calculate streak
         if not consumption_dates:
             return jsonify({'current_streak': 0, 'longest_streak': 0}), 200
             
-        dates = [d.date for d in consumption_dates]
+        date_set = {d.date for d in consumption_dates}
         
         # Calculate current streak
-        current_streak = 1
-        yesterday = datetime.utcnow().date() - timedelta(days=1)
+        current_streak = 0
+        check_date = datetime.utcnow().date() - timedelta(days=1)
+        while check_date in date_set:
+            current_streak += 1
+            check_date -= timedelta(days=1)
         
-        if yesterday not in dates:
-            current_streak = 0
-        else:
-            check_date = yesterday - timedelta(days=1)
-            while check_date in dates:
-                current_streak += 1
-                check_date -= timedelta(days=1)
-        
-        # Calculate longest streak (simplified - would need more logic for a complete solution)
-        date_set = set(dates)
+        # Longest streak: hitung hanya dari hari pertama setiap rentang (O(jumlah tanggal))
         longest_streak = current_streak
-        
-        for date in sorted(dates):
+        for date in date_set:
+            if date - timedelta(days=1) in date_set:
+                continue
             temp_streak = 1
             next_day = date + timedelta(days=1)
-            
             while next_day in date_set:
                 temp_streak += 1
                 next_day += timedelta(days=1)
-                
             longest_streak = max(longest_streak, temp_streak)
         
         return jsonify({
@@ -218,4 +225,58 @@ def streak_info():
         }), 200
         
     except Exception as e:
-        return jsonify({'message': f'Terjadi kesalahan: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'message': f'Terjadi kesalahan: {str(e)}'}), 500
+
+@bp.route('/progress/trends', methods=['GET'])
+@jwt_required()
+def nutrition_trends():
+    """Tren nutrisi mingguan/bulanan/tahunan dari rollup harian"""
+    try:
+        user_id = get_jwt_identity()
+        period = request.args.get('period', 'month')
+        if period not in TREND_PERIODS:
+            return jsonify({'message': f"period harus salah satu dari: {', '.join(TREND_PERIODS)}"}), 400
+        default_periods, max_periods = TREND_PERIODS[period]
+        periods = min(max(int(request.args.get('periods', default_periods)), 1), max_periods)
+        
+        # Periode berjalan ditambah (periods - 1) periode sebelumnya
+        end_date = datetime.utcnow().date()
+        starts = [_period_start(end_date, period)]
+        for _ in range(periods - 1):
+            starts.append(_previous_period_start(starts[-1], period))
+        starts.reverse()
+        
+        buckets = {
+            start: {'items': 0, 'days_logged': 0, 'totals': dict.fromkeys(TREND_NUTRIENTS, 0.0)}
+            for start in starts
+        }
+        rows = _rollup_between(
+            user_id, starts[0], end_date, DailyNutritionRollup.date, DailyNutritionRollup.items,
+            *[getattr(DailyNutritionRollup, name) for name in TREND_NUTRIENTS]
+        ).all()
+        for row in rows:
+            bucket = buckets[_period_start(row.date, period)]
+            bucket['items'] += row.items
+            bucket['days_logged'] += 1
+            for name in TREND_NUTRIENTS:
+                bucket['totals'][name] += getattr(row, name)
+        
+        result = []
+        for start, bucket in buckets.items():
+            days_logged = bucket['days_logged']
+            result.append({
+                'period_start': start.isoformat(),
+                'days_logged': days_logged,
+                'items': bucket['items'],
+                'totals': {name: round(value, 1) for name, value in bucket['totals'].items()},
+                # Rata-rata per hari yang tercatat, bukan per hari kalender
+                'daily_average': {
+                    name: round(value / days_logged, 1) if days_logged else 0
+                    for name, value in bucket['totals'].items()
+                }
+            })
+        
+        return jsonify({'period': period, 'trends': result}), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Terjadi kesalahan: {str(e)}'}), 500
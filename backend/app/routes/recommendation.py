@@ -1,13 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
-from app.models.food import Food
 from app.models.recommendation import Recommendation, DietGoal, FoodPreference
 from app.utils.hybrid_recommender import HybridDietRecommender
+from app.utils.food_catalog import get_food_catalog
+from app.utils.food_keywords import food_matches
+from app.utils.fallback_pools import get_fallback_pools
+from app.utils.preference_index import get_preference_index
+from app.utils.collaborative_filtering import user_profile_store
+from app.utils.menu_cache import daily_menu_cache
+from app.utils.nutrition_rollup import apply_consumption_change, remove_consumed_recommendations
 from app import db
 from datetime import datetime, date
 import random
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from sqlalchemy import insert
 import traceback
 
 bp = Blueprint('recommendation', __name__)
@@ -40,7 +47,10 @@ def set_preferences():
                 'preferences': {
                     'diet_type': diet_type_pref if diet_type_pref else "",
                     'allergies': allergies_prefs
-                }
+                },
+                'eligible_foods': _eligible_food_counts(
+                    user_id, [pref.preference_type for pref in active_preferences]
+                )
             }), 200
 
         # POST request
@@ -75,6 +85,7 @@ def set_preferences():
             db.session.add_all(new_preferences_to_add)
         
         db.session.commit()
+        daily_menu_cache.invalidate(user_id)
         return jsonify({'message': 'Preferensi makanan berhasil disimpan'}), 201
 
     except Exception as e:
@@ -83,6 +94,33 @@ def set_preferences():
         traceback.print_exc()
         return jsonify({'message': f'Terjadi kesalahan server: {str(e)}'}), 500
 
+@bp.route('/preferences/eligible-count', methods=['GET'])
+@jwt_required()
+def preview_eligible_count():
+    """
+    Jumlah makanan yang cocok untuk kombinasi preferensi yang sedang dipilih di UI
+    (?diet_type=vegetarian&allergies=nut_free,egg_free) tanpa menyimpannya.
+    """
+    try:
+        user_id = get_jwt_identity()
+        preferences = [
+            pref for pref in request.args.get('allergies', '').split(',') if pref
+        ]
+        diet_type = request.args.get('diet_type')
+        if diet_type and diet_type != 'general':
+            preferences.append(diet_type)
+        return jsonify({'eligible_foods': _eligible_food_counts(user_id, preferences)}), 200
+    except Exception as e:
+        print(f"Error di /preferences/eligible-count: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'message': f'Terjadi kesalahan server: {str(e)}'}), 500
+
+def _eligible_food_counts(user_id, preferences: List[str]) -> Dict:
+    """Jumlah makanan per meal type yang cocok dengan preferensi dan kondisi medis goal aktif."""
+    active_goal = DietGoal.query.filter_by(user_id=user_id, status='active').order_by(DietGoal.created_at.desc()).first()
+    medical_condition = active_goal.medical_condition if active_goal and active_goal.medical_condition else 'none'
+    return get_preference_index(get_food_catalog()).eligible_counts(preferences, medical_condition)
+
 @bp.route('/diet-goals', methods=['GET', 'POST'])
 @jwt_required()
 def handle_diet_goals():
@@ -107,6 +145,8 @@ def handle_diet_goals():
             )
             db.session.add(new_goal)
             db.session.commit()
+            user_profile_store.update_user(user_id)
+            daily_menu_cache.invalidate(user_id)
             return jsonify({'message': 'Tujuan diet berhasil disimpan', 'goal_id': new_goal.id}), 201
         except ValueError:
             db.session.rollback()
@@ -142,7 +182,11 @@ def handle_diet_goals():
 @bp.route('/recommend/daily-menu', methods=['GET'])
 @jwt_required()
 def get_daily_menu():
-    """Generate personalized daily menu with diverse recommendations."""
+    """
+    Generate personalized daily menu with diverse recommendations.
+    Menu yang sama disajikan dari cache selama user, goal, preferensi, katalog dan model
+    tidak berubah; ?refresh=1 memaksa menu dibuat ulang.
+    """
     try:
         user_id = get_jwt_identity()
         user = User.query.get_or_404(user_id)
@@ -154,6 +198,16 @@ def get_daily_menu():
         active_preferences_db = FoodPreference.query.filter_by(user_id=user_id, is_active=True).all()
         user_preference_types = [p.preference_type for p in active_preferences_db]
 
+        current_date = date.today()
+        menu_key = (
+            int(user_id), current_date, active_goal.id, tuple(sorted(user_preference_types)),
+            get_food_catalog().version, HybridDietRecommender.MODEL_VERSION, user.updated_at
+        )
+        if request.args.get('refresh') != '1':
+            cached_menu = daily_menu_cache.get(user_id, menu_key, _todays_recommendation_rows(user_id, current_date))
+            if cached_menu is not None:
+                return jsonify(cached_menu), 200
+
         items_per_meal_type = {
             'Sarapan': 10, 
             'Makan Siang': 10,
@@ -173,16 +227,14 @@ def get_daily_menu():
         if not all_candidate_recs:
             return jsonify({'message': 'Tidak ada rekomendasi makanan yang dapat dihasilkan saat ini. Coba sesuaikan preferensi Anda.'}), 200
 
-        current_date = date.today()
-        Recommendation.query.filter_by(user_id=user_id, recommendation_date=current_date).delete()
-        db.session.commit()
-
         meal_type_mapping_frontend = { 
             'Sarapan': 'breakfast', 'Makan Siang': 'lunch', 
             'Makan Malam': 'dinner', 'Cemilan': 'snacks'
         }
         
         daily_menu_response = {key: [] for key in meal_type_mapping_frontend.values()}
+        new_rec_rows = []
+        menu_items = []
         
         meal_groups = {} 
         for rec in all_candidate_recs:
@@ -201,7 +253,7 @@ def get_daily_menu():
                     meal_type_db_name, 
                     needed_fallback,
                     user_preference_types,
-                    user 
+                    active_goal.medical_condition or 'none'
                 )
                 meal_recs_for_type.extend(fallback_recs)
             
@@ -210,15 +262,13 @@ def get_daily_menu():
             for rec_data in selected_recs_for_meal:
                 food_obj = rec_data['food_object'] 
                 
-                new_db_rec = Recommendation(
-                    user_id=user_id,
-                    food_id=food_obj.id,
-                    score=float(rec_data.get('total_score', 0.5)), 
-                    recommendation_date=current_date,
-                    meal_type=rec_data['meal_type'] 
-                )
-                db.session.add(new_db_rec)
-                db.session.flush() 
+                new_rec_rows.append({
+                    'user_id': int(user_id),
+                    'food_id': food_obj.id,
+                    'score': float(rec_data.get('total_score', 0.5)), 
+                    'recommendation_date': current_date,
+                    'meal_type': rec_data['meal_type'] 
+                })
 
                 # --- REFINED PREPARATION LOGIC ---
                 requires_preparation = True  # Default to needing preparation
@@ -231,7 +281,7 @@ def get_daily_menu():
                     requires_preparation = True
                     preparation_notes = "Perlu diolah"
                 elif food_obj.food_status == 'Olahan':
-                    if 'mentah' in food_obj.name.lower():
+                    if food_matches(food_obj, 'raw'):
                         requires_preparation = True
                         preparation_notes = "Perlu diolah (mentah)"
                     else:
@@ -241,9 +291,9 @@ def get_daily_menu():
                 # If food_status is None or unexpected, the default from above applies.
                 # --- END REFINED PREPARATION LOGIC ---
 
-                daily_menu_response[frontend_key].append({
+                menu_item = {
                     'id': food_obj.id, 
-                    'recommendation_id': new_db_rec.id, 
+                    'recommendation_id': None,  # Diisi setelah insert massal 
                     'food_code': food_obj.food_code, 
                     'name': food_obj.name,
                     'caloric_value_kcal': round(food_obj.caloric_value, 1) if food_obj.caloric_value is not None else 0,
@@ -267,9 +317,19 @@ def get_daily_menu():
                         'contains_eggs': food_obj.contains_eggs,
                         'contains_soy': food_obj.contains_soy,
                     }
-                })
+                }
+                menu_items.append(menu_item)
+                daily_menu_response[frontend_key].append(menu_item)
+
+        # Hapus menu lama dan simpan menu baru dalam satu transaksi
+        had_rated_recs, new_rec_ids = _replace_daily_recommendations(user_id, current_date, new_rec_rows)
+        for menu_item, rec_id in zip(menu_items, new_rec_ids):
+            menu_item['recommendation_id'] = rec_id
 
         db.session.commit()
+        if had_rated_recs:
+            user_profile_store.update_user(user_id)
+        daily_menu_cache.put(user_id, menu_key, _todays_recommendation_rows(user_id, current_date), daily_menu_response)
         return jsonify(daily_menu_response), 200
 
     except Exception as e:
@@ -278,133 +338,92 @@ def get_daily_menu():
         traceback.print_exc() 
         return jsonify({'message': f'Terjadi kesalahan server: {str(e)}', 'error_type': type(e).__name__}), 500
 
+def _replace_daily_recommendations(user_id, current_date: date, rows: List[Dict]) -> Tuple[bool, List[int]]:
+    """
+    Ganti rekomendasi user pada tanggal tersebut tanpa commit: satu SELECT agregat untuk rollup
+    nutrisi (ditambah satu UPDATE per hari konsumsi dan satu DELETE jika ada yang sudah dikonsumsi),
+    satu DELETE, satu INSERT multi-baris dan satu SELECT id. Mengembalikan (ada rekomendasi lama yang sudah dirating, id baru sesuai urutan rows).
+    """
+    todays_recs = Recommendation.query.filter_by(user_id=user_id, recommendation_date=current_date)
+    # Menghapus rekomendasi yang sudah dirating mengubah rata-rata rating (fitur profil CF)
+    had_rated_recs = todays_recs.filter(Recommendation.rating.isnot(None)).first() is not None
+    # Makanan yang sudah dikonsumsi ikut terhapus; keluarkan dulu dari rollup nutrisi harian
+    remove_consumed_recommendations(int(user_id), current_date)
+    todays_recs.delete(synchronize_session=False)
+    if not rows:
+        return had_rated_recs, []
+
+    # Satu INSERT multi-baris; id auto increment dalam satu statement naik sesuai urutan baris
+    # (MySQL tidak mendukung RETURNING, jadi id dibaca ulang dengan satu SELECT)
+    db.session.execute(insert(Recommendation).values(rows))
+    new_ids = db.session.query(Recommendation.id).filter_by(
+        user_id=user_id, recommendation_date=current_date
+    ).order_by(Recommendation.id).all()
+    return had_rated_recs, [row.id for row in new_ids]
+
+def _todays_recommendation_rows(user_id, current_date: date) -> List[tuple]:
+    """(id, rating, is_consumed) rekomendasi hari ini, untuk memvalidasi cache menu."""
+    rows = db.session.query(
+        Recommendation.id, Recommendation.rating, Recommendation.is_consumed
+    ).filter_by(user_id=user_id, recommendation_date=current_date).order_by(Recommendation.id).all()
+    return [tuple(row) for row in rows]
+
 def _get_fallback_recommendations(
     target_meal_type: str, 
     count: int, 
     preferences: List[str],
-    user: User 
+    medical_condition: str
     ) -> List[Dict]:
-    """Get fallback recommendations when not enough diverse options available."""
+    """
+    Get fallback recommendations when not enough diverse options available.
+    Kandidat diambil dari pool per (meal_type, kondisi medis) yang dihitung sekali per versi
+    katalog, lalu difilter dengan mask preferensi di memori (tanpa query database).
+    """
     try:
-        # Get active diet goal to check medical condition
-        active_goal = DietGoal.query.filter_by(user_id=user.id, status='active').first()
-        medical_condition = active_goal.medical_condition if active_goal else 'none'
-        
-        query = Food.query.filter(Food.meal_type.ilike(f'%{target_meal_type}%'))
-        
-        # Apply medical condition specific calorie limits
-        if medical_condition == 'obesity':
-            # Stricter calorie limits for obesity
-            if target_meal_type == 'Sarapan':
-                query = query.filter(Food.caloric_value.between(80, 250))
-            elif target_meal_type == 'Cemilan':
-                query = query.filter(Food.caloric_value.between(30, 150))
-            elif target_meal_type in ['Makan Siang', 'Makan Malam']:
-                query = query.filter(Food.caloric_value.between(200, 350))
-        elif medical_condition == 'diabetes':
-            # Moderate calorie limits with carb consideration
-            if target_meal_type == 'Sarapan':
-                query = query.filter(Food.caloric_value.between(100, 300))
-            elif target_meal_type == 'Cemilan':
-                query = query.filter(Food.caloric_value.between(50, 200))
-            elif target_meal_type in ['Makan Siang', 'Makan Malam']:
-                query = query.filter(Food.caloric_value.between(250, 400))
-            # Add carb filter
-            query = query.filter(Food.carbohydrates <= 30)
-        elif medical_condition == 'hypertension':
-            # Standard calorie limits but focus on sodium
-            if target_meal_type == 'Sarapan':
-                query = query.filter(Food.caloric_value.between(100, 400))
-            elif target_meal_type == 'Cemilan':
-                query = query.filter(Food.caloric_value.between(50, 250))
-            elif target_meal_type in ['Makan Siang', 'Makan Malam']:
-                query = query.filter(Food.caloric_value.between(250, 500))
-            # Add sodium filter
-            query = query.filter(db.or_(Food.sodium.is_(None), Food.sodium <= 300))
-        else:
-            # Standard limits for no medical condition
-            if target_meal_type == 'Sarapan':
-                query = query.filter(Food.caloric_value.between(100, 500))
-            elif target_meal_type == 'Cemilan':
-                query = query.filter(Food.caloric_value.between(50, 350))
-            elif target_meal_type in ['Makan Siang', 'Makan Malam']:
-                query = query.filter(Food.caloric_value.between(250, 750))
-        
-        candidate_foods = query.limit(count * 5).all()
-        
-        # Additional filtering for medical conditions
-        if medical_condition != 'none':
-            filtered_candidates = []
-            for food in candidate_foods:
-                food_name_lower = food.name.lower()
-                
-                # Skip problematic foods based on medical condition
-                skip_food = False
-                
-                if medical_condition == 'diabetes':
-                    high_carb_keywords = ['tepung', 'gula', 'sirup', 'dodol', 'kue manis']
-                    if any(keyword in food_name_lower for keyword in high_carb_keywords):
-                        skip_food = True
-                elif medical_condition == 'hypertension':
-                    high_sodium_keywords = ['dendeng', 'asin', 'kering', 'keripik', 'abon', 'terasi']
-                    if any(keyword in food_name_lower for keyword in high_sodium_keywords):
-                        skip_food = True
-                elif medical_condition == 'obesity':
-                    high_cal_keywords = ['goreng', 'keripik', 'dendeng', 'rempeyek']
-                    if any(keyword in food_name_lower for keyword in high_cal_keywords):
-                        skip_food = True
-                
-                if not skip_food:
-                    filtered_candidates.append(food)
-            
-            candidate_foods = filtered_candidates
-        
+        catalog = get_food_catalog()
+        positions, base_scores = get_fallback_pools(catalog).candidates(
+            target_meal_type, medical_condition, preferences, count * 5
+        )
+
+        selected = list(range(len(positions)))
+        random.shuffle(selected)
+
         filtered_foods_for_fallback = []
-        temp_recommender = HybridDietRecommender() 
+        for index in selected[:count]:
+            food = catalog.foods[positions[index]]
+            base_score = float(base_scores[index])
 
-        for food in candidate_foods:
-            if temp_recommender._matches_preferences(food, preferences): 
-                # Determine preparation requirements
-                requires_preparation_fallback = True
-                preparation_notes_fallback = "Info persiapan tidak jelas, anggap perlu diolah"
+            # Determine preparation requirements
+            requires_preparation_fallback = True
+            preparation_notes_fallback = "Info persiapan tidak jelas, anggap perlu diolah"
 
-                if food.food_status == 'Bahan Dasar':
-                    requires_preparation_fallback = True
-                    preparation_notes_fallback = "Bahan dasar, perlu diolah"
-                elif food.food_status == 'Tunggal':
+            if food.food_status == 'Bahan Dasar':
+                requires_preparation_fallback = True
+                preparation_notes_fallback = "Bahan dasar, perlu diolah"
+            elif food.food_status == 'Tunggal':
+                requires_preparation_fallback = True
+                preparation_notes_fallback = "Perlu diolah"
+            elif food.food_status == 'Olahan':
+                if food_matches(food, 'raw'):
                     requires_preparation_fallback = True
-                    preparation_notes_fallback = "Perlu diolah"
-                elif food.food_status == 'Olahan':
-                    if 'mentah' in food.name.lower():
-                        requires_preparation_fallback = True
-                        preparation_notes_fallback = "Perlu diolah (mentah)"
-                    else:
-                        requires_preparation_fallback = False
-                        preparation_notes_fallback = "Umumnya siap saji"
-                
-                # Adjust score based on medical condition suitability
-                base_score = 0.35
-                if medical_condition == 'obesity' and food.caloric_value and food.caloric_value < 200:
-                    base_score = 0.45
-                elif medical_condition == 'diabetes' and food.carbohydrates and food.carbohydrates < 15:
-                    base_score = 0.45
-                elif medical_condition == 'hypertension' and food.sodium and food.sodium < 200:
-                    base_score = 0.45
-                
-                filtered_foods_for_fallback.append({
-                    'food_id': food.id,
-                    'food_object': food, 
-                    'total_score': base_score,  
-                    'cf_score': 0.0,
-                    'nutrition_score': base_score, 
-                    'meal_type': food.meal_type if food.meal_type and food.meal_type != 'Bahan Dasar' else target_meal_type, 
-                    'medical_bonus': 0.0,
-                    'requires_preparation': requires_preparation_fallback,
-                    'preparation_notes': preparation_notes_fallback
-                })
-        
-        random.shuffle(filtered_foods_for_fallback)
-        return filtered_foods_for_fallback[:count]
+                    preparation_notes_fallback = "Perlu diolah (mentah)"
+                else:
+                    requires_preparation_fallback = False
+                    preparation_notes_fallback = "Umumnya siap saji"
+
+            filtered_foods_for_fallback.append({
+                'food_id': food.id,
+                'food_object': food, 
+                'total_score': base_score,  
+                'cf_score': 0.0,
+                'nutrition_score': base_score, 
+                'meal_type': food.meal_type if food.meal_type and food.meal_type != 'Bahan Dasar' else target_meal_type, 
+                'medical_bonus': 0.0,
+                'requires_preparation': requires_preparation_fallback,
+                'preparation_notes': preparation_notes_fallback
+            })
+
+        return filtered_foods_for_fallback
         
     except Exception as e:
         print(f"Error getting fallback recommendations: {str(e)}")
@@ -427,9 +446,10 @@ def submit_feedback():
         if not recommendation:
             return jsonify({'message': 'Rekomendasi tidak ditemukan'}), 404
         
-        if recommendation.user_id != user_id:
+        if recommendation.user_id != int(user_id):
             return jsonify({'message': 'Tidak diizinkan memberi feedback untuk rekomendasi ini'}), 403
 
+        previous_consumed_date = recommendation.consumed_date
         recommendation.is_consumed = data.get('is_consumed', recommendation.is_consumed)
         
         if data.get('rating') is not None:
@@ -443,6 +463,8 @@ def submit_feedback():
                 return jsonify({'message': 'Rating harus berupa angka'}), 400
         
         recommendation.feedback_date = datetime.utcnow()
+        recommendation.sync_consumed_date()
+        apply_consumption_change(recommendation, previous_consumed_date)
 
         if recommendation.rating is not None:
             recommender = HybridDietRecommender()
@@ -453,6 +475,9 @@ def submit_feedback():
             )
 
         db.session.commit()
+        if data.get('rating') is not None:
+            user_profile_store.update_user(user_id)
+        daily_menu_cache.invalidate(user_id)
         return jsonify({'message': 'Feedback berhasil disimpan', 'should_refresh': False }), 200
 
     except Exception as e:
@@ -1,20 +1,21 @@
 import numpy as np
-from sklearn.neighbors import NearestNeighbors
+import threading
+import time
+from flask import current_app
 from app.models.user import User
 from app.models.recommendation import Recommendation, DietGoal
-from app.models.food import Food
+from app.utils.food_catalog import get_food_catalog
+from app.utils.neighbor_index import create_neighbor_index
 from sqlalchemy import func
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from app import db
 
+N_PROFILE_FEATURES = 7
+
 class DietCollaborativeFiltering:
-    def __init__(self, n_neighbors: int = 5):
+    def __init__(self, n_neighbors: int = 5, profile_store: 'UserProfileStore' = None):
         self.k = n_neighbors
-        self.model = NearestNeighbors(
-            n_neighbors=n_neighbors,
-            metric='cosine',
-            algorithm='brute'
-        )
+        self.profile_store = profile_store or user_profile_store
 
     def _create_user_profile_matrix(self) -> Tuple[np.ndarray, List[int]]:
         """
@@ -23,98 +24,127 @@ class DietCollaborativeFiltering:
         2. Activity level
         3. Medical condition
         4. Preferensi makanan (rating)
+        Semua data dimuat dengan satu query, berapa pun jumlah user.
         """
-        users = User.query.all()
-        user_ids = [user.id for user in users]
+        rows = self._profile_rows_query().all()
+        user_ids = [row.id for row in rows]
         
         # Matriks profil (n_users x n_features)
-        profile_matrix = np.zeros((len(users), 7))
+        profile_matrix = np.zeros((len(rows), N_PROFILE_FEATURES))
         
-        for idx, user in enumerate(users):
-            # Normalisasi BMI
-            height_m = user.height / 100
-            bmi = user.weight / (height_m ** 2)
-            profile_matrix[idx, 0] = self._normalize_value(bmi, 18.5, 30)
-            
-            # Normalisasi usia
-            profile_matrix[idx, 1] = self._normalize_value(user.age, 18, 80)
-            
-            # Activity level encoding
-            activity_levels = {
-                'sedentary': 0, 'light': 0.25,
-                'moderate': 0.5, 'active': 0.75,
-                'very_active': 1
-            }
-            profile_matrix[idx, 2] = activity_levels[user.activity_level]
-            
-            # Medical condition encoding (replacing the previous goal_type encoding)
-            goal = DietGoal.query.filter_by(
-                user_id=user.id,
-                status='active'
-            ).first()
-            
-            # Default encoding for medical conditions
-            med_condition_encoding = [0, 0, 0]
-            
-            if goal:
-                conditions = {
-                    'diabetes': [1, 0, 0],
-                    'hypertension': [0, 1, 0],
-                    'obesity': [0, 0, 1],
-                    'none': [0, 0, 0]
-                }
-                med_condition_encoding = conditions.get(goal.medical_condition, [0, 0, 0])
-            
-            profile_matrix[idx, 3:6] = med_condition_encoding
-            
-            # Rating preference
-            avg_rating = db.session.query(func.avg(Recommendation.rating))\
-                .filter_by(user_id=user.id)\
-                .scalar() or 0
-            profile_matrix[idx, 6] = avg_rating / 5  # Normalize to 0-1
+        for idx, row in enumerate(rows):
+            profile_matrix[idx] = self._profile_vector(row, row.medical_condition, row.avg_rating or 0)
             
         return profile_matrix, user_ids
 
+    def _profile_rows_query(self, user_id: Optional[int] = None):
+        """
+        users LEFT JOIN goal aktif LEFT JOIN agregat rating.
+        Goal aktif = goal aktif dengan id terkecil per user (sama seperti .first() sebelumnya).
+        """
+        active_goal_ids = db.session.query(
+            DietGoal.user_id.label('user_id'),
+            func.min(DietGoal.id).label('goal_id')
+        ).filter(DietGoal.status == 'active')
+
+        rating_stats = db.session.query(
+            Recommendation.user_id.label('user_id'),
+            func.avg(Recommendation.rating).label('avg_rating')
+        )
+
+        if user_id is not None:
+            active_goal_ids = active_goal_ids.filter(DietGoal.user_id == user_id)
+            rating_stats = rating_stats.filter(Recommendation.user_id == user_id)
+        active_goal_ids = active_goal_ids.group_by(DietGoal.user_id).subquery()
+        rating_stats = rating_stats.group_by(Recommendation.user_id).subquery()
+
+        query = db.session.query(
+            User.id, User.height, User.weight, User.age, User.activity_level,
+            DietGoal.medical_condition, rating_stats.c.avg_rating
+        ).outerjoin(
+            active_goal_ids, active_goal_ids.c.user_id == User.id
+        ).outerjoin(
+            DietGoal, DietGoal.id == active_goal_ids.c.goal_id
+        ).outerjoin(
+            rating_stats, rating_stats.c.user_id == User.id
+        )
+        if user_id is not None:
+            query = query.filter(User.id == user_id)
+        return query.order_by(User.id)
+
+    def _build_user_profile(self, user_id: int) -> Optional[np.ndarray]:
+        """Vektor profil satu user (None jika user tidak ada)."""
+        row = self._profile_rows_query(user_id).first()
+        if row is None:
+            return None
+        return self._profile_vector(row, row.medical_condition, row.avg_rating or 0)
+
+    def _profile_vector(self, user: User, medical_condition: str, avg_rating: float) -> np.ndarray:
+        profile = np.zeros(N_PROFILE_FEATURES)
+
+        # Normalisasi BMI
+        height_m = user.height / 100
+        bmi = user.weight / (height_m ** 2)
+        profile[0] = self._normalize_value(bmi, 18.5, 30)
+        
+        # Normalisasi usia
+        profile[1] = self._normalize_value(user.age, 18, 80)
+        
+        # Activity level encoding
+        activity_levels = {
+            'sedentary': 0, 'light': 0.25,
+            'moderate': 0.5, 'active': 0.75,
+            'very_active': 1
+        }
+        profile[2] = activity_levels[user.activity_level]
+        
+        # Medical condition encoding (replacing the previous goal_type encoding)
+        conditions = {
+            'diabetes': [1, 0, 0],
+            'hypertension': [0, 1, 0],
+            'obesity': [0, 0, 1],
+            'none': [0, 0, 0]
+        }
+        profile[3:6] = conditions.get(medical_condition, [0, 0, 0])
+        
+        # Rating preference
+        profile[6] = float(avg_rating) / 5  # Normalize to 0-1
+        return profile
+
     def _normalize_value(self, value: float, min_val: float, max_val: float) -> float:
         """Normalisasi nilai ke range 0-1"""
         return min(1.0, max(0.0, (value - min_val) / (max_val - min_val)))
 
     def get_recommendations(self, user_id: int, n_recommendations: int = 10) -> List[Dict]:
         """Mendapatkan rekomendasi makanan untuk user"""
-        profile_matrix, user_ids = self._create_user_profile_matrix()
+        self.profile_store.ensure_loaded(self)
         
         # If not enough users for collaborative filtering
-        if len(user_ids) < self.k:
+        if self.profile_store.size < self.k:
             return self._get_fallback_recommendations(n_recommendations)
         
-        # Fit model
-        self.model.fit(profile_matrix)
-        
-        # Dapatkan user index
-        try:
-            user_idx = user_ids.index(user_id)
-        except ValueError:
+        # Cari k tetangga terdekat tanpa fit ulang
+        similar_users = self.profile_store.nearest_users(user_id, self.k)
+        if similar_users is None:
             # If user not found, fall back to default recommendations
             return self._get_fallback_recommendations(n_recommendations)
-            
-        user_profile = profile_matrix[user_idx].reshape(1, -1)
-        
-        # Cari k tetangga terdekat
-        distances, indices = self.model.kneighbors(user_profile)
-        
-        # Dapatkan rekomendasi dari tetangga
-        similar_users = [user_ids[idx] for idx in indices[0]]
         
-        # Ambil makanan yang disukai oleh similar users
+        # Ambil makanan dengan rating tinggi dari semua similar users dalam satu query
+        liked_rows = db.session.query(
+            Recommendation.user_id, Recommendation.food_id, Recommendation.rating
+        ).filter(
+            Recommendation.user_id.in_(similar_users),
+            Recommendation.rating >= 4
+        ).order_by(Recommendation.id).all()
+
+        likes_by_user = {}
+        for rec in liked_rows:
+            likes_by_user.setdefault(rec.user_id, []).append(rec)
+
+        # Ambil makanan yang disukai oleh similar users (urut dari tetangga terdekat)
         recommended_foods = {}
         for sim_user_id in similar_users:
-            # Ambil makanan dengan rating tinggi
-            good_recommendations = Recommendation.query\
-                .filter_by(user_id=sim_user_id)\
-                .filter(Recommendation.rating >= 4)\
-                .all()
-                
-            for rec in good_recommendations:
+            for rec in likes_by_user.get(sim_user_id, []):
                 if rec.food_id not in recommended_foods:
                     recommended_foods[rec.food_id] = {
                         'score': 0,
@@ -141,22 +171,184 @@ class DietCollaborativeFiltering:
      
     def _get_fallback_recommendations(self, n_recommendations: int) -> List[Dict]:
         """Fallback to simple recommendations when not enough users"""
+        catalog = get_food_catalog()
+
         # Get highest rated foods
-        top_foods = Food.query\
-            .join(Recommendation)\
-            .group_by(Food.id)\
+        top_food_rows = db.session.query(Recommendation.food_id)\
+            .group_by(Recommendation.food_id)\
             .order_by(func.avg(Recommendation.rating).desc())\
             .limit(n_recommendations)\
             .all()
+        top_food_ids = [row.food_id for row in top_food_rows if row.food_id in catalog.position_by_id]
             
         # If no rated foods yet, get any foods
-        if not top_foods:
-            top_foods = Food.query.limit(n_recommendations).all()
+        if not top_food_ids:
+            top_food_ids = catalog.ids[:n_recommendations].tolist()
             
         return [
             {
-                'food_id': food.id,
+                'food_id': food_id,
                 'cf_score': 0.5  # neutral score
             }
-            for food in top_foods
-        ]
\ No newline at end of file
+            for food_id in top_food_ids
+        ]
+
+
+class UserProfileStore:
+    """
+    Matriks profil user yang disimpan di memori proses.
+    Dibangun sekali, lalu diperbarui per user saat profil, goal, atau rating berubah,
+    sehingga pencarian tetangga tidak perlu membangun ulang matriks atau fit ulang model.
+    """
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = backend  # None = ikuti CF_NEIGHBOR_BACKEND di config
+        self.index = None
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()  # Hanya satu pemuatan ulang penuh pada satu waktu
+        self._pending_updates = None  # user yang diperbarui selama pemuatan ulang berjalan
+        self._matrix = np.zeros((0, N_PROFILE_FEATURES))
+        self._unit = np.zeros((0, N_PROFILE_FEATURES))  # Baris yang dinormalisasi (untuk cosine)
+        self.user_ids = []
+        self.row_of = {}
+        self.size = 0
+        self.loaded_at = None
+
+    def _max_age(self) -> float:
+        # Perubahan dari proses worker lain baru terlihat setelah muat ulang penuh
+        return current_app.config.get('CF_PROFILE_MAX_AGE_SECONDS', 300)
+
+    def _is_fresh(self) -> bool:
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at < self._max_age()
+
+    def ensure_loaded(self, cf: DietCollaborativeFiltering = None) -> None:
+        """
+        Muat ulang matriks jika sudah kedaluwarsa. Query dan pembangunan index berjalan di luar
+        self._lock: request lain tetap melayani matriks lama lalu matriks baru dipasang sekaligus.
+        Hanya pemuatan pertama (belum ada matriks sama sekali) yang membuat request menunggu.
+        """
+        if self._is_fresh():
+            return
+        if not self._reload_lock.acquire(blocking=self.index is None):
+            return  # Request lain sedang memuat ulang
+        try:
+            if not self._is_fresh():
+                self._reload(cf)
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self, cf: DietCollaborativeFiltering = None) -> None:
+        with self._lock:
+            self._pending_updates = set()
+        try:
+            matrix, user_ids = (cf or DietCollaborativeFiltering(profile_store=self))._create_user_profile_matrix()
+            state = self._build_state(matrix, user_ids)
+        finally:
+            with self._lock:
+                pending, self._pending_updates = self._pending_updates, None
+        with self._lock:
+            self._swap_state(state)
+            self.loaded_at = time.monotonic()
+        # Profil yang berubah selama query berjalan mungkin belum terbaca; hitung ulang per user
+        for user_id in pending:
+            self.update_user(user_id)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.loaded_at = None
+
+    def _build_state(self, matrix: np.ndarray, user_ids: List[int]) -> Dict:
+        """Array profil dan index tetangga baru, dibangun tanpa menyentuh state yang sedang dipakai."""
+        capacity = max(16, len(user_ids) * 2)
+        full = np.zeros((capacity, N_PROFILE_FEATURES))
+        unit = np.zeros((capacity, N_PROFILE_FEATURES))
+        full[:len(user_ids)] = matrix
+        unit[:len(user_ids)] = self._normalize_rows(matrix)
+        index = self._create_index()
+        index.build(unit[:len(user_ids)])
+        return {
+            '_matrix': full,
+            '_unit': unit,
+            'user_ids': list(user_ids),
+            'row_of': {user_id: idx for idx, user_id in enumerate(user_ids)},
+            'size': len(user_ids),
+            'index': index,
+        }
+
+    def _swap_state(self, state: Dict) -> None:
+        for attr, value in state.items():
+            setattr(self, attr, value)
+
+    def _set_matrix(self, matrix: np.ndarray, user_ids: List[int]) -> None:
+        state = self._build_state(matrix, user_ids)
+        with self._lock:
+            self._swap_state(state)
+
+    def _create_index(self):
+        config = current_app.config
+        backend = self.backend or config.get('CF_NEIGHBOR_BACKEND', 'brute')
+        if backend == 'lsh':
+            return create_neighbor_index(
+                backend,
+                n_tables=config.get('CF_LSH_TABLES', 8),
+                n_bits=config.get('CF_LSH_BITS', 12)
+            )
+        return create_neighbor_index(backend)
+
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix, dtype=np.float64), where=norms > 0)
+
+    def update_user(self, user_id) -> None:
+        """Hitung ulang (atau tambahkan) baris profil satu user."""
+        user_id = int(user_id)
+        with self._lock:
+            if self._pending_updates is not None:
+                self._pending_updates.add(user_id)  # Dihitung ulang lagi setelah matriks baru dipasang
+        if self.loaded_at is None:
+            return  # Belum dimuat, baris akan ikut dibangun saat pemuatan penuh
+        try:
+            profile = DietCollaborativeFiltering(profile_store=self)._build_user_profile(user_id)
+            if profile is None:
+                return
+        except Exception as e:
+            print(f"Error updating CF profile for user {user_id}: {e}")
+            self.invalidate()
+            return
+
+        with self._lock:
+            idx = self.row_of.get(user_id)
+            if idx is None:
+                idx = self.size
+                if idx >= len(self._matrix):
+                    self._grow()
+                self.user_ids.append(user_id)
+                self.row_of[user_id] = idx
+                self.size += 1
+            self._matrix[idx] = profile
+            self._unit[idx] = self._normalize_rows(profile.reshape(1, -1))[0]
+            self.index.update(self._unit[:self.size], idx)
+
+    def _grow(self) -> None:
+        capacity = len(self._matrix) * 2
+        for attr in ('_matrix', '_unit'):
+            grown = np.zeros((capacity, N_PROFILE_FEATURES))
+            grown[:self.size] = getattr(self, attr)[:self.size]
+            setattr(self, attr, grown)
+
+    def nearest_users(self, user_id: int, k: int) -> Optional[List[int]]:
+        """
+        k user terdekat (cosine), termasuk user itu sendiri. None jika user tidak dikenal.
+        Pencarian didelegasikan ke backend tetangga (brute, ball_tree, kd_tree, lsh).
+        """
+        with self._lock:
+            idx = self.row_of.get(user_id)
+            if idx is None:
+                return None
+            rows = self.index.query(self._unit[:self.size], idx, k)
+            return [self.user_ids[i] for i in rows]
+
+
+# Satu store per proses, dipakai bersama oleh semua request
+user_profile_store = UserProfileStore()
@@ -0,0 +1,152 @@
+from typing import List, Optional
+import numpy as np
+
+COMPILED_FORMAT_VERSION = 1
+
+
+class CompiledDecisionTree:
+    """
+    Decision tree yang diratakan menjadi array NumPy (feature, threshold, children, proba)
+    sehingga inferensi tidak membutuhkan sklearn/pandas. Semua baris dievaluasi sekaligus:
+    setiap langkah memindahkan seluruh baris satu level ke bawah dengan indexing array.
+    Hasilnya sama persis dengan predict_proba sklearn (perbandingan float32 <= threshold float64
+    dan normalisasi nilai leaf yang sama).
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children_left: np.ndarray,
+        children_right: np.ndarray,
+        proba: np.ndarray,
+        feature_columns: List[str],
+        missing_go_to_left: Optional[np.ndarray] = None,
+        positive_class_index: int = 1
+    ):
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.children_left = np.asarray(children_left, dtype=np.int64)
+        self.children_right = np.asarray(children_right, dtype=np.int64)
+        self.proba = np.asarray(proba, dtype=np.float64)  # (n_nodes, n_classes), sudah dinormalisasi
+        self.feature_columns = list(feature_columns)
+        self.missing_go_to_left = (
+            np.asarray(missing_go_to_left, dtype=bool) if missing_go_to_left is not None
+            else np.zeros(len(self.feature), dtype=bool)
+        )
+        self.positive_class_index = positive_class_index
+        self.is_leaf = self.children_left == -1
+        self.max_depth = self._depth()
+        # Daun mengarah ke dirinya sendiri, sehingga loop tidak perlu cabang khusus
+        self._next_left = np.where(self.is_leaf, np.arange(len(self.feature)), self.children_left)
+        self._next_right = np.where(self.is_leaf, np.arange(len(self.feature)), self.children_right)
+        self._safe_feature = np.where(self.is_leaf, 0, self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model, feature_columns: Optional[List[str]] = None) -> 'CompiledDecisionTree':
+        """Ratakan DecisionTreeClassifier yang sudah dilatih."""
+        tree = model.tree_
+        value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        if np.allclose(normalizer, 1.0):
+            # sklearn >= 1.4 menyimpan fraksi dan predict_proba mengembalikannya apa adanya;
+            # dibagi lagi akan menggeser 1 ULP jika jumlahnya tidak tepat 1 (mis. class_weight)
+            normalizer = np.ones_like(normalizer)
+        normalizer[normalizer == 0.0] = 1.0
+        if feature_columns is None:
+            names = getattr(model, 'feature_names_in_', None)
+            feature_columns = list(names) if names is not None else [f'x{i}' for i in range(model.n_features_in_)]
+        return cls(
+            feature=tree.feature,
+            threshold=tree.threshold,
+            children_left=tree.children_left,
+            children_right=tree.children_right,
+            proba=value / normalizer,
+            feature_columns=feature_columns,
+            missing_go_to_left=getattr(tree, 'missing_go_to_left', None)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledDecisionTree':
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != COMPILED_FORMAT_VERSION:
+                raise ValueError(f"Format artefak tidak didukung: {int(data['format_version'])}")
+            return cls(
+                feature=data['feature'],
+                threshold=data['threshold'],
+                children_left=data['children_left'],
+                children_right=data['children_right'],
+                proba=data['proba'],
+                feature_columns=[str(name) for name in data['feature_columns']],
+                missing_go_to_left=data['missing_go_to_left'],
+                positive_class_index=int(data['positive_class_index'])
+            )
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                format_version=np.array(COMPILED_FORMAT_VERSION),
+                feature=self.feature.astype(np.int32),
+                threshold=self.threshold,
+                children_left=self.children_left.astype(np.int32),
+                children_right=self.children_right.astype(np.int32),
+                proba=self.proba,
+                feature_columns=np.array(self.feature_columns),
+                missing_go_to_left=self.missing_go_to_left,
+                positive_class_index=np.array(self.positive_class_index)
+            )
+
+    def _depth(self) -> int:
+        depth = np.zeros(len(self.feature), dtype=np.int64)
+        for node in range(len(self.feature)):  # Anak selalu punya indeks lebih besar dari induknya
+            if not self.is_leaf[node]:
+                depth[self.children_left[node]] = depth[node] + 1
+                depth[self.children_right[node]] = depth[node] + 1
+        return int(depth.max()) if len(depth) else 0
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Indeks leaf untuk setiap baris X (n_samples x n_features)."""
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.zeros(X.shape[0], dtype=np.int64)
+        rows = np.arange(X.shape[0])
+        for _ in range(self.max_depth):
+            values = X[rows, self._safe_feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            missing = np.isnan(values)
+            if missing.any():
+                go_left = np.where(missing, self.missing_go_to_left[nodes], go_left)
+            nodes = np.where(go_left, self._next_left[nodes], self._next_right[nodes])
+        return nodes
+
+    def apply_cross(self, user_rows: np.ndarray, food_rows: np.ndarray, user_columns: np.ndarray) -> np.ndarray:
+        """
+        Indeks leaf untuk semua pasangan user x makanan tanpa menyusun matriks
+        (n_users * n_foods) x n_features. Baris pasangan (i, j) sama dengan user_rows[i] pada
+        kolom user_columns dan food_rows[j] pada kolom lainnya; hasil urut per user (baris i * n_foods + j).
+        """
+        n_users, n_foods = len(user_rows), len(food_rows)
+        X = np.concatenate([np.asarray(user_rows, dtype=np.float32), np.asarray(food_rows, dtype=np.float32)])
+        user_source = np.repeat(np.arange(n_users), n_foods)
+        food_source = np.tile(np.arange(n_users, n_users + n_foods), n_users)
+        node_reads_user = np.zeros(X.shape[1], dtype=bool)
+        node_reads_user[user_columns] = True
+        node_reads_user = node_reads_user[self._safe_feature]
+
+        nodes = np.zeros(n_users * n_foods, dtype=np.int64)
+        for _ in range(self.max_depth):
+            sources = np.where(node_reads_user[nodes], user_source, food_source)
+            values = X[sources, self._safe_feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            missing = np.isnan(values)
+            if missing.any():
+                go_left = np.where(missing, self.missing_go_to_left[nodes], go_left)
+            nodes = np.where(go_left, self._next_left[nodes], self._next_right[nodes])
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.proba[self.apply(X)]
+
+    def predict_positive(self, X: np.ndarray) -> np.ndarray:
+        """Probabilitas kelas 'direkomendasikan' (kolom 1 predict_proba)."""
+        return self.proba[self.apply(X), self.positive_class_index]
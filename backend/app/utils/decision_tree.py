@@ -1,7 +1,10 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from app.models.user import User
 from app.models.recommendation import DietGoal
 from app.models.food import Food
+from app.utils.food_catalog import get_food_catalog
+from app.utils.food_keywords import food_matches
 
 class NutritionDecisionTree:
     def __init__(self):
@@ -16,31 +19,11 @@ class NutritionDecisionTree:
         if medical_condition == 'none':
             return True
             
-        food_name_lower = food.name.lower()
         calories = food.caloric_value or 0
         carbs = food.carbohydrates or 0
         sodium = food.sodium or 0
         fat = food.fat or 0
         
-        # High sodium foods to avoid for hypertension
-        high_sodium_foods = [
-            'dendeng', 'ikan asin', 'ikan kering', 'terasi', 'kerupuk', 
-            'kecap', 'tauco', 'abon', 'sosis', 'kornet', 'sardines',
-            'keripik', 'rempeyek', 'emping', 'krupuk'
-        ]
-        
-        # High carb foods to limit for diabetes
-        high_carb_foods = [
-            'tepung', 'nasi', 'mie', 'pasta', 'roti manis', 'kue',
-            'dodol', 'gula', 'sirup', 'es krim', 'permen'
-        ]
-        
-        # High calorie fried foods to avoid for obesity
-        high_cal_fried_foods = [
-            'goreng', 'keripik', 'gorengan', 'rempeyek', 'krupuk',
-            'dendeng', 'rendang'
-        ]
-        
         if medical_condition == 'diabetes':
             # Reject high carb foods (>30g carbs per serving)
             if carbs > 30:
@@ -49,7 +32,7 @@ class NutritionDecisionTree:
             if calories > 400:
                 return False
             # Reject foods with diabetes-unfriendly keywords
-            if any(keyword in food_name_lower for keyword in high_carb_foods):
+            if food_matches(food, 'high_carb'):
                 return False
                 
         elif medical_condition == 'hypertension':
@@ -57,7 +40,7 @@ class NutritionDecisionTree:
             if sodium > 300:
                 return False
             # Reject processed/preserved foods
-            if any(keyword in food_name_lower for keyword in high_sodium_foods):
+            if food_matches(food, 'high_sodium'):
                 return False
                 
         elif medical_condition == 'obesity':
@@ -68,7 +51,7 @@ class NutritionDecisionTree:
             if fat > 15:
                 return False
             # Reject fried foods
-            if any(keyword in food_name_lower for keyword in high_cal_fried_foods):
+            if food_matches(food, 'high_cal_fried'):
                 return False
                 
         return True
@@ -136,33 +119,82 @@ class NutritionDecisionTree:
         user: User, 
         goal: DietGoal, 
         n_recommendations: int = 200,
-        food_ids_to_consider: Optional[List[int]] = None
+        food_ids_to_consider: Optional[List[int]] = None,
+        vectorized: bool = True
     ) -> List[Dict]:
-        """Get nutrition recommendations based on user profile and diet goals."""
+        """
+        Get nutrition recommendations based on user profile and diet goals.
+        The vectorized path scores the whole candidate set with NumPy and returns
+        exactly the same scores as the per-food scalar path.
+        """
         if not user or not goal:
             return []
             
         nutritional_needs = self._calculate_nutritional_needs(user, goal)
-        medical_condition = nutritional_needs['medical_condition']
         
-        # Query foods with essential nutrients
-        foods_query = Food.query.filter(
-            Food.caloric_value.isnot(None),
-            Food.protein.isnot(None),
-            Food.carbohydrates.isnot(None),
-            Food.fat.isnot(None)
+        # Foods with essential nutrients, taken from the shared in-memory catalog
+        if food_ids_to_consider is not None and not food_ids_to_consider:
+            return []
+        catalog = get_food_catalog()
+        positions = catalog.select(
+            ['caloric_value', 'protein', 'carbohydrates', 'fat'], food_ids_to_consider
         )
 
-        if food_ids_to_consider is not None:
-            if not food_ids_to_consider:
-                return []
-            foods_query = foods_query.filter(Food.id.in_(food_ids_to_consider))
-        
-        all_foods = foods_query.all()
-        
+        if not vectorized:
+            recommendations = self._score_foods_scalar(catalog.foods_at(positions), nutritional_needs)
+            return sorted(recommendations, key=lambda x: x['nutrition_score'], reverse=True)[:n_recommendations]
+
+        positions, scores = self._ranked_scores(catalog, positions, nutritional_needs)
+        return [
+            {'food_id': food_id, 'nutrition_score': score}
+            for food_id, score in zip(catalog.ids[positions[:n_recommendations]].tolist(), scores[:n_recommendations].tolist())
+        ]
+
+    def get_nutrition_score_arrays(
+        self, user: User, goal: DietGoal, catalog, candidate_positions: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Same ranking as get_nutrition_recommendations, returned as arrays:
+        catalog positions and nutrition scores, sorted by score (descending).
+        """
+        if not user or not goal or not len(candidate_positions):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        nutritional_needs = self._calculate_nutritional_needs(user, goal)
+        required = np.ones(len(candidate_positions), dtype=bool)
+        for col in ('caloric_value', 'protein', 'carbohydrates', 'fat'):
+            required &= ~np.isnan(catalog.column(col)[candidate_positions])
+        return self._ranked_scores(catalog, np.sort(candidate_positions[required]), nutritional_needs)
+
+    def _ranked_scores(self, catalog, positions: np.ndarray, nutritional_needs: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        positions, scores = self.score_positions(catalog, positions, nutritional_needs)
+        order = np.argsort(-scores, kind='stable')
+        return positions[order], scores[order]
+
+    def _meal_targets(self, nutritional_needs: Dict) -> Dict:
+        """Per-meal targets and limits derived from the daily nutritional needs."""
+        medical_condition = nutritional_needs['medical_condition']
+
+        # Adjust meal targets based on medical condition
+        num_main_meals = 4 if medical_condition == 'obesity' else 3  # More frequent, smaller meals for obesity
+        carbs_per_meal = nutritional_needs['carbs_g_per_day'] / num_main_meals
+        return {
+            'calories_per_meal': nutritional_needs['daily_calories'] / num_main_meals,
+            'protein_per_meal': nutritional_needs['protein_g_per_day'] / num_main_meals,
+            'carbs_per_meal': carbs_per_meal,
+            'fat_per_meal': nutritional_needs['fat_g_per_day'] / num_main_meals,
+            # Apply stricter limits for medical conditions
+            'max_calories_per_meal': nutritional_needs.get('max_calories_per_meal', 500),
+            'max_carbs_per_meal': 20 if medical_condition == 'diabetes' else carbs_per_meal,
+            'max_sodium_per_meal': nutritional_needs['target_sodium_mg_per_meal']
+        }
+
+    def _score_foods_scalar(self, foods: List[Food], nutritional_needs: Dict) -> List[Dict]:
+        """Reference implementation: score foods one at a time."""
+        medical_condition = nutritional_needs['medical_condition']
+
         # Filter foods based on medical condition
         suitable_foods = [
-            food for food in all_foods 
+            food for food in foods 
             if self._is_suitable_for_medical_condition(food, medical_condition)
         ]
         
@@ -170,18 +202,14 @@ class NutritionDecisionTree:
             return []
 
         recommendations = []
-        
-        # Adjust meal targets based on medical condition
-        num_main_meals = 4 if medical_condition == 'obesity' else 3  # More frequent, smaller meals for obesity
-        calories_per_meal = nutritional_needs['daily_calories'] / num_main_meals
-        protein_per_meal = nutritional_needs['protein_g_per_day'] / num_main_meals
-        carbs_per_meal = nutritional_needs['carbs_g_per_day'] / num_main_meals
-        fat_per_meal = nutritional_needs['fat_g_per_day'] / num_main_meals
-
-        # Apply stricter limits for medical conditions
-        max_calories_per_meal = nutritional_needs.get('max_calories_per_meal', 500)
-        max_carbs_per_meal = 20 if medical_condition == 'diabetes' else carbs_per_meal
-        max_sodium_per_meal = nutritional_needs['target_sodium_mg_per_meal']
+        targets = self._meal_targets(nutritional_needs)
+        calories_per_meal = targets['calories_per_meal']
+        protein_per_meal = targets['protein_per_meal']
+        carbs_per_meal = targets['carbs_per_meal']
+        fat_per_meal = targets['fat_per_meal']
+        max_calories_per_meal = targets['max_calories_per_meal']
+        max_carbs_per_meal = targets['max_carbs_per_meal']
+        max_sodium_per_meal = targets['max_sodium_per_meal']
 
         for food in suitable_foods:
             # Skip foods that exceed medical limits
@@ -241,7 +269,132 @@ class NutritionDecisionTree:
                 'nutrition_score': float(total_score)
             })
         
-        return sorted(recommendations, key=lambda x: x['nutrition_score'], reverse=True)[:n_recommendations]
+        return recommendations
+
+    def score_positions(self, catalog, positions: np.ndarray, nutritional_needs: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score catalog rows in one batch.
+        Returns (positions that passed the medical filters, their scores), in input order.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        medical_condition = nutritional_needs['medical_condition']
+        targets = self._meal_targets(nutritional_needs)
+        calories_per_meal = targets['calories_per_meal']
+        protein_per_meal = targets['protein_per_meal']
+        carbs_per_meal = targets['carbs_per_meal']
+        fat_per_meal = targets['fat_per_meal']
+
+        calories = catalog.column('caloric_value')[positions]
+        protein = catalog.column('protein')[positions]
+        carbs = catalog.column('carbohydrates')[positions]
+        fat = catalog.column('fat')[positions]
+        sodium = catalog.column('sodium')[positions]
+
+        # Medical suitability and per-meal limits (NaN comparisons are False, like None checks)
+        keep = self._suitable_mask(catalog, positions, medical_condition)
+        keep &= ~(calories > targets['max_calories_per_meal'])
+        if medical_condition == 'diabetes':
+            keep &= ~(carbs > targets['max_carbs_per_meal'])
+        if medical_condition == 'hypertension':
+            keep &= ~(sodium > targets['max_sodium_per_meal'])
+
+        positions = positions[keep]
+        calories, protein, carbs, fat = calories[keep], protein[keep], carbs[keep], fat[keep]
+
+        calorie_score = np.maximum(0, 1 - (np.abs(calories - calories_per_meal) / (calories_per_meal + 1e-6)))
+        if medical_condition == 'obesity':
+            calorie_score = np.where(
+                calories < calories_per_meal * 0.7, calorie_score * 1.5,
+                np.where(calories > calories_per_meal * 1.2, calorie_score * 0.3, calorie_score)
+            )
+
+        protein_score = np.maximum(0, 1 - (np.abs(protein - protein_per_meal) / (protein_per_meal + 1e-6)))
+        if medical_condition == 'obesity':
+            protein_score = np.where(protein > protein_per_meal * 1.2, protein_score * 1.3, protein_score)
+
+        carb_score = np.maximum(0, 1 - (np.abs(carbs - carbs_per_meal) / (carbs_per_meal + 1e-6)))
+        if medical_condition == 'diabetes':
+            carb_score = np.where(carbs > carbs_per_meal * 0.8, carb_score * 0.2, carb_score)
+
+        fat_score = np.maximum(0, 1 - (np.abs(fat - fat_per_meal) / (fat_per_meal + 1e-6)))
+        if medical_condition in ['hypertension', 'obesity']:
+            fat_score = np.where(fat > fat_per_meal * 1.1, fat_score * 0.4, fat_score)
+
+        micronutrient_score_adj = self._micronutrient_scores(catalog, positions, nutritional_needs)
+
+        total_score = (
+            calorie_score * self.calorie_match_weight +
+            protein_score * self.protein_match_weight +
+            carb_score * self.carb_match_weight +
+            fat_score * self.fat_match_weight +
+            micronutrient_score_adj * self.micronutrient_adjustment_weight
+        )
+        return positions, np.clip(total_score, 0, 1)
+
+    def _suitable_mask(self, catalog, positions: np.ndarray, medical_condition: str) -> np.ndarray:
+        """Vectorized _is_suitable_for_medical_condition."""
+        keep = np.ones(len(positions), dtype=bool)
+        if medical_condition == 'none':
+            return keep
+
+        calories = np.nan_to_num(catalog.column('caloric_value')[positions])
+        carbs = np.nan_to_num(catalog.column('carbohydrates')[positions])
+        sodium = np.nan_to_num(catalog.column('sodium')[positions])
+        fat = np.nan_to_num(catalog.column('fat')[positions])
+
+        if medical_condition == 'diabetes':
+            keep &= (carbs <= 30) & (calories <= 400)
+            keep &= ~catalog.keyword_mask('high_carb')[positions]
+        elif medical_condition == 'hypertension':
+            keep &= sodium <= 300
+            keep &= ~catalog.keyword_mask('high_sodium')[positions]
+        elif medical_condition == 'obesity':
+            keep &= (calories <= 400) & (fat <= 15)
+            keep &= ~catalog.keyword_mask('high_cal_fried')[positions]
+        return keep
+
+    def _micronutrient_scores(self, catalog, positions: np.ndarray, nutritional_needs: Dict) -> np.ndarray:
+        """
+        Vectorized _calculate_micronutrient_score.
+        Terms are added in the same order as the scalar version so the sums match bit for bit.
+        """
+        medical_condition = nutritional_needs['medical_condition']
+        column = lambda name: catalog.column(name)[positions]
+        adjustment_score = np.zeros(len(positions), dtype=np.float64)
+
+        if medical_condition == 'hypertension':
+            sodium = column('sodium')
+            target_sodium = nutritional_needs.get('target_sodium_mg_per_meal', 200)
+            adjustment_score += np.where(sodium < target_sodium * 0.5, 0.5, 0.0)
+            adjustment_score -= np.where(~(sodium < target_sodium * 0.5) & (sodium > target_sodium), 0.4, 0.0)
+
+            potassium = column('potassium')
+            adjustment_score += np.where(potassium > 400, 0.4, np.where(potassium > 200, 0.2, 0.0))
+
+        elif medical_condition == 'diabetes':
+            fiber = column('dietary_fiber')
+            adjustment_score += np.where(fiber > 5, 0.5, np.where(fiber > 3, 0.3, 0.0))
+            adjustment_score -= np.where(catalog.keyword_mask('added_sugar')[positions], 0.3, 0.0)
+
+        elif medical_condition == 'obesity':
+            protein = column('protein')
+            calories = column('caloric_value')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                protein_density = np.where(calories > 0, protein / calories * 100, np.nan)
+            adjustment_score += np.where(protein_density > 20, 0.4, np.where(protein_density > 15, 0.2, 0.0))
+
+            fiber = column('dietary_fiber')
+            adjustment_score += np.where(fiber > 5, 0.3, np.where(fiber > 3, 0.2, 0.0))
+
+        # General micronutrients (reduced weight when medical condition is present)
+        base_weight = 0.5 if medical_condition != 'none' else 1.0
+
+        adjustment_score += np.where(column('iron') > 2.5, 0.1 * base_weight, 0.0)
+        adjustment_score += np.where(column('calcium') > 150, 0.1 * base_weight, 0.0)
+        adjustment_score += np.where(column('zinc') > 1.5, 0.05 * base_weight, 0.0)
+        adjustment_score += np.where(column('vitamin_c') > 15, 0.05 * base_weight, 0.0)
+
+        return np.clip(adjustment_score, -0.5, 0.5)
 
     def _calculate_micronutrient_score(self, food: Food, nutritional_needs: Dict) -> float:
         """Calculate micronutrient score with enhanced medical condition consideration"""
@@ -270,8 +423,7 @@ class NutritionDecisionTree:
                     adjustment_score += 0.3
                     
             # Penalize foods with likely added sugars
-            food_name_lower = food.name.lower()
-            if any(keyword in food_name_lower for keyword in ['manis', 'gula', 'sirup', 'madu']):
+            if food_matches(food, 'added_sugar'):
                 adjustment_score -= 0.3
                 
         elif medical_condition == 'obesity':
@@ -0,0 +1,148 @@
+import threading
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Batas kalori fallback per kondisi medis: {medical_condition: {meal_type: (min, max)}}
+FALLBACK_CALORIE_RANGES = {
+    # Stricter calorie limits for obesity
+    'obesity': {
+        'Sarapan': (80, 250), 'Cemilan': (30, 150),
+        'Makan Siang': (200, 350), 'Makan Malam': (200, 350)
+    },
+    # Moderate calorie limits with carb consideration
+    'diabetes': {
+        'Sarapan': (100, 300), 'Cemilan': (50, 200),
+        'Makan Siang': (250, 400), 'Makan Malam': (250, 400)
+    },
+    # Standard calorie limits but focus on sodium
+    'hypertension': {
+        'Sarapan': (100, 400), 'Cemilan': (50, 250),
+        'Makan Siang': (250, 500), 'Makan Malam': (250, 500)
+    },
+    # Standard limits for no medical condition
+    'none': {
+        'Sarapan': (100, 500), 'Cemilan': (50, 350),
+        'Makan Siang': (250, 750), 'Makan Malam': (250, 750)
+    }
+}
+
+# Set kata kunci makanan yang dilewati per kondisi medis (lihat food_keywords.KEYWORD_SETS)
+FALLBACK_EXCLUDED_KEYWORDS = {
+    'diabetes': 'fallback_high_carb',
+    'hypertension': 'fallback_high_sodium',
+    'obesity': 'fallback_high_cal',
+}
+
+FALLBACK_BASE_SCORE = 0.35
+FALLBACK_SUITABLE_SCORE = 0.45
+
+
+class FallbackPool:
+    """
+    Kandidat fallback untuk satu (meal_type, medical_condition): posisi katalog urut id
+    yang lolos filter kalori/karbohidrat/sodium, flag kata kunci yang dikecualikan
+    dan skor dasar per kandidat.
+    """
+    __slots__ = ['positions', 'ids', 'excluded', 'base_scores']
+
+    def __init__(self, positions: np.ndarray, ids: np.ndarray, excluded: np.ndarray, base_scores: np.ndarray):
+        self.positions = positions
+        self.ids = ids
+        self.excluded = excluded
+        self.base_scores = base_scores
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def build_fallback_pool(catalog, meal_type: str, medical_condition: str) -> FallbackPool:
+    """Filter yang sama dengan query fallback lama, dievaluasi sekali pada array katalog."""
+    target_lower = meal_type.lower()
+    meal_type_codes = [
+        code for code, value in enumerate(catalog.vocab['meal_type'])
+        if target_lower in value.lower()
+    ]
+    mask = np.isin(catalog.codes['meal_type'], meal_type_codes)
+
+    calories = catalog.column('caloric_value')
+    carbohydrates = catalog.column('carbohydrates')
+    sodium = catalog.column('sodium')
+
+    # Apply medical condition specific calorie limits
+    calorie_ranges = FALLBACK_CALORIE_RANGES.get(medical_condition, FALLBACK_CALORIE_RANGES['none'])
+    if meal_type in calorie_ranges:
+        min_cal, max_cal = calorie_ranges[meal_type]
+        mask &= (calories >= min_cal) & (calories <= max_cal)
+    if medical_condition == 'diabetes':
+        mask &= carbohydrates <= 30
+    elif medical_condition == 'hypertension':
+        mask &= np.isnan(sodium) | (sodium <= 300)
+    positions = np.flatnonzero(mask)
+
+    excluded_keyword = FALLBACK_EXCLUDED_KEYWORDS.get(medical_condition)
+    excluded = (
+        catalog.keyword_mask(excluded_keyword)[positions] if excluded_keyword
+        else np.zeros(len(positions), dtype=bool)
+    )
+
+    # Skor lebih tinggi untuk makanan yang jelas cocok dengan kondisi medis (nilai 0/NULL tidak dihitung)
+    base_scores = np.full(len(positions), FALLBACK_BASE_SCORE)
+    suitable_column = {'obesity': (calories, 200), 'diabetes': (carbohydrates, 15), 'hypertension': (sodium, 200)}
+    if medical_condition in suitable_column:
+        values, limit = suitable_column[medical_condition]
+        values = values[positions]
+        suitable = (values != 0) & ~np.isnan(values) & (values < limit)
+        base_scores[suitable] = FALLBACK_SUITABLE_SCORE
+
+    return FallbackPool(positions, catalog.ids[positions], excluded, base_scores)
+
+
+class FallbackPools:
+    """Pool fallback per (meal_type, medical_condition) untuk satu versi katalog."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple[str, str], FallbackPool] = {}
+        for medical_condition, calorie_ranges in FALLBACK_CALORIE_RANGES.items():
+            for meal_type in calorie_ranges:
+                self._pools[(meal_type, medical_condition)] = build_fallback_pool(catalog, meal_type, medical_condition)
+
+    def get(self, meal_type: str, medical_condition: str) -> FallbackPool:
+        key = (meal_type, medical_condition)
+        pool = self._pools.get(key)
+        if pool is None:
+            # Kombinasi di luar FALLBACK_CALORIE_RANGES dibangun sekali saat pertama diminta
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = build_fallback_pool(self.catalog, meal_type, medical_condition)
+                    self._pools[key] = pool
+        return pool
+
+    def candidates(self, meal_type: str, medical_condition: str, preferences: List[str], limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (posisi katalog, skor dasar) kandidat yang lolos kata kunci dan preferensi, diambil dari
+        `limit` kandidat pertama pool (urut id, sama seperti LIMIT pada query lama).
+        """
+        pool = self.get(meal_type, medical_condition)
+        positions = pool.positions[:limit]
+        keep = ~pool.excluded[:limit] & self.catalog.preference_mask(preferences)[positions]
+        return positions[keep], pool.base_scores[:limit][keep]
+
+
+_fallback_pools = None
+_fallback_pools_lock = threading.Lock()
+
+
+def get_fallback_pools(catalog) -> FallbackPools:
+    """Pool fallback untuk versi katalog ini, dibangun sekali lalu dipakai bersama."""
+    global _fallback_pools
+    pools = _fallback_pools
+    if pools is None or pools.catalog is not catalog:
+        with _fallback_pools_lock:
+            pools = _fallback_pools
+            if pools is None or pools.catalog is not catalog:
+                pools = FallbackPools(catalog)
+                _fallback_pools = pools  # Hanya versi katalog terbaru yang disimpan
+    return pools
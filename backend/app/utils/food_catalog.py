@@ -0,0 +1,229 @@
+import os
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from flask import current_app
+from app import db
+from app.models.food import Food
+from app.utils.food_keywords import KEYWORD_SETS, name_matches
+
+# Kolom nutrisi yang disimpan dalam satu matriks float (urutan = urutan kolom matriks)
+NUTRIENT_COLUMNS = [
+    'caloric_value', 'protein', 'fat', 'carbohydrates', 'dietary_fiber',
+    'calcium', 'phosphorus', 'iron', 'sodium', 'potassium', 'copper', 'zinc',
+    'retinol_mcg', 'thiamin_mg', 'riboflavin_mg', 'niacin_mg', 'vitamin_c'
+]
+
+# Flag hasil FoodClassifier, disimpan sebagai bitset (bit ke-i = FLAG_COLUMNS[i])
+FLAG_COLUMNS = [
+    'is_vegetarian', 'is_halal', 'contains_dairy', 'contains_nuts',
+    'contains_seafood', 'contains_eggs', 'contains_soy'
+]
+
+# Preferensi user -> (flag, nilai yang diwajibkan), sama seperti HybridDietRecommender._matches_preferences
+PREFERENCE_FLAGS = {
+    'vegetarian': ('is_vegetarian', True),
+    'halal': ('is_halal', True),
+    'dairy_free': ('contains_dairy', False),
+    'nut_free': ('contains_nuts', False),
+    'seafood_free': ('contains_seafood', False),
+    'egg_free': ('contains_eggs', False),
+    'soy_free': ('contains_soy', False),
+}
+PREFERENCE_KEYS = list(PREFERENCE_FLAGS)
+
+
+def preference_bits(preferences: List[str]) -> int:
+    """Bitmask preferensi (bit ke-i = kunci ke-i PREFERENCE_FLAGS); preferensi tidak dikenal diabaikan."""
+    bits = 0
+    for pref_type in preferences or ():
+        if pref_type in PREFERENCE_FLAGS:
+            bits |= 1 << PREFERENCE_KEYS.index(pref_type)
+    return bits
+
+
+# Kolom kategorikal yang dikodekan menjadi integer (-1 = NULL)
+CODE_COLUMNS = ['food_status', 'food_group', 'meal_type']
+
+CATALOG_VERSION_FILENAME = 'food_catalog.version'
+
+
+class CatalogFood:
+    """Baris makanan read-only dengan nama atribut yang sama seperti model Food."""
+    __slots__ = ['id', 'food_code', 'name'] + NUTRIENT_COLUMNS + CODE_COLUMNS + FLAG_COLUMNS + ['keyword_sets']
+
+    def __init__(self, values: Dict):
+        for attr in self.__slots__:
+            setattr(self, attr, values.get(attr))
+
+    def __repr__(self):
+        return f'<CatalogFood {self.name} ({self.food_code})>'
+
+
+class FoodCatalog:
+    """
+    Snapshot kolumnar dari tabel foods.
+    Dimuat sekali per proses dan dipakai bersama oleh semua recommender.
+    """
+
+    def __init__(self, rows: List[Dict], version: int = 0):
+        self.version = version
+        self.size = len(rows)
+        self.foods = [CatalogFood(row) for row in rows]
+        self.ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        self.names = [row['name'] or '' for row in rows]
+        self.names_lower = [name.lower() for name in self.names]
+        self.position_by_id = {food_id: pos for pos, food_id in enumerate(self.ids.tolist())}
+
+        # Matriks nutrisi (n_foods x n_nutrients), NULL disimpan sebagai NaN
+        self.nutrients = np.array(
+            [[np.nan if row[col] is None else row[col] for col in NUTRIENT_COLUMNS] for row in rows],
+            dtype=np.float64
+        ).reshape(self.size, len(NUTRIENT_COLUMNS))
+
+        self.flags = np.zeros(self.size, dtype=np.uint8)
+        for bit, col in enumerate(FLAG_COLUMNS):
+            column = np.array([bool(row[col]) for row in rows], dtype=bool)
+            self.flags |= (column.astype(np.uint8) << bit)
+
+        # Bitmask preferensi yang dilanggar setiap makanan (lihat preference_bits)
+        self.preference_violations = np.zeros(self.size, dtype=np.uint8)
+        for bit, (flag, expected) in enumerate(PREFERENCE_FLAGS.values()):
+            self.preference_violations |= (self.flag(flag) != expected).astype(np.uint8) << bit
+        self._preference_masks = {}
+
+        self.vocab = {}
+        self.codes = {}
+        for col in CODE_COLUMNS:
+            vocab = sorted({row[col] for row in rows if row[col] is not None})
+            lookup = {value: code for code, value in enumerate(vocab)}
+            self.vocab[col] = vocab
+            self.codes[col] = np.array(
+                [lookup.get(row[col], -1) for row in rows], dtype=np.int16
+            )
+
+        # Indeks kata kunci: satu kolom boolean per set bernama di KEYWORD_SETS
+        self.keyword_masks = {
+            set_name: np.array([name_matches(name, set_name) for name in self.names_lower], dtype=bool)
+            for set_name in KEYWORD_SETS
+        }
+        for pos, food in enumerate(self.foods):
+            food.keyword_sets = frozenset(
+                set_name for set_name, mask in self.keyword_masks.items() if mask[pos]
+            )
+
+    @classmethod
+    def from_database(cls, version: int = 0) -> 'FoodCatalog':
+        """Muat seluruh tabel foods dengan satu query."""
+        columns = ['id', 'food_code', 'name'] + NUTRIENT_COLUMNS + CODE_COLUMNS + FLAG_COLUMNS
+        result = db.session.query(*[getattr(Food, col) for col in columns]).order_by(Food.id).all()
+        rows = [dict(zip(columns, values)) for values in result]
+        return cls(rows, version=version)
+
+    def column(self, name: str) -> np.ndarray:
+        """Kolom nutrisi sebagai array float (NaN untuk NULL)."""
+        return self.nutrients[:, NUTRIENT_COLUMNS.index(name)]
+
+    def flag(self, name: str) -> np.ndarray:
+        """Kolom flag klasifikasi sebagai array boolean."""
+        return (self.flags >> FLAG_COLUMNS.index(name)) & 1 == 1
+
+    def preference_mask(self, preferences: List[str]) -> np.ndarray:
+        """
+        Kolom boolean (read-only): makanan cocok dengan semua preferensi.
+        Dihitung sekali per kombinasi preferensi (maksimal 2^7) lalu di-cache di katalog.
+        """
+        bits = preference_bits(preferences)
+        mask = self._preference_masks.get(bits)
+        if mask is None:
+            mask = (self.preference_violations & bits) == 0
+            mask.setflags(write=False)
+            self._preference_masks[bits] = mask
+        return mask
+
+    def keyword_mask(self, keyword_set: str) -> np.ndarray:
+        """Kolom boolean: nama makanan mengandung kata kunci dari set bernama."""
+        return self.keyword_masks[keyword_set]
+
+    def code_of(self, column: str, value: Optional[str]) -> int:
+        """Kode integer untuk nilai kategorikal (-1 jika tidak dikenal)."""
+        try:
+            return self.vocab[column].index(value)
+        except ValueError:
+            return -1
+
+    def select(self, required_columns: List[str] = (), food_ids: Optional[List[int]] = None) -> np.ndarray:
+        """
+        Posisi baris (urut id) yang kolom wajibnya tidak NULL dan,
+        jika diberikan, termasuk dalam food_ids.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for col in required_columns:
+            mask &= ~np.isnan(self.column(col))
+        if food_ids is not None:
+            allowed = np.zeros(self.size, dtype=bool)
+            allowed[self.positions(food_ids)] = True
+            mask &= allowed
+        return np.flatnonzero(mask)
+
+    def positions(self, food_ids) -> np.ndarray:
+        """Posisi baris untuk daftar food id (id yang tidak dikenal diabaikan)."""
+        return np.array(
+            [self.position_by_id[fid] for fid in food_ids if fid in self.position_by_id],
+            dtype=np.int64
+        )
+
+    def get(self, food_id: int) -> Optional[CatalogFood]:
+        pos = self.position_by_id.get(food_id)
+        return self.foods[pos] if pos is not None else None
+
+    def foods_at(self, positions) -> List[CatalogFood]:
+        return [self.foods[pos] for pos in positions]
+
+
+_catalog = None
+_catalog_stamp = None
+_catalog_generation = 0
+_catalog_lock = threading.Lock()
+
+
+def _version_file_path() -> str:
+    return os.path.join(current_app.instance_path, CATALOG_VERSION_FILENAME)
+
+
+def _read_stamp() -> Optional[int]:
+    try:
+        return os.stat(_version_file_path()).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_food_catalog() -> FoodCatalog:
+    """
+    Kembalikan katalog makanan bersama untuk proses ini.
+    Dimuat ulang hanya jika invalidate_food_catalog() dipanggil (di proses ini
+    atau proses lain, misalnya perintah CLI import/klasifikasi).
+    """
+    global _catalog, _catalog_stamp, _catalog_generation
+    stamp = _read_stamp()
+    catalog = _catalog
+    if catalog is not None and stamp == _catalog_stamp:
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is None or stamp != _catalog_stamp:
+            _catalog_generation += 1
+            _catalog = FoodCatalog.from_database(version=_catalog_generation)
+            _catalog_stamp = stamp
+        return _catalog
+
+
+def invalidate_food_catalog() -> None:
+    """Tandai katalog kedaluwarsa di semua proses aplikasi."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+    path = _version_file_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a'):
+        os.utime(path, None)
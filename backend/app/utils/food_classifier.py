@@ -1,6 +1,35 @@
 from app import db
 from app.models.food import Food
+from app.utils.food_catalog import invalidate_food_catalog
+from app.utils.keyword_automaton import KeywordAutomaton
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import update
+from typing import Dict, List, Sequence, Tuple
 import click
+import hashlib
+import os
+import time
+
+# Urutan flag pada hasil classify_rows (sama dengan kolom Food)
+CLASSIFICATION_FLAGS = (
+    'is_vegetarian', 'is_halal', 'contains_dairy', 'contains_nuts',
+    'contains_seafood', 'contains_eggs', 'contains_soy'
+)
+
+# Batch di bawah ukuran ini diklasifikasi di proses sendiri (overhead process pool lebih besar)
+PARALLEL_MIN_ROWS = 20000
+UPDATE_BATCH_SIZE = 5000
+
+_worker_classifier = None
+
+
+def _classify_chunk(rows):
+    """Dijalankan di worker process pool; classifier dibangun sekali per worker."""
+    global _worker_classifier
+    if _worker_classifier is None:
+        _worker_classifier = FoodClassifier()
+    return _worker_classifier.classify_rows(rows)
+
 
 class FoodClassifier:
     def __init__(self):
@@ -128,117 +157,181 @@ class FoodClassifier:
             'Telur'
         }
 
-    def classify_foods(self):
-        """Classify all Indonesian foods based on dietary preferences and allergies"""
-        foods = Food.query.all()
-        total = len(foods)
-        classified = 0
-        click.echo(f"Starting classification for {total} foods...")
-
-        for food_idx, food in enumerate(foods):
-            name_lower = food.name.lower()
-            food_group = food.food_group or ""
-            food_status = food.food_status or ""
-            
-            # --- Vegetarian Classification ---
-            # Start with food group classification (more reliable)
+        # Nuts within the 'Kacang' group (legumes are not counted as nuts)
+        self.true_nut_keywords = [
+            'almond', 'kenari', 'hazelnut', 'mete', 'cashew', 'walnut', 'pecan', 'pistachio',
+            'macadamia', 'kemiri', 'wijen', 'sesame'
+        ]
+
+        # Known plant-based alternatives to meat dishes: (dish, plant ingredients, meat ingredients)
+        # A name with a strict non-veg identifier is still vegetarian if it contains the dish,
+        # one of the plant ingredients and none of the meat ingredients
+        self.plant_based_exceptions = [
+            ('sate', ['jamur', 'tempe', 'tahu', 'sayur', 'buah', 'kikil jamur'], []),
+            ('rendang', ['nangka', 'jamur', 'daun singkong', 'kentang', 'jengkol', 'pakis'], ['daging', 'sapi', 'ayam']),
+            ('bakso', ['aci', 'sayur', 'jamur', 'tahu', 'tepung', 'cilok', 'kanji'], ['daging', 'sapi', 'ikan', 'ayam']),
+            ('abon', ['jamur', 'pepaya', 'nangka', 'jantung pisang', 'tempe', 'tahu'], []),
+            ('sosis', ['tempe', 'jamur', 'kedelai', 'sayur', 'tahu'], []),
+            ('nugget', ['tempe', 'tahu', 'jamur', 'sayur'], []),
+            ('burger', ['tempe', 'jamur', 'sayur', 'tahu', 'kentang'], []),
+            ('dendeng', ['jamur', 'daun singkong', 'tempe', 'kimpul', 'gadung'], []),
+            ('gulai', ['nangka', 'jamur', 'tahu', 'tempe', 'pakis', 'daun singkong', 'sayur', 'telur'], ['ikan', 'ayam', 'daging', 'kambing']),
+            ('semur', ['tahu', 'tempe', 'jengkol', 'kentang', 'terong', 'telur'], ['daging', 'ayam', 'sapi']),
+            ('opor', ['tahu', 'tempe', 'nangka', 'telur', 'labu'], ['ayam', 'daging']),
+            ('kari', ['sayuran', 'tahu', 'tempe', 'kentang', 'nangka', 'telur'], ['ayam', 'daging', 'ikan']),
+            ('bistik', ['tempe', 'tahu', 'jamur', 'kentang'], []),
+        ]
+
+        # All keyword lists compiled once into a single multi-pattern automaton
+        self._matcher = self._build_matcher()
+        # Changes to any rule list change this version and therefore every content hash
+        self.rules_version = hashlib.sha1(repr((
+            self.vegetarian_keywords, self.non_halal_keywords, self.dairy_keywords, self.nuts_keywords,
+            self.seafood_keywords, self.egg_keywords, self.soy_keywords, self.strict_non_veg_identifiers,
+            sorted(self.vegetarian_food_groups), sorted(self.non_vegetarian_food_groups),
+            sorted(self.dairy_food_groups), sorted(self.egg_food_groups),
+            self.true_nut_keywords, self.plant_based_exceptions
+        )).encode('utf-8')).hexdigest()
+
+    def _build_matcher(self) -> KeywordAutomaton:
+        """Kompilasi semua daftar kata kunci (termasuk aturan pengecualian) menjadi satu automaton."""
+        return KeywordAutomaton(self._keyword_sets())
+
+    def _keyword_sets(self) -> Dict[str, List[str]]:
+        """Set kata kunci bernama yang dikompilasi ke automaton (nama set = kunci di _matcher.bits)."""
+        keyword_sets = {
+            'vegetarian': self.vegetarian_keywords,
+            'non_halal': self.non_halal_keywords,
+            'dairy': self.dairy_keywords,
+            'nuts': self.nuts_keywords,
+            'seafood': self.seafood_keywords,
+            'egg': self.egg_keywords,
+            'soy': self.soy_keywords,
+            'strict_non_veg': self.strict_non_veg_identifiers,
+            'true_nut': self.true_nut_keywords,
+            'peanut': ['kacang tanah', 'peanut'],
+        }
+        for i, (trigger, plant_terms, meat_terms) in enumerate(self.plant_based_exceptions):
+            keyword_sets[f'exception_{i}_trigger'] = [trigger]
+            keyword_sets[f'exception_{i}_plant'] = plant_terms
+            keyword_sets[f'exception_{i}_meat'] = meat_terms
+        return keyword_sets
+
+    def _is_plant_based_alternative(self, found: int) -> bool:
+        bits = self._matcher.bits
+        for i in range(len(self.plant_based_exceptions)):
+            if (found & bits[f'exception_{i}_trigger'] and found & bits[f'exception_{i}_plant']
+                    and not found & bits[f'exception_{i}_meat']):
+                return True
+        return False
+
+    def classify_name(self, name: str, food_group: str = None) -> Dict[str, bool]:
+        """Flag preferensi diet dan alergen untuk satu makanan (satu kali scan nama)."""
+        found = self._matcher.scan(name.lower())
+        bits = self._matcher.bits
+        food_group = food_group or ""
+
+        # --- Vegetarian Classification ---
+        # Start with food group classification (more reliable)
+        is_vegetarian_flag = True
+        if food_group in self.non_vegetarian_food_groups:
+            is_vegetarian_flag = False
+        elif food_group in self.vegetarian_food_groups:
             is_vegetarian_flag = True
-            
-            # Check food group first
-            if food_group in self.non_vegetarian_food_groups:
-                is_vegetarian_flag = False
-            elif food_group in self.vegetarian_food_groups:
+        else:
+            # Fall back to keyword-based classification for mixed or unknown groups
+            if found & bits['strict_non_veg']:
+                # Exception for known plant-based alternatives
+                is_vegetarian_flag = self._is_plant_based_alternative(found)
+            # If no strict non-veg identifiers and contains vegetarian keywords
+            elif found & bits['vegetarian']:
                 is_vegetarian_flag = True
-            else:
-                # Fall back to keyword-based classification for mixed or unknown groups
-                if any(keyword in name_lower for keyword in self.strict_non_veg_identifiers):
-                    is_vegetarian_flag = False
-                    
-                    # Exception for known plant-based alternatives
-                    if (("sate" in name_lower and any(veg_kw in name_lower for veg_kw in ['jamur', 'tempe', 'tahu', 'sayur', 'buah', 'kikil jamur'])) or
-                        ("rendang" in name_lower and any(veg_kw in name_lower for veg_kw in ['nangka', 'jamur', 'daun singkong', 'kentang', 'jengkol', 'pakis']) and not any(meat_kw in name_lower for meat_kw in ['daging', 'sapi', 'ayam'])) or
-                        ("bakso" in name_lower and any(veg_kw in name_lower for veg_kw in ['aci', 'sayur', 'jamur', 'tahu', 'tepung', 'cilok', 'kanji']) and not any(meat_kw in name_lower for meat_kw in ['daging', 'sapi', 'ikan', 'ayam'])) or
-                        ("abon" in name_lower and any(veg_kw in name_lower for veg_kw in ['jamur', 'pepaya', 'nangka', 'jantung pisang', 'tempe', 'tahu'])) or
-                        ("sosis" in name_lower and any(veg_kw in name_lower for veg_kw in ['tempe', 'jamur', 'kedelai', 'sayur', 'tahu'])) or
-                        ("nugget" in name_lower and any(veg_kw in name_lower for veg_kw in ['tempe', 'tahu', 'jamur', 'sayur'])) or
-                        ("burger" in name_lower and any(veg_kw in name_lower for veg_kw in ['tempe', 'jamur', 'sayur', 'tahu', 'kentang'])) or
-                        ("dendeng" in name_lower and any(veg_kw in name_lower for veg_kw in ['jamur', 'daun singkong', 'tempe', 'kimpul', 'gadung'])) or
-                        ("gulai" in name_lower and any(veg_kw in name_lower for veg_kw in ['nangka', 'jamur', 'tahu', 'tempe', 'pakis', 'daun singkong', 'sayur', 'telur']) and not any(meat_kw in name_lower for meat_kw in ['ikan', 'ayam', 'daging', 'kambing'])) or
-                        ("semur" in name_lower and any(veg_kw in name_lower for veg_kw in ['tahu', 'tempe', 'jengkol', 'kentang', 'terong', 'telur']) and not any(meat_kw in name_lower for meat_kw in ['daging', 'ayam', 'sapi'])) or
-                        ("opor" in name_lower and any(veg_kw in name_lower for veg_kw in ['tahu', 'tempe', 'nangka', 'telur', 'labu']) and not any(meat_kw in name_lower for meat_kw in ['ayam', 'daging'])) or
-                        ("kari" in name_lower and any(veg_kw in name_lower for veg_kw in ['sayuran', 'tahu', 'tempe', 'kentang', 'nangka', 'telur']) and not any(meat_kw in name_lower for meat_kw in ['ayam', 'daging', 'ikan'])) or
-                        ("bistik" in name_lower and any(veg_kw in name_lower for veg_kw in ['tempe', 'tahu', 'jamur', 'kentang']))):
-                        is_vegetarian_flag = True
-                
-                # If no strict non-veg identifiers and contains vegetarian keywords
-                elif any(keyword in name_lower for keyword in self.vegetarian_keywords):
-                    is_vegetarian_flag = True
-
-            food.is_vegetarian = is_vegetarian_flag
-
-            # --- Halal Classification ---
-            # Use food group and keyword-based classification
-            is_halal_flag = True
-            
-            # Check for non-halal keywords
-            if any(keyword in name_lower for keyword in self.non_halal_keywords):
-                is_halal_flag = False
-            
-            food.is_halal = is_halal_flag
-
-            # --- Allergen Classification ---
-            # Dairy classification
-            contains_dairy = False
-            if food_group in self.dairy_food_groups:
-                contains_dairy = True
-            elif any(keyword in name_lower for keyword in self.dairy_keywords):
-                contains_dairy = True
-            food.contains_dairy = contains_dairy
-
-            # Nuts classification
-            contains_nuts = False
-            if food_group == 'Kacang':
-                # Be more specific for nuts vs legumes
-                if any(nut_kw in name_lower for nut_kw in ['almond', 'kenari', 'hazelnut', 'mete', 'cashew', 'walnut', 'pecan', 'pistachio', 'macadamia', 'kemiri', 'wijen', 'sesame']):
-                    contains_nuts = True
-                elif 'kacang tanah' in name_lower or 'peanut' in name_lower:
-                    contains_nuts = True
-            elif any(keyword in name_lower for keyword in self.nuts_keywords):
-                contains_nuts = True
-            food.contains_nuts = contains_nuts
-
-            # Seafood classification
-            contains_seafood = False
-            if food_group == 'Ikan dsb':
-                contains_seafood = True
-            elif any(keyword in name_lower for keyword in self.seafood_keywords):
-                contains_seafood = True
-            food.contains_seafood = contains_seafood
-
-            # Egg classification
-            contains_eggs = False
-            if food_group in self.egg_food_groups:
-                contains_eggs = True
-            elif any(keyword in name_lower for keyword in self.egg_keywords):
-                contains_eggs = True
-            food.contains_eggs = contains_eggs
-
-            # Soy classification
-            contains_soy = False
-            if any(keyword in name_lower for keyword in self.soy_keywords):
-                contains_soy = True
-            food.contains_soy = contains_soy
-
-            classified += 1
-            if classified % 100 == 0 or classified == total:
-                click.echo(f"Classified {classified}/{total} foods. Last: {food.name} -> Veg: {food.is_vegetarian}, Halal: {food.is_halal}, Nuts: {food.contains_nuts}, Seafood: {food.contains_seafood}, Dairy: {food.contains_dairy}, Eggs: {food.contains_eggs}, Soy: {food.contains_soy}")
 
+        # --- Halal Classification ---
+        is_halal_flag = not found & bits['non_halal']
+
+        # --- Allergen Classification ---
+        contains_dairy = food_group in self.dairy_food_groups or bool(found & bits['dairy'])
+
+        if food_group == 'Kacang':
+            # Be more specific for nuts vs legumes
+            contains_nuts = bool(found & self._matcher.mask('true_nut', 'peanut'))
+        else:
+            contains_nuts = bool(found & bits['nuts'])
+
+        contains_seafood = food_group == 'Ikan dsb' or bool(found & bits['seafood'])
+        contains_eggs = food_group in self.egg_food_groups or bool(found & bits['egg'])
+        contains_soy = bool(found & bits['soy'])
+
+        return {
+            'is_vegetarian': is_vegetarian_flag,
+            'is_halal': is_halal_flag,
+            'contains_dairy': contains_dairy,
+            'contains_nuts': contains_nuts,
+            'contains_seafood': contains_seafood,
+            'contains_eggs': contains_eggs,
+            'contains_soy': contains_soy
+        }
+
+    def content_hash(self, name: str, food_group: str = None) -> str:
+        """Hash input klasifikasi (nama, kelompok) beserta versi aturan classifier."""
+        payload = f"{self.rules_version}\0{name}\0{food_group or ''}"
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def classify_rows(self, rows: Sequence[Tuple[int, str, str]]) -> List[Tuple]:
+        """Klasifikasi tuple (id, name, food_group) menjadi (id, flag...) sesuai urutan CLASSIFICATION_FLAGS."""
+        results = []
+        for food_id, name, food_group in rows:
+            flags = self.classify_name(name, food_group)
+            results.append((food_id,) + tuple(flags[flag] for flag in CLASSIFICATION_FLAGS))
+        return results
+
+    def classify_foods(self, force: bool = False, workers: int = None) -> Dict[str, int]:
+        """
+        Classify foods based on dietary preferences and allergies.
+        Only foods whose name/group (or the classifier rules) changed since the last run are
+        reclassified, tracked via Food.classification_hash; force=True reclassifies everything.
+        Large batches are spread over a process pool and results are written back with bulk UPDATEs.
+        """
+        start = time.perf_counter()
+        rows = db.session.query(Food.id, Food.name, Food.food_group, Food.classification_hash).all()
+        pending = []
+        hashes = {}
+        for food_id, name, food_group, stored_hash in rows:
+            content_hash = self.content_hash(name, food_group)
+            if force or content_hash != stored_hash:
+                pending.append((food_id, name, food_group))
+                hashes[food_id] = content_hash
+        click.echo(f"Starting classification: {len(pending)} of {len(rows)} foods changed since the last run...")
+
+        if not pending:
+            db.session.rollback()
+            return {'total': len(rows), 'classified': 0}
+
+        workers = workers if workers is not None else (os.cpu_count() or 1)
+        if workers > 1 and len(pending) >= PARALLEL_MIN_ROWS:
+            chunk_size = -(-len(pending) // workers)
+            chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = [row for chunk in pool.map(_classify_chunk, chunks) for row in chunk]
+        else:
+            results = self.classify_rows(pending)
+
+        updates = [
+            dict(zip(('id',) + CLASSIFICATION_FLAGS, result), classification_hash=hashes[result[0]])
+            for result in results
+        ]
+        for i in range(0, len(updates), UPDATE_BATCH_SIZE):
+            db.session.execute(update(Food), updates[i:i + UPDATE_BATCH_SIZE])
         db.session.commit()
-        click.echo(f"Successfully classified {classified} foods.")
+        invalidate_food_catalog()
+        click.echo(f"Successfully classified {len(pending)} foods in {time.perf_counter() - start:.2f}s.")
+        return {'total': len(rows), 'classified': len(pending)}
 
     def predict_food_status(self, name, caloric_value, protein, fat, carbohydrates, food_group=None, food_status=None):
         """Predict food classification for a single food item"""
-        name_lower = name.lower()
+        found = self._matcher.scan(name.lower())
+        bits = self._matcher.bits
         food_group = food_group or ""
         
         # Vegetarian classification
@@ -248,29 +341,29 @@ class FoodClassifier:
         elif food_group in self.vegetarian_food_groups:
             is_vegetarian = True
         else:
-            if any(keyword in name_lower for keyword in self.strict_non_veg_identifiers):
+            if found & bits['strict_non_veg']:
                 is_vegetarian = False
-            elif any(keyword in name_lower for keyword in self.vegetarian_keywords):
+            elif found & bits['vegetarian']:
                 is_vegetarian = True
 
         # Halal classification
-        is_halal = not any(keyword in name_lower for keyword in self.non_halal_keywords)
+        is_halal = not found & bits['non_halal']
 
         # Allergen classifications
         contains_dairy = (food_group in self.dairy_food_groups or 
-                         any(keyword in name_lower for keyword in self.dairy_keywords))
+                         bool(found & bits['dairy']))
         
         contains_nuts = (food_group == 'Kacang' and 
-                        any(nut_kw in name_lower for nut_kw in ['almond', 'kenari', 'hazelnut', 'mete', 'cashew', 'walnut', 'pecan', 'pistachio', 'macadamia', 'kemiri', 'wijen', 'sesame', 'kacang tanah', 'peanut']) or
-                        any(keyword in name_lower for keyword in self.nuts_keywords))
+                        bool(found & self._matcher.mask('true_nut', 'peanut')) or
+                        bool(found & bits['nuts']))
         
         contains_seafood = (food_group == 'Ikan dsb' or 
-                           any(keyword in name_lower for keyword in self.seafood_keywords))
+                           bool(found & bits['seafood']))
         
         contains_eggs = (food_group in self.egg_food_groups or 
-                        any(keyword in name_lower for keyword in self.egg_keywords))
+                        bool(found & bits['egg']))
         
-        contains_soy = any(keyword in name_lower for keyword in self.soy_keywords)
+        contains_soy = bool(found & bits['soy'])
 
         return {
             'is_vegetarian': is_vegetarian,
@@ -280,4 +373,4 @@ class FoodClassifier:
             'contains_dairy': contains_dairy,
             'contains_eggs': contains_eggs,
             'contains_soy': contains_soy
-        }
\ No newline at end of file
+        }
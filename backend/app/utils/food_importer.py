@@ -0,0 +1,301 @@
+import hashlib
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, update
+from app import db
+from app.models.food import Food
+
+# Header CSV kurasi (dataset_nutrisi_kurasi_final.csv) -> kolom tabel foods
+CURATED_COLUMNS = {
+    'kode': 'food_code',
+    'nama_makanan': 'name',
+    'energi_kal': 'caloric_value',
+    'protein_g': 'protein',
+    'lemak_g': 'fat',
+    'karbohidrat_g': 'carbohydrates',
+    'serat_g': 'dietary_fiber',
+    'kalsium_mg': 'calcium',
+    'fosfor_mg': 'phosphorus',
+    'besi_mg': 'iron',
+    'natrium_mg': 'sodium',
+    'kalium_mg': 'potassium',
+    'tembaga_mg': 'copper',
+    'seng_mg': 'zinc',
+    'retinol_mcg': 'retinol_mcg',
+    'thiamin_mg': 'thiamin_mg',
+    'riboflavin_mg': 'riboflavin_mg',
+    'niasin_mg': 'niacin_mg',
+    'vitamin_c_mg': 'vitamin_c',
+    'status_makanan': 'food_status',
+    'kelompok_makanan': 'food_group',
+    'meal_type': 'meal_type',
+}
+
+TEXT_COLUMNS = ['food_code', 'name', 'food_status', 'food_group', 'meal_type']
+NUMERIC_COLUMNS = [
+    'caloric_value', 'protein', 'fat', 'carbohydrates', 'dietary_fiber',
+    'calcium', 'phosphorus', 'iron', 'sodium', 'potassium', 'copper', 'zinc',
+    'retinol_mcg', 'thiamin_mg', 'riboflavin_mg', 'niacin_mg', 'vitamin_c'
+]
+IMPORT_COLUMNS = TEXT_COLUMNS + NUMERIC_COLUMNS
+
+KJ_TO_KCAL = 1 / 4.184
+
+
+class FoodSource:
+    """
+    Deskripsi deklaratif satu dataset: file, pemetaan header -> kolom foods, faktor konversi
+    satuan per kolom (dikalikan setelah parsing) dan prefix untuk kode makanan.
+    """
+
+    def __init__(
+        self, name: str, filename: str, columns: Dict[str, str],
+        unit_factors: Optional[Dict[str, float]] = None, code_prefix: str = ''
+    ):
+        self.name = name
+        self.filename = filename
+        self.columns = columns
+        self.unit_factors = unit_factors or {}
+        self.code_prefix = code_prefix
+
+    def normalize(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        frame = normalize_food_frame(chunk, self.columns)
+        for col, factor in self.unit_factors.items():
+            frame[col] = frame[col] * factor
+        if self.code_prefix:
+            frame['food_code'] = (self.code_prefix + frame['food_code']).where(frame['food_code'].notna(), None)
+        return frame
+
+
+# Urutan = prioritas: makanan yang sama dari beberapa sumber diambil dari sumber pertama
+FOOD_SOURCES = [
+    FoodSource('curated', 'dataset_nutrisi_kurasi_final.csv', CURATED_COLUMNS),
+    FoodSource(
+        'indonesia', 'dataset_nutrisi_makanan_indonesia_cleaned.csv',
+        {header: col for header, col in CURATED_COLUMNS.items() if header != 'meal_type'}
+    ),
+    FoodSource(
+        'foods_updated', 'foods_updated.csv',
+        {
+            'id': 'food_code',
+            'Menu': 'name',
+            'Energy (kJ)': 'caloric_value',
+            'Protein (g)': 'protein',
+            'Fat (g)': 'fat',
+            'Carbohydrates (g)': 'carbohydrates',
+            'Dietary Fiber (g)': 'dietary_fiber',
+            'Vitamin B1 (mg)': 'thiamin_mg',
+            'Vitamin B2 (mg)': 'riboflavin_mg',
+            'Vitamin C (mg)': 'vitamin_c',
+            'Sodium (mg)': 'sodium',
+            'Potassium (mg)': 'potassium',
+            'Calcium (mg)': 'calcium',
+            'Phosphorus (mg)': 'phosphorus',
+            'Iron (mg)': 'iron',
+            'Zinc (mg)': 'zinc',
+            'meal_type': 'meal_type',
+        },
+        unit_factors={'caloric_value': KJ_TO_KCAL},
+        code_prefix='FU'
+    ),
+]
+FOOD_SOURCES_BY_NAME = {source.name: source for source in FOOD_SOURCES}
+
+
+class ImportStats:
+    """Jumlah baris per hasil upsert beserta waktu parsing dan tulis database."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.parse_seconds = 0.0
+        self.write_seconds = 0.0
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
+
+    def summary(self) -> str:
+        return (
+            f"{self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged, "
+            f"{self.skipped} skipped, {self.duplicates} duplicates (parse {self.parse_seconds:.2f}s, database {self.write_seconds:.2f}s)"
+        )
+
+
+def normalize_food_frame(frame: pd.DataFrame, column_map: Dict[str, str]) -> pd.DataFrame:
+    """
+    Ubah chunk CSV mentah (semua kolom string) menjadi kolom tabel foods.
+    Angka diparse secara vektor (koma desimal diterima, nilai tidak valid menjadi NULL);
+    teks di-strip dan string kosong menjadi NULL.
+    """
+    missing = [header for header in column_map if header not in frame.columns]
+    if missing:
+        raise ValueError(f"Kolom CSV tidak ditemukan: {', '.join(missing)}")
+
+    frame = frame[list(column_map)].rename(columns=column_map)
+    result = pd.DataFrame(index=frame.index)
+    for col in IMPORT_COLUMNS:
+        if col not in frame.columns:
+            result[col] = np.nan if col in NUMERIC_COLUMNS else None
+        elif col in NUMERIC_COLUMNS:
+            values = frame[col].str.strip().str.replace(',', '.', regex=False)
+            result[col] = pd.to_numeric(values, errors='coerce')
+        else:
+            values = frame[col].str.strip()
+            result[col] = values.where(values.notna() & (values != ''), None)
+    return result
+
+
+def read_food_chunks(file_path: str, source: FoodSource, chunk_size: int = 1000) -> Iterator[pd.DataFrame]:
+    """Baca CSV per chunk dan kembalikan frame yang sudah dinormalisasi."""
+    reader = pd.read_csv(
+        file_path, dtype=str, keep_default_na=False, encoding='utf-8-sig', chunksize=chunk_size
+    )
+    for chunk in reader:
+        yield source.normalize(chunk)
+
+
+def name_hashes(names: pd.Series) -> pd.Series:
+    """Hash nama yang dinormalisasi (huruf kecil, tanda baca dan spasi berlebih diabaikan)."""
+    normalized = names.fillna('').str.lower().str.replace(r'[^0-9a-z]+', ' ', regex=True).str.strip()
+    return normalized.map(lambda name: hashlib.sha1(name.encode('utf-8')).hexdigest())
+
+
+def drop_seen_foods(frame: pd.DataFrame, seen: Set[str], stats: 'ImportStats') -> pd.DataFrame:
+    """Buang makanan yang sudah datang dari sumber/chunk sebelumnya (dedupe berdasarkan hash nama)."""
+    hashes = name_hashes(frame['name'])
+    keep = ~(hashes.isin(seen) | hashes.duplicated()).to_numpy() | frame['name'].isna().to_numpy()
+    stats.duplicates += int((~keep).sum())
+    seen.update(hashes[keep].tolist())
+    return frame[keep]
+
+
+def _changed_mask(new: pd.DataFrame, old: pd.DataFrame) -> np.ndarray:
+    """
+    Baris yang berbeda di salah satu kolom (NULL dianggap sama dengan NULL).
+    Angka dibandingkan pada presisi float32: db.Float di MySQL adalah FLOAT single-precision,
+    sehingga nilai tersimpan tidak pernah sama persis dengan float64 hasil parsing (mis. kJ -> kkal).
+    """
+    changed = np.zeros(len(new), dtype=bool)
+    for col in NUMERIC_COLUMNS:
+        a = new[col].to_numpy(dtype=np.float64).astype(np.float32)
+        b = old[col].to_numpy(dtype=np.float64).astype(np.float32)
+        changed |= ~((a == b) | (np.isnan(a) & np.isnan(b)))
+    for col in TEXT_COLUMNS:
+        changed |= (new[col].fillna('').to_numpy() != old[col].fillna('').to_numpy())
+    return changed
+
+
+def _records(frame: pd.DataFrame) -> List[Dict]:
+    """Baris frame sebagai dict dengan NaN -> None (siap untuk executemany)."""
+    cleaned = frame.astype(object).where(frame.notna(), None)
+    return cleaned.to_dict('records')
+
+
+def upsert_food_frame(frame: pd.DataFrame, stats: ImportStats) -> None:
+    """
+    Upsert satu chunk berdasarkan food_code (baris tanpa kode dicocokkan lewat nama).
+    Baris baru di-insert dan baris yang berubah di-update per primary key, masing-masing
+    dengan satu executemany (INSERT multi-baris); baris yang sama persis tidak disentuh.
+    id makanan yang sudah ada tidak berubah sehingga riwayat rekomendasi tetap valid.
+    """
+    named = frame['name'].notna()
+    stats.skipped += int((~named).sum())
+    frame = frame[named]
+    if frame.empty:
+        return
+
+    # Kode yang muncul lebih dari sekali: baris terakhir yang berlaku
+    coded = frame[frame['food_code'].notna()].drop_duplicates('food_code', keep='last')
+    uncoded = frame[frame['food_code'].isna()].drop_duplicates('name', keep='last')
+    stats.skipped += len(frame) - len(coded) - len(uncoded)
+
+    columns = [Food.id] + [getattr(Food, col) for col in IMPORT_COLUMNS]
+    existing_rows = []
+    if len(coded):
+        existing_rows += db.session.query(*columns).filter(Food.food_code.in_(coded['food_code'].tolist())).all()
+    if len(uncoded):
+        existing_rows += db.session.query(*columns).filter(
+            Food.food_code.is_(None), Food.name.in_(uncoded['name'].tolist())
+        ).all()
+    existing = pd.DataFrame(existing_rows, columns=['id'] + IMPORT_COLUMNS)
+    existing['key'] = existing['food_code'].where(existing['food_code'].notna(), '\0' + existing['name'].fillna(''))
+    existing = existing.drop_duplicates('key').set_index('key')
+
+    frame = pd.concat([coded, uncoded])
+    keys = frame['food_code'].where(frame['food_code'].notna(), '\0' + frame['name'])
+    found = keys.isin(existing.index).to_numpy()
+
+    new_rows = frame[~found]
+    matched = frame[found]
+    old = existing.loc[keys[found]]
+    changed = _changed_mask(matched, old) if len(matched) else np.zeros(0, dtype=bool)
+
+    now = datetime.utcnow()
+    if len(new_rows):
+        rows = _records(new_rows)
+        for row in rows:
+            row['created_at'] = now
+            row['updated_at'] = now
+        db.session.execute(insert(Food), rows)
+    if changed.any():
+        rows = _records(matched[changed])
+        for row, food_id in zip(rows, old['id'].to_numpy()[changed].tolist()):
+            row['id'] = food_id
+            row['updated_at'] = now
+        db.session.execute(update(Food), rows)
+
+    stats.inserted += len(new_rows)
+    stats.updated += int(changed.sum())
+    stats.unchanged += int((~changed).sum())
+
+
+def import_food_csv(
+    file_path: str, column_map: Dict[str, str] = CURATED_COLUMNS, chunk_size: int = 1000,
+    source: Optional[FoodSource] = None, seen: Optional[Set[str]] = None
+) -> ImportStats:
+    """
+    Import streaming satu file CSV ke tabel foods, commit per chunk.
+    Jika seen diberikan, makanan yang hash namanya sudah ada di seen dilewati (dan hash
+    makanan baru ditambahkan) sehingga beberapa sumber bisa digabung tanpa duplikat.
+    """
+    stats = ImportStats()
+    source = source or FoodSource(os.path.basename(file_path), os.path.basename(file_path), column_map)
+    chunks = read_food_chunks(file_path, source, chunk_size)
+    while True:
+        start = time.perf_counter()
+        frame = next(chunks, None)
+        stats.parse_seconds += time.perf_counter() - start
+        if frame is None:
+            break
+        if seen is not None:
+            frame = drop_seen_foods(frame, seen, stats)
+        start = time.perf_counter()
+        try:
+            upsert_food_frame(frame, stats)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        stats.write_seconds += time.perf_counter() - start
+    return stats
+
+
+def import_food_sources(source_dir: str, sources: Sequence[FoodSource] = FOOD_SOURCES, chunk_size: int = 1000) -> Dict[str, ImportStats]:
+    """
+    Gabungkan beberapa dataset ke tabel foods dalam satu kali jalan, sesuai urutan prioritas.
+    Makanan yang sama (hash nama) hanya diambil dari sumber pertama yang memilikinya.
+    """
+    seen: Set[str] = set()
+    results = {}
+    for source in sources:
+        file_path = os.path.join(source_dir, source.filename)
+        results[source.name] = import_food_csv(file_path, chunk_size=chunk_size, source=source, seen=seen)
+    return results
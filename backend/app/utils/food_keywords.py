@@ -0,0 +1,71 @@
+# Daftar kata kunci bernama yang dipakai oleh aturan medis, alergi dan meal type.
+# Setiap set dievaluasi sekali per pemuatan FoodCatalog menjadi kolom boolean per makanan,
+# sehingga scorer cukup melakukan lookup tanpa memindai nama makanan setiap request.
+KEYWORD_SETS = {
+    # NutritionDecisionTree: makanan yang ditolak per kondisi medis
+    'high_sodium': [
+        'dendeng', 'ikan asin', 'ikan kering', 'terasi', 'kerupuk',
+        'kecap', 'tauco', 'abon', 'sosis', 'kornet', 'sardines',
+        'keripik', 'rempeyek', 'emping', 'krupuk'
+    ],
+    'high_carb': [
+        'tepung', 'nasi', 'mie', 'pasta', 'roti manis', 'kue',
+        'dodol', 'gula', 'sirup', 'es krim', 'permen'
+    ],
+    'high_cal_fried': [
+        'goreng', 'keripik', 'gorengan', 'rempeyek', 'krupuk',
+        'dendeng', 'rendang'
+    ],
+    'added_sugar': ['manis', 'gula', 'sirup', 'madu'],
+
+    # HybridDietRecommender._add_medical_condition_bonuses
+    'sweet': ['manis', 'gula', 'sirup', 'dodol', 'kue'],
+    'processed_salty': ['dendeng', 'asin', 'kering', 'keripik', 'abon'],
+    'fried': ['goreng', 'keripik', 'dendeng', 'rempeyek'],
+
+    # HybridDietRecommender._classify_meal_type_by_calories
+    'breakfast': ['bubur', 'oatmeal', 'sereal', 'lontong', 'nasi uduk', 'nasi kuning', 'roti', 'sandwich', 'omelet', 'telur dadar', 'saridele'],
+    'snack': ['kue', 'biskuit', 'keripik', 'gorengan', 'puding', 'es krim', 'eskrim', 'rujak', 'coklat', 'permen', 'yogurt', 'buah potong', 'kacang', 'rempeyek', 'pastel', 'risoles', 'kwaci', 'dodol', 'getuk', 'emping', 'geplak', 'wajit', 'wingko', 'onde-onde'],
+    'drink': ['kopi', 'teh', 'jus', 'susu', 'smoothie', 'sirup', 'es '],  # Note trailing space for 'es '
+    'drink_excluded': ['susu kental manis', 'krimer'],
+    'main_dish': ['nasi', 'mie', 'pasta'],
+    'roti': ['roti'],
+    'martabak': ['martabak'],
+    'telur': ['telur'],
+    'bakwan': ['bakwan'],
+
+    # MLDecisionTreeRecommender._calculate_medical_bonus
+    'ml_sweet': ['manis', 'gula', 'sirup'],
+    'ml_salty': ['asin', 'dendeng', 'keripik'],
+    'ml_fried': ['goreng', 'keripik'],
+
+    # routes.recommendation._get_fallback_recommendations
+    'fallback_high_carb': ['tepung', 'gula', 'sirup', 'dodol', 'kue manis'],
+    'fallback_high_sodium': ['dendeng', 'asin', 'kering', 'keripik', 'abon', 'terasi'],
+    'fallback_high_cal': ['goreng', 'keripik', 'dendeng', 'rempeyek'],
+
+    # Logika persiapan makanan
+    'raw': ['mentah'],
+}
+
+# Jumlah pemindaian substring yang terjadi di luar indeks (untuk benchmark)
+string_scan_count = 0
+
+
+def name_matches(name_lower: str, keyword_set: str) -> bool:
+    """Pindai nama secara langsung (dipakai saat membangun indeks)."""
+    return any(keyword in name_lower for keyword in KEYWORD_SETS[keyword_set])
+
+
+def food_matches(food, keyword_set: str) -> bool:
+    """
+    Cek apakah nama makanan mengandung salah satu kata kunci dari set bernama.
+    Baris katalog memakai hasil yang sudah dihitung; objek ORM Food dipindai langsung.
+    """
+    keyword_sets = getattr(food, 'keyword_sets', None)
+    if keyword_sets is not None:
+        return keyword_set in keyword_sets
+
+    global string_scan_count
+    string_scan_count += 1
+    return name_matches((food.name or '').lower(), keyword_set)
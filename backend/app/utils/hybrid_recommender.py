@@ -4,12 +4,19 @@ from app.utils.decision_tree import NutritionDecisionTree
 from app.models.user import User
 from app.models.recommendation import DietGoal, Recommendation, FoodPreference
 from app.models.food import Food
+from app.utils.food_catalog import get_food_catalog
+from app.utils.preference_index import get_preference_index
+from app.utils.food_keywords import food_matches
 from app import db
+import numpy as np
 import random
 from datetime import datetime, timedelta 
 from collections import Counter
 
 class HybridDietRecommender:
+    # Versi logika skor; naikkan saat bobot atau aturan skor berubah agar cache menu harian ikut kedaluwarsa
+    MODEL_VERSION = 'hybrid-1'
+
     def __init__(self):
         self.cf_recommender = DietCollaborativeFiltering(n_neighbors=5)
         self.nutrition_recommender = NutritionDecisionTree()
@@ -79,6 +86,52 @@ class HybridDietRecommender:
                 return False
         return True
 
+    def _eligible_mask(self, catalog, candidate_positions, preferences: List[str]):
+        """Mask boolean katalog: kandidat (punya kalori) yang cocok dengan preferensi user."""
+        eligible = np.zeros(catalog.size, dtype=bool)
+        eligible[candidate_positions] = catalog.preference_mask(preferences)[candidate_positions]
+        return eligible
+
+    def merge_candidates(
+        self,
+        catalog,
+        eligible,
+        nutrition_positions,
+        nutrition_scores,
+        cf_food_ids: List[int],
+        cf_scores: List[float]
+    ) -> Dict[int, Dict]:
+        """
+        Gabungkan skor nutrisi (posisi katalog + skor, urut skor) dan skor CF (food id + skor)
+        menjadi food_scores per food id. Lookup memakai dict/posisi katalog,
+        sehingga biayanya linear terhadap jumlah kandidat.
+        """
+        food_scores = {}
+        for pos, score in zip(nutrition_positions.tolist(), nutrition_scores.tolist()):
+            food = catalog.foods[pos]
+            food_scores[food.id] = {
+                'food': food,
+                'nutrition_score': score,
+                'cf_score': 0.0,
+                'medical_bonus': 0.0 
+            }
+
+        for food_id, cf_score in zip(cf_food_ids, cf_scores):
+            data = food_scores.get(food_id)
+            if data is not None:
+                data['cf_score'] = cf_score
+                continue
+            # Food from CF not in nutrition results (e.g. filtered by medical rules)
+            pos = catalog.position_by_id.get(food_id)
+            if pos is not None and eligible[pos]:
+                food_scores[food_id] = {
+                    'food': catalog.foods[pos],
+                    'nutrition_score': 0.3, # Assign a neutral default nutrition score
+                    'cf_score': cf_score,
+                    'medical_bonus': 0.0
+                }
+        return food_scores
+
     def get_recommendations(
         self,
         user: User,
@@ -94,57 +147,36 @@ class HybridDietRecommender:
                 'Sarapan': 10, 'Makan Siang': 10, 'Makan Malam': 10, 'Cemilan': 10
             }
 
-        all_foods_query = Food.query.filter(Food.caloric_value.isnot(None))
+        catalog = get_food_catalog()
         # Exclude "Bahan Dasar" from being directly recommended as full meals initially
         # They can still be part of CF if rated, or nutrition if their components are analyzed.
         # For this system, if they are directly scorable for nutrition, they might pass through.
         # Let's keep them for now and see if scoring/classification handles them.
-        all_foods = all_foods_query.all()
+        candidate_positions = catalog.select(['caloric_value'])
 
 
-        if not all_foods:
+        if not len(candidate_positions):
             return []
 
-        filtered_foods = [
-            food for food in all_foods if self._matches_preferences(food, preferences or [])
-        ]
+        eligible = self._eligible_mask(catalog, candidate_positions, preferences or [])
+        filtered_positions = get_preference_index(catalog).candidates(preferences or [])
 
-        if not filtered_foods:
+        if not len(filtered_positions):
             print(f"User {user.id}: No foods match preferences: {preferences}")
             return []
         
-        nutrition_recs_input_ids = [f.id for f in filtered_foods]
-        nutrition_recs = self.nutrition_recommender.get_nutrition_recommendations(
-            user, goal, n_recommendations=len(filtered_foods), food_ids_to_consider=nutrition_recs_input_ids
+        nutrition_positions, nutrition_scores = self.nutrition_recommender.get_nutrition_score_arrays(
+            user, goal, catalog, filtered_positions
         )
 
         cf_recs = self.cf_recommender.get_recommendations(
-            user.id, n_recommendations=min(total_initial_candidates, len(filtered_foods))
+            user.id, n_recommendations=min(total_initial_candidates, len(filtered_positions))
         )
 
-        food_scores = {}
-        for rec in nutrition_recs:
-            food_obj_from_filtered = next((f for f in filtered_foods if f.id == rec['food_id']), None)
-            if food_obj_from_filtered:
-                food_scores[rec['food_id']] = {
-                    'food': food_obj_from_filtered,
-                    'nutrition_score': rec['nutrition_score'],
-                    'cf_score': 0.0,
-                    'medical_bonus': 0.0 
-                }
-        
-        for rec in cf_recs:
-            if rec['food_id'] in food_scores:
-                food_scores[rec['food_id']]['cf_score'] = rec['cf_score']
-            elif rec['food_id'] not in food_scores: # Food from CF not in nutrition_recs (e.g. not matching preferences after nutrition filtering)
-                food_obj_from_all = next((f for f in all_foods if f.id == rec['food_id']), None)
-                if food_obj_from_all and self._matches_preferences(food_obj_from_all, preferences or []):
-                     food_scores[rec['food_id']] = {
-                        'food': food_obj_from_all,
-                        'nutrition_score': 0.3, # Assign a neutral default nutrition score
-                        'cf_score': rec['cf_score'],
-                        'medical_bonus': 0.0
-                    }
+        food_scores = self.merge_candidates(
+            catalog, eligible, nutrition_positions, nutrition_scores,
+            [rec['food_id'] for rec in cf_recs], [rec['cf_score'] for rec in cf_recs]
+        )
 
 
         self._add_medical_condition_bonuses(food_scores, goal.medical_condition)
@@ -168,7 +200,7 @@ class HybridDietRecommender:
             if food_obj.food_status == 'Bahan Dasar':
                 preparation_priority_score_value = 0.05 # Very low, requires significant processing
             elif food_obj.food_status == 'Olahan':
-                if 'mentah' in food_obj.name.lower(): 
+                if food_matches(food_obj, 'raw'): 
                     preparation_priority_score_value = 0.3 
                 else:
                     preparation_priority_score_value = 1.0 
@@ -226,7 +258,6 @@ class HybridDietRecommender:
             bonus = 0.0
             penalty = 0.0
             
-            food_name_lower = food.name.lower()
             food_carbohydrates = food.carbohydrates if food.carbohydrates is not None else 0
             food_dietary_fiber = food.dietary_fiber if food.dietary_fiber is not None else 0
             food_caloric_value = food.caloric_value if food.caloric_value is not None else 0
@@ -256,7 +287,7 @@ class HybridDietRecommender:
                     penalty += 0.5
                 
                 # Penalty for sweet foods
-                if any(keyword in food_name_lower for keyword in ['manis', 'gula', 'sirup', 'dodol', 'kue']):
+                if food_matches(food, 'sweet'):
                     penalty += 0.3
                     
             elif medical_condition == 'hypertension':
@@ -285,7 +316,7 @@ class HybridDietRecommender:
                     penalty += 0.3
                 
                 # Penalty for processed foods
-                if any(keyword in food_name_lower for keyword in ['dendeng', 'asin', 'kering', 'keripik', 'abon']):
+                if food_matches(food, 'processed_salty'):
                     penalty += 0.4
                     
             elif medical_condition == 'obesity':
@@ -320,7 +351,7 @@ class HybridDietRecommender:
                     penalty += 0.3
                 
                 # Penalty for fried foods
-                if any(keyword in food_name_lower for keyword in ['goreng', 'keripik', 'dendeng', 'rempeyek']):
+                if food_matches(food, 'fried'):
                     penalty += 0.4
             
             # Apply final score adjustment
@@ -410,23 +441,19 @@ class HybridDietRecommender:
         
         # 2. If CSV meal_type is "Bahan Dasar" or not useful, classify
         calories_kcal = food.caloric_value if food.caloric_value is not None else 0
-        name_lower = food.name.lower()
         food_group = food.food_group.lower() if food.food_group else ""
         
-        breakfast_keywords = ['bubur', 'oatmeal', 'sereal', 'lontong', 'nasi uduk', 'nasi kuning', 'roti', 'sandwich', 'omelet', 'telur dadar', 'saridele']
-        snack_keywords = ['kue', 'biskuit', 'keripik', 'gorengan', 'puding', 'es krim', 'eskrim', 'rujak', 'coklat', 'permen', 'yogurt', 'buah potong', 'kacang', 'rempeyek', 'pastel', 'risoles', 'kwaci', 'dodol', 'getuk', 'emping', 'geplak', 'wajit', 'wingko', 'onde-onde']
-        drink_keywords = ['kopi', 'teh', 'jus', 'susu', 'smoothie', 'sirup', 'es '] # Note trailing space for 'es '
-
-        if any(kw in name_lower for kw in breakfast_keywords) or 'serealia' in food_group and 'roti' in name_lower:
+        # Keyword sets 'breakfast', 'snack' and 'drink' live in app.utils.food_keywords
+        if food_matches(food, 'breakfast') or 'serealia' in food_group and food_matches(food, 'roti'):
             if 50 < calories_kcal < 600 : return 'Sarapan' # Wider range for breakfast items
-        if any(kw in name_lower for kw in snack_keywords) or 'buah' in food_group and calories_kcal < 350:
+        if food_matches(food, 'snack') or 'buah' in food_group and calories_kcal < 350:
              # Exclude items that are substantial despite snack keywords
-            if not (("martabak" in name_lower and "telur" in name_lower and calories_kcal > 250) or \
-                    ("bakwan" in name_lower and calories_kcal > 200 and protein_g > 5)):
+            if not ((food_matches(food, 'martabak') and food_matches(food, 'telur') and calories_kcal > 250) or \
+                    (food_matches(food, 'bakwan') and calories_kcal > 200 and protein_g > 5)):
                 if 20 < calories_kcal < 600 : return 'Cemilan' # Wider range for snack items
 
-        if any(kw in name_lower for kw in drink_keywords) and calories_kcal < 350:
-            if 'susu kental manis' not in name_lower and 'krimer' not in name_lower:
+        if food_matches(food, 'drink') and calories_kcal < 350:
+            if not food_matches(food, 'drink_excluded'):
                  return 'Cemilan' # Drinks are usually snacks/part of breakfast
 
         # General calorie-based classification as fallback
@@ -442,10 +469,10 @@ class HybridDietRecommender:
         elif calories_kcal <= 500: # Medium cal
             if 'daging' in food_group or 'ikan' in food_group or 'telur' in food_group and protein_g > 15:
                  # Check if it's a clear breakfast item by name, otherwise could be light lunch
-                if any(kw in name_lower for kw in breakfast_keywords): return 'Sarapan'
+                if food_matches(food, 'breakfast'): return 'Sarapan'
                 return 'Makan Siang' 
             if 'serealia' in food_group and protein_g > 10 and carbs_g > 20: return 'Sarapan' # Substantial breakfast
-            if 'nasi' in name_lower or 'mie' in name_lower or 'pasta' in name_lower : return 'Makan Siang'
+            if food_matches(food, 'main_dish'): return 'Makan Siang'
             return 'Sarapan' # Default for this range if not clearly lunch/snack
         elif calories_kcal <= 800: # Higher cal, likely main meal
             if 'sayur' in food_group and protein_g < 10 : return 'Makan Siang' # e.g. Gado-gado like items
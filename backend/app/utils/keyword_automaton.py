@@ -0,0 +1,74 @@
+from collections import deque
+from typing import Dict, Iterable, List
+
+
+class KeywordAutomaton:
+    """
+    Automaton Aho-Corasick untuk banyak set kata kunci bernama.
+    Semua kata kunci dikompilasi sekali menjadi satu DFA; scan() membaca teks satu kali
+    dan mengembalikan bitmask set yang punya kata kunci muncul sebagai substring
+    (hasilnya sama dengan any(keyword in text for keyword in set) untuk setiap set).
+    """
+
+    def __init__(self, keyword_sets: Dict[str, Iterable[str]]):
+        self.names: List[str] = list(keyword_sets)
+        self.bits: Dict[str, int] = {name: 1 << i for i, name in enumerate(self.names)}
+
+        # Trie: transisi per state dan bitmask set yang berakhir di state tersebut
+        goto: List[Dict[str, int]] = [{}]
+        output: List[int] = [0]
+        for name, keywords in keyword_sets.items():
+            bit = self.bits[name]
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                state = 0
+                for ch in keyword:
+                    next_state = goto[state].get(ch)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto[state][ch] = next_state
+                        goto.append({})
+                        output.append(0)
+                    state = next_state
+                output[state] |= bit
+
+        # Failure link (BFS) lalu ratakan menjadi DFA penuh: setiap state punya transisi
+        # langsung untuk semua karakter yang pernah dilihat turunannya, dan output mencakup
+        # semua kata kunci yang merupakan sufiks dari state tersebut
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            output[state] |= output[fail[state]]
+            transitions = dict(delta[fail[state]])
+            for ch, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(ch, 0)
+                transitions[ch] = child
+                queue.append(child)
+            delta[state] = transitions
+        self._delta = delta
+        self._output = output
+
+    def scan(self, text: str) -> int:
+        """Bitmask set kata kunci yang muncul di text."""
+        delta = self._delta
+        output = self._output
+        state = 0
+        found = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            found |= output[state]
+        return found
+
+    def mask(self, *names: str) -> int:
+        """Bitmask gabungan untuk set bernama (untuk dites dengan hasil scan())."""
+        result = 0
+        for name in names:
+            result |= self.bits[name]
+        return result
+
+    def matched_sets(self, text: str) -> List[str]:
+        found = self.scan(text)
+        return [name for name in self.names if found & self.bits[name]]
@@ -0,0 +1,50 @@
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+
+class DailyMenuCache:
+    """
+    Cache menu harian per user di memori proses.
+    Entri berlaku selama key (user, tanggal, goal, preferensi, versi katalog,
+    versi model, waktu update profil) sama dan baris Recommendation hari ini
+    di database masih persis seperti saat menu disimpan. Pengecekan baris ini
+    membuat perubahan dari worker lain (menu dibuat ulang, feedback) tetap terdeteksi.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Tuple[Tuple, List[Tuple], Dict]] = {}
+        self._day = date.today()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, key: Tuple, stored_rows: List[Tuple]) -> Optional[Dict]:
+        """Response menu yang tersimpan, atau None jika key/baris hari ini berubah."""
+        entry = self._entries.get(int(user_id))
+        if entry is not None and entry[0] == key and entry[1] == stored_rows:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def put(self, user_id, key: Tuple, stored_rows: List[Tuple], response: Dict) -> None:
+        today = date.today()
+        with self._lock:
+            if today != self._day:
+                # Menu hari sebelumnya tidak akan dipakai lagi
+                self._entries.clear()
+                self._day = today
+            self._entries[int(user_id)] = (key, list(stored_rows), response)
+
+    def invalidate(self, user_id) -> None:
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Satu cache per proses, dipakai bersama oleh semua request
+daily_menu_cache = DailyMenuCache()
@@ -0,0 +1,162 @@
+import threading
+from datetime import date
+from typing import Dict, List, Sequence
+import numpy as np
+from app.models.user import User
+from app.models.recommendation import DietGoal
+
+# Nilai kategori yang di-one-hot encode (sama seperti saat generate dataset)
+MEDICAL_CONDITIONS = ['diabetes', 'hypertension', 'none', 'obesity']
+DIET_PREFERENCES = ['halal', 'vegetarian']
+ALLERGIES = ['dairy_free', 'egg_free', 'nut_free', 'seafood_free', 'soy_free']
+GENDERS = ['F', 'M']
+ACTIVITIES = ['active', 'light', 'moderate', 'sedentary', 'very_active']
+FOOD_STATUSES = ['Bahan Dasar', 'Olahan', 'Tunggal']
+FOOD_GROUPS = [
+    'Bahan makanan sumber energi', 'Bahan makanan sumber lemak',
+    'Bahan makanan sumber protein hewani', 'Bahan makanan sumber protein nabati',
+    'Bahan makanan sumber vitamin dan mineral', 'Makanan jadi',
+    'Minuman', 'Rempah dan bumbu'
+]
+MEAL_TYPES = ['Bahan Dasar', 'Cemilan', 'Makan Malam', 'Makan Siang', 'Sarapan']
+
+# Kolom nutrisi katalog yang menjadi fitur 'food_<kolom>'
+FOOD_NUTRIENT_FEATURES = [
+    'caloric_value', 'protein', 'carbohydrates', 'fat', 'dietary_fiber', 'sodium',
+    'potassium', 'calcium', 'iron', 'zinc', 'vitamin_c'
+]
+
+USER_NUMERIC_FEATURES = [
+    'user_age', 'user_weight', 'user_height', 'user_bmi',
+    'target_weight', 'target_date_days_from_now'
+]
+
+# Urutan kolom default (dipakai jika model tidak menyimpan feature_names_in_)
+FEATURE_COLUMNS = (
+    USER_NUMERIC_FEATURES
+    + [f'medical_condition_{value}' for value in MEDICAL_CONDITIONS]
+    + [f'diet_preference_{value}' for value in DIET_PREFERENCES]
+    + [f'allergy_{value}' for value in ALLERGIES]
+    + [f'gender_{value}' for value in GENDERS]
+    + [f'activity_{value}' for value in ACTIVITIES]
+    + [f'food_{col}' for col in FOOD_NUTRIENT_FEATURES]
+    + [f'food_status_{value}' for value in FOOD_STATUSES]
+    + [f'food_group_{value}' for value in FOOD_GROUPS]
+    + [f'meal_type_{value}' for value in MEAL_TYPES]
+)
+
+FOOD_FEATURES = (
+    [f'food_{col}' for col in FOOD_NUTRIENT_FEATURES]
+    + [f'food_status_{value}' for value in FOOD_STATUSES]
+    + [f'food_group_{value}' for value in FOOD_GROUPS]
+    + [f'meal_type_{value}' for value in MEAL_TYPES]
+)
+
+
+def user_feature_values(user: User, goal: DietGoal, preferences: List[str]) -> Dict[str, float]:
+    """Fitur yang sama untuk semua makanan dalam satu request (NULL menjadi 0)."""
+    values = {
+        'user_age': user.age,
+        'user_weight': user.weight,
+        'user_height': user.height,
+        'user_bmi': user.weight / ((user.height / 100) ** 2),
+        'target_weight': goal.target_weight,
+        'target_date_days_from_now': (goal.target_date - date.today()).days,
+    }
+    for condition in MEDICAL_CONDITIONS:
+        values[f'medical_condition_{condition}'] = 1 if goal.medical_condition == condition else 0
+    for pref in DIET_PREFERENCES:
+        values[f'diet_preference_{pref}'] = 1 if pref in preferences else 0
+    for allergy in ALLERGIES:
+        values[f'allergy_{allergy}'] = 1 if allergy in preferences else 0
+    for gender in GENDERS:
+        values[f'gender_{gender}'] = 1 if user.gender == gender else 0
+    for activity in ACTIVITIES:
+        values[f'activity_{activity}'] = 1 if user.activity_level == activity else 0
+    return {col: 0 if value is None else value for col, value in values.items()}
+
+
+def encode_food_features(catalog) -> np.ndarray:
+    """Matriks fitur makanan (n_foods x len(FOOD_FEATURES)) untuk seluruh katalog."""
+    matrix = np.zeros((catalog.size, len(FOOD_FEATURES)), dtype=np.float32)
+    column = 0
+    for col in FOOD_NUTRIENT_FEATURES:
+        matrix[:, column] = np.nan_to_num(catalog.column(col), nan=0.0)
+        column += 1
+    for code_column, values in (('food_status', FOOD_STATUSES), ('food_group', FOOD_GROUPS), ('meal_type', MEAL_TYPES)):
+        codes = catalog.codes[code_column]
+        for value in values:
+            code = catalog.code_of(code_column, value)
+            if code >= 0:
+                matrix[:, column] = codes == code
+            column += 1
+    return matrix
+
+
+_food_feature_cache = {}
+_food_feature_lock = threading.Lock()
+
+
+def get_food_feature_matrix(catalog) -> np.ndarray:
+    """Matriks fitur makanan yang di-cache per versi katalog."""
+    matrix = _food_feature_cache.get(catalog.version)
+    if matrix is None:
+        with _food_feature_lock:
+            matrix = _food_feature_cache.get(catalog.version)
+            if matrix is None:
+                matrix = encode_food_features(catalog)
+                _food_feature_cache.clear()  # Hanya versi katalog terbaru yang disimpan
+                _food_feature_cache[catalog.version] = matrix
+    return matrix
+
+
+class FeatureMatrixBuilder:
+    """
+    Menyusun matriks prediksi float32 dengan urutan kolom yang dipatok ke model.
+    Blok fitur user ditulis sekali lalu di-broadcast ke semua baris; blok fitur makanan
+    diambil dari matriks katalog yang sudah di-encode. Kolom yang tidak dikenal bernilai 0.
+    """
+
+    def __init__(self, feature_columns: Sequence[str]):
+        self.feature_columns = list(feature_columns)
+        food_index = {col: idx for idx, col in enumerate(FOOD_FEATURES)}
+        user_columns = set(FEATURE_COLUMNS) - set(FOOD_FEATURES)
+
+        self.user_targets = np.array(
+            [i for i, col in enumerate(self.feature_columns) if col in user_columns], dtype=np.int64
+        )
+        self.user_columns = [self.feature_columns[i] for i in self.user_targets]
+        self.food_targets = np.array(
+            [i for i, col in enumerate(self.feature_columns) if col in food_index], dtype=np.int64
+        )
+        self.food_sources = np.array(
+            [food_index[self.feature_columns[i]] for i in self.food_targets], dtype=np.int64
+        )
+
+    def user_vector(self, user: User, goal: DietGoal, preferences: List[str]) -> np.ndarray:
+        """Nilai fitur user untuk kolom user_targets (float32)."""
+        user_values = user_feature_values(user, goal, preferences)
+        return np.array([user_values[col] for col in self.user_columns], dtype=np.float32)
+
+    def build(self, user: User, goal: DietGoal, preferences: List[str], catalog, positions: np.ndarray) -> np.ndarray:
+        return self.build_for_user_vector(self.user_vector(user, goal, preferences), catalog, positions)
+
+    def build_for_user_vector(self, user_vector: np.ndarray, catalog, positions: np.ndarray) -> np.ndarray:
+        features = np.zeros((len(positions), len(self.feature_columns)), dtype=np.float32)
+        features[:, self.user_targets] = user_vector
+        food_matrix = get_food_feature_matrix(catalog)
+        features[:, self.food_targets] = food_matrix[np.ix_(positions, self.food_sources)]
+        return features
+
+    def food_rows(self, catalog) -> np.ndarray:
+        """Baris fitur lengkap (urutan kolom model) untuk seluruh katalog, kolom user bernilai 0."""
+        food_matrix = get_food_feature_matrix(catalog)
+        rows = np.zeros((catalog.size, len(self.feature_columns)), dtype=np.float32)
+        rows[:, self.food_targets] = food_matrix[:, self.food_sources]
+        return rows
+
+    def user_rows(self, user_vectors: np.ndarray) -> np.ndarray:
+        """Baris fitur lengkap per user, kolom makanan bernilai 0."""
+        rows = np.zeros((len(user_vectors), len(self.feature_columns)), dtype=np.float32)
+        rows[:, self.user_targets] = user_vectors
+        return rows
@@ -0,0 +1,239 @@
+import os
+import re
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Optional, Tuple
+import numpy as np
+from flask import current_app
+from app.utils.compiled_tree import CompiledDecisionTree
+from app.utils.ml_features import FEATURE_COLUMNS, FeatureMatrixBuilder
+from app.utils.scoring_batcher import ScoringBatcher
+
+# Artefak berversi, versi tertinggi yang dipakai. Untuk versi yang sama, tree hasil
+# kompilasi (flask export-model) didahulukan karena tidak membutuhkan sklearn.
+MODEL_FILENAME_PATTERN = re.compile(r'^decision_tree_(classifier|compiled)_v(\d+)\.(joblib|npz)$')
+ARTIFACT_PRIORITY = {'joblib': 0, 'npz': 1}
+
+
+def default_model_dir() -> str:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(script_dir, '..', '..', 'dataset-diet'))
+
+
+class LoadedModel:
+    """
+    Model yang sudah dimuat beserta tree terkompilasi, urutan kolom fitur dan builder-nya
+    (read-only, dipakai bersama). tree bernilai None untuk model sklearn selain decision tree.
+    """
+
+    def __init__(self, model, path: str, version: Optional[int]):
+        self.model = model
+        self.path = path
+        self.version = version
+        if isinstance(model, CompiledDecisionTree):
+            self.tree = model
+            self.feature_columns = model.feature_columns
+        else:
+            # Urutan kolom dipatok ke model (feature_names_in_ jika model dilatih dengan DataFrame),
+            # selain itu memakai urutan yang sama seperti saat generate dataset
+            model_columns = getattr(model, 'feature_names_in_', None)
+            self.feature_columns = list(model_columns) if model_columns is not None else list(FEATURE_COLUMNS)
+            self.tree = CompiledDecisionTree.from_sklearn(model, self.feature_columns) if hasattr(model, 'tree_') else None
+        self.feature_builder = FeatureMatrixBuilder(self.feature_columns)
+        self.score_cache = None
+        if self.tree is not None:
+            config = current_app.config
+            batcher = ScoringBatcher(
+                self.tree, self.feature_builder,
+                max_size=config.get('ML_BATCH_MAX_SIZE', 32),
+                max_wait_ms=config.get('ML_BATCH_MAX_WAIT_MS', 2.0),
+                timeout_ms=config.get('ML_BATCH_TIMEOUT_MS', 1000.0)
+            ) if config.get('ML_BATCH_ENABLED', True) else None
+            self.score_cache = SignatureScoreCache(
+                self.tree, self.feature_builder, config.get('ML_SIGNATURE_CACHE_SIZE', 256), batcher
+            )
+
+
+class SignatureScoreCache:
+    """
+    Cache probabilitas per makanan berdasarkan "path signature" user.
+    Untuk makanan yang sama, fitur user hanya menentukan cabang mana yang diambil pada
+    node yang split di fitur user. User dengan hasil perbandingan yang sama di semua node
+    tersebut pasti mendapatkan probabilitas yang sama untuk setiap makanan, sehingga vektor
+    probabilitas seluruh katalog cukup dihitung sekali per signature. Cache melekat pada
+    model yang dimuat (hilang saat model di-swap) dan dikosongkan saat versi katalog berubah.
+    Signature yang belum ada di cache dihitung lewat ScoringBatcher jika tersedia.
+    """
+
+    def __init__(
+        self, tree: CompiledDecisionTree, builder: FeatureMatrixBuilder,
+        max_entries: int = 256, batcher: Optional[ScoringBatcher] = None
+    ):
+        self.tree = tree
+        self.builder = builder
+        self.max_entries = max_entries
+        self.batcher = batcher
+        user_nodes = np.flatnonzero(~tree.is_leaf & np.isin(tree.feature, builder.user_targets))
+        self._node_features = tree.feature[user_nodes]
+        self._node_thresholds = tree.threshold[user_nodes]
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._catalog_version = None
+        self.hits = 0
+        self.misses = 0
+
+    def signature(self, user_vector: np.ndarray) -> bytes:
+        row = np.zeros(len(self.builder.feature_columns), dtype=np.float32)
+        row[self.builder.user_targets] = user_vector
+        values = row[self._node_features]
+        # NaN mengikuti missing_go_to_left, jadi dicatat terpisah dari hasil perbandingan
+        return np.packbits(np.concatenate([values <= self._node_thresholds, np.isnan(values)])).tobytes()
+
+    def probabilities(self, user_vector: np.ndarray, catalog, positions: np.ndarray) -> np.ndarray:
+        """Probabilitas kelas 'direkomendasikan' untuk posisi katalog yang diminta."""
+        if self.batcher is None:
+            return self._probabilities(user_vector, catalog, positions)
+        with self.batcher.active():
+            return self._probabilities(user_vector, catalog, positions)
+
+    def _probabilities(self, user_vector: np.ndarray, catalog, positions: np.ndarray) -> np.ndarray:
+        key = self.signature(user_vector)
+        with self._lock:
+            if catalog.version != self._catalog_version:
+                self._entries.clear()
+                self._catalog_version = catalog.version
+            scores = self._entries.get(key)
+            if scores is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return scores[positions]
+            self.misses += 1
+
+        if self.batcher is not None:
+            scores = self.batcher.score(key, user_vector, catalog)
+        else:
+            all_positions = np.arange(catalog.size)
+            scores = self.tree.predict_positive(
+                self.builder.build_for_user_vector(user_vector, catalog, all_positions)
+            )
+        with self._lock:
+            if catalog.version == self._catalog_version:
+                self._entries[key] = scores
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return scores[positions]
+
+
+class _RegistryEntry:
+    __slots__ = ['model', 'signature', 'checked_at']
+
+    def __init__(self, model: Optional[LoadedModel], signature, checked_at: float):
+        self.model = model
+        self.signature = signature
+        self.checked_at = checked_at
+
+
+class ModelRegistry:
+    """
+    Registry model per proses.
+    Setiap artefak dimuat sekali (memory-mapped jika joblib mengizinkan) dan dipakai bersama
+    oleh semua thread. Direktori/file dicek ulang paling sering setiap ML_MODEL_RECHECK_SECONDS:
+    versi baru di-swap secara atomik tanpa restart, dan status "model tidak tersedia"
+    juga di-cache sehingga fallback dipilih tanpa I/O disk.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _recheck_seconds(self) -> float:
+        return current_app.config.get('ML_MODEL_RECHECK_SECONDS', 30)
+
+    def get(self, source: Optional[str] = None) -> Optional[LoadedModel]:
+        """
+        Model untuk source: direktori (versi tertinggi) atau path file .joblib/.npz.
+        None jika tidak ada model yang bisa dimuat.
+        """
+        source = source or default_model_dir()
+        entry = self._entries.get(source)
+        if entry is not None and time.monotonic() - entry.checked_at < self._recheck_seconds():
+            return entry.model
+
+        with self._lock:
+            entry = self._entries.get(source)
+            now = time.monotonic()
+            if entry is not None and now - entry.checked_at < self._recheck_seconds():
+                return entry.model
+
+            path, version, signature = self._resolve(source)
+            if entry is not None and entry.signature == signature:
+                entry.checked_at = now
+                return entry.model
+            if entry is not None:
+                # Thread lain tetap memakai model lama selama versi baru dimuat
+                entry.checked_at = now
+
+            model = self._load(path, version) if path else None
+            if model is None and entry is not None and entry.model is not None and path:
+                # Artefak baru gagal dimuat: pertahankan model lama
+                model = entry.model
+            elif model is None and not path:
+                print(f"Model tidak ditemukan di: {source}")
+            self._entries[source] = _RegistryEntry(model, signature, time.monotonic())
+            return model
+
+    def _resolve(self, source: str) -> Tuple[Optional[str], Optional[int], Optional[tuple]]:
+        """(path, versi, signature) artefak yang berlaku; signature berubah jika file berubah."""
+        if os.path.isdir(source):
+            candidates = []
+            with os.scandir(source) as entries:
+                for dir_entry in entries:
+                    match = MODEL_FILENAME_PATTERN.match(dir_entry.name)
+                    if match and dir_entry.is_file():
+                        candidates.append((
+                            int(match.group(2)), ARTIFACT_PRIORITY[match.group(3)],
+                            dir_entry.path, dir_entry.stat().st_mtime_ns
+                        ))
+            if not candidates:
+                return None, None, None
+            version, _, path, mtime = max(candidates)
+            return path, version, (path, mtime)
+
+        try:
+            mtime = os.stat(source).st_mtime_ns
+        except OSError:
+            return None, None, None
+        match = MODEL_FILENAME_PATTERN.match(os.path.basename(source))
+        return source, int(match.group(2)) if match else None, (source, mtime)
+
+    def _load(self, path: str, version: Optional[int]) -> Optional[LoadedModel]:
+        try:
+            if path.endswith('.npz'):
+                model = CompiledDecisionTree.load(path)
+            else:
+                import joblib  # Hanya untuk artefak sklearn yang belum dikompilasi
+                with warnings.catch_warnings():
+                    # mmap_mode tidak berlaku untuk artefak terkompresi; joblib memuat biasa
+                    warnings.simplefilter('ignore', UserWarning)
+                    model = joblib.load(path, mmap_mode='r')
+            loaded = LoadedModel(model, path, version)
+            print(f"Model berhasil dimuat dari: {path}")
+            return loaded
+        except Exception as e:
+            print(f"Error memuat model: {str(e)}")
+            return None
+
+    def invalidate(self, source: Optional[str] = None) -> None:
+        """Paksa pengecekan ulang pada pemanggilan get() berikutnya."""
+        with self._lock:
+            if source is None:
+                for entry in self._entries.values():
+                    entry.checked_at = float('-inf')
+            elif source in self._entries:
+                self._entries[source].checked_at = float('-inf')
+
+
+# Satu registry per proses, dipakai bersama oleh semua request
+model_registry = ModelRegistry()
@@ -0,0 +1,151 @@
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.utils.compiled_tree import CompiledDecisionTree
+from app.utils.model_registry import MODEL_FILENAME_PATTERN
+
+# Ruang pencarian default untuk GridSearchCV (class_weight seperti skrip training lama)
+DEFAULT_PARAM_GRID = {
+    'max_depth': [5, 8, 12, 16, None],
+    'min_samples_leaf': [1, 5, 20],
+    'criterion': ['gini', 'entropy'],
+    'class_weight': ['balanced'],
+}
+
+
+def next_model_version(model_dir: str) -> int:
+    """Versi artefak berikutnya di direktori model (versi tertinggi + 1)."""
+    versions = [0]
+    if os.path.isdir(model_dir):
+        for name in os.listdir(model_dir):
+            match = MODEL_FILENAME_PATTERN.match(name)
+            if match:
+                versions.append(int(match.group(2)))
+    return max(versions) + 1
+
+
+def _latency_ms_per_1k(predict, X: np.ndarray, repeats: int = 5) -> float:
+    """Median waktu prediksi per 1000 baris (ms)."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) / len(X) * 1000 * 1000
+
+
+def train_decision_tree(
+    X: np.ndarray,
+    y: np.ndarray,
+    feature_columns: List[str],
+    param_grid: Optional[Dict] = None,
+    cv: int = 5,
+    n_jobs: int = -1,
+    test_size: float = 0.2,
+    scoring: str = 'accuracy',
+    seed: int = 42
+):
+    """
+    Cari hyperparameter DecisionTreeClassifier dengan GridSearchCV (stratified k-fold,
+    paralel di semua core jika n_jobs=-1), lalu evaluasi model terbaik pada data uji.
+    Seed dipatok untuk split, fold dan tree sehingga hasilnya bisa direproduksi.
+    Mengembalikan (model, laporan).
+    """
+    from sklearn.metrics import accuracy_score, balanced_accuracy_score, classification_report
+    from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+    from sklearn.tree import DecisionTreeClassifier
+
+    param_grid = param_grid or DEFAULT_PARAM_GRID
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=seed, stratify=y
+    )
+    # DataFrame satu blok float32 (tanpa salinan) agar model menyimpan feature_names_in_
+    X_train = pd.DataFrame(X_train, columns=feature_columns, copy=False)
+
+    search = GridSearchCV(
+        DecisionTreeClassifier(random_state=seed),
+        param_grid,
+        scoring=scoring,
+        cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed),
+        n_jobs=n_jobs,
+        refit=True
+    )
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    search_time = time.perf_counter() - start
+    model = search.best_estimator_
+
+    X_test_frame = pd.DataFrame(X_test, columns=feature_columns, copy=False)
+    y_pred = model.predict(X_test_frame)
+    tree = CompiledDecisionTree.from_sklearn(model, feature_columns)
+    latency_rows = X_test[:1000] if len(X_test) >= 1000 else X_test
+    latency_frame = pd.DataFrame(latency_rows, columns=feature_columns, copy=False)
+
+    report = {
+        'rows': int(len(X)),
+        'train_rows': int(len(X_train)),
+        'test_rows': int(len(X_test)),
+        'n_features': len(feature_columns),
+        'positive_rate': float(np.mean(y)) if len(y) else 0.0,
+        'seed': seed,
+        'search': {
+            'scoring': scoring,
+            'cv_folds': cv,
+            'n_jobs': n_jobs,
+            'candidates': len(search.cv_results_['params']),
+            'param_grid': param_grid,
+            'best_params': search.best_params_,
+            'best_cv_score': float(search.best_score_),
+            'search_time_s': round(search_time, 3),
+        },
+        'fit_time_s': round(float(search.refit_time_), 4),
+        'inference_ms_per_1k_rows': {
+            'sklearn_predict_proba': round(_latency_ms_per_1k(model.predict_proba, latency_frame), 4),
+            'compiled_tree': round(_latency_ms_per_1k(tree.predict_positive, latency_rows), 4),
+        },
+        'test_accuracy': float(accuracy_score(y_test, y_pred)),
+        'test_balanced_accuracy': float(balanced_accuracy_score(y_test, y_pred)),
+        'classification_report': classification_report(
+            y_test, y_pred, labels=[0, 1], target_names=['Tidak Direkomendasikan', 'Direkomendasikan'],
+            output_dict=True, zero_division=0
+        ),
+        'tree_depth': int(model.get_depth()),
+        'tree_nodes': int(model.tree_.node_count),
+    }
+    return model, report
+
+
+def save_model_artifact(model, feature_columns: List[str], report: Dict, model_dir: str, version: int) -> Dict[str, str]:
+    """
+    Simpan model berversi ke direktori registry beserta manifest kolom fitur dan laporan JSON.
+    Manifest dan laporan ditulis lebih dulu, artefak .joblib terakhir (via rename atomik)
+    sehingga ModelRegistry hanya pernah melihat versi yang sudah lengkap.
+    """
+    import joblib
+
+    os.makedirs(model_dir, exist_ok=True)
+    paths = {
+        'model': os.path.join(model_dir, f'decision_tree_classifier_v{version}.joblib'),
+        'manifest': os.path.join(model_dir, f'decision_tree_classifier_v{version}.manifest.json'),
+        'report': os.path.join(model_dir, f'decision_tree_classifier_v{version}.report.json'),
+    }
+    manifest = {
+        'version': version,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'model_type': type(model).__name__,
+        'feature_columns': list(feature_columns),
+        'classes': [int(value) for value in model.classes_],
+        'params': report.get('search', {}).get('best_params', {}),
+    }
+    for key, payload in (('manifest', manifest), ('report', dict(report, version=version))):
+        with open(paths[key], 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, default=str)
+
+    temp_path = paths['model'] + '.tmp'
+    joblib.dump(model, temp_path)
+    os.replace(temp_path, paths['model'])
+    return paths
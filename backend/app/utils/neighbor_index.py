@@ -0,0 +1,143 @@
+import numpy as np
+from typing import List, Set
+
+
+def _rank_by_cosine(unit: np.ndarray, query_idx: int, candidates: np.ndarray, k: int) -> List[int]:
+    """Urutkan kandidat dengan jarak cosine exact; seri diurutkan berdasarkan indeks baris."""
+    candidates = np.asarray(candidates, dtype=np.int64)
+    distances = 1.0 - unit[candidates] @ unit[query_idx]
+    k = min(k, len(candidates))
+    if k < len(candidates):
+        top = np.argpartition(distances, k - 1)[:k]
+        candidates, distances = candidates[top], distances[top]
+    order = np.lexsort((candidates, distances))
+    return candidates[order].tolist()
+
+
+class BruteForceIndex:
+    """Cosine exact terhadap semua baris (O(N) per query)."""
+    name = 'brute'
+
+    def build(self, unit: np.ndarray) -> None:
+        pass
+
+    def update(self, unit: np.ndarray, idx: int) -> None:
+        pass
+
+    def query(self, unit: np.ndarray, idx: int, k: int) -> List[int]:
+        return _rank_by_cosine(unit, idx, np.arange(len(unit)), k)
+
+
+class TreeIndex:
+    """
+    BallTree/KDTree (sklearn) atas vektor profil yang sudah dinormalisasi.
+    Untuk vektor satuan, jarak euclidean monoton terhadap jarak cosine.
+    Baris yang berubah setelah build dicari secara brute force sampai tree dibangun ulang.
+    """
+
+    def __init__(self, algorithm: str = 'ball_tree', leaf_size: int = 40, rebuild_fraction: float = 0.05):
+        self.name = algorithm
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+        self.tree = None
+        self.built_size = 0
+        self.dirty: Set[int] = set()
+
+    def build(self, unit: np.ndarray) -> None:
+        from sklearn.neighbors import BallTree, KDTree
+        tree_class = KDTree if self.algorithm == 'kd_tree' else BallTree
+        self.tree = tree_class(unit, leaf_size=self.leaf_size) if len(unit) else None
+        self.built_size = len(unit)
+        self.dirty = set()
+
+    def update(self, unit: np.ndarray, idx: int) -> None:
+        self.dirty.add(idx)
+        if len(self.dirty) > max(64, self.rebuild_fraction * len(unit)):
+            self.build(unit)
+
+    def query(self, unit: np.ndarray, idx: int, k: int) -> List[int]:
+        if self.tree is None:
+            return _rank_by_cosine(unit, idx, np.arange(len(unit)), k)
+        fetch = min(self.built_size, k + len(self.dirty))
+        _, found = self.tree.query(unit[idx:idx + 1], k=fetch)
+        # Baris kotor di tree menyimpan vektor lama: buang lalu evaluasi ulang secara exact
+        candidates = {int(i) for i in found[0] if int(i) not in self.dirty}
+        candidates.update(i for i in self.dirty if i < len(unit))
+        return _rank_by_cosine(unit, idx, np.fromiter(candidates, dtype=np.int64), k)
+
+
+class RandomProjectionLSHIndex:
+    """
+    LSH random-projection (hyperplane) murni NumPy.
+    Vektor profil bernilai non-negatif sehingga berkumpul di satu orthant;
+    hyperplane dipasang melalui rata-rata data (saat build) agar bucket seimbang.
+    Setiap tabel memetakan tanda proyeksi ke bucket; kandidat dari semua tabel
+    di-rerank dengan cosine exact. Jika kandidat kurang dari k, bucket tetangga
+    (beda satu bit) ikut diperiksa, lalu brute force sebagai jalan terakhir.
+    """
+    name = 'lsh'
+
+    def __init__(self, n_tables: int = 8, n_bits: int = 12, seed: int = 42):
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.seed = seed
+        self.planes = None
+        self.center = None
+        self.signatures = np.zeros((0, n_tables), dtype=np.int64)
+        self.buckets = []
+
+    def _signatures(self, vectors: np.ndarray) -> np.ndarray:
+        # (n, tables, bits) -> kode integer per tabel
+        projections = np.einsum('nd,tbd->ntb', vectors - self.center, self.planes) > 0
+        return projections.astype(np.int64) @ (1 << np.arange(self.n_bits, dtype=np.int64))
+
+    def build(self, unit: np.ndarray) -> None:
+        rng = np.random.default_rng(self.seed)
+        self.planes = rng.standard_normal((self.n_tables, self.n_bits, unit.shape[1]))
+        self.center = unit.mean(axis=0) if len(unit) else np.zeros(unit.shape[1])
+        self.signatures = self._signatures(unit) if len(unit) else np.zeros((0, self.n_tables), dtype=np.int64)
+        self.buckets = [{} for _ in range(self.n_tables)]
+        for row, signature in enumerate(self.signatures.tolist()):
+            for table, code in enumerate(signature):
+                self.buckets[table].setdefault(code, set()).add(row)
+
+    def update(self, unit: np.ndarray, idx: int) -> None:
+        new_signature = self._signatures(unit[idx:idx + 1])[0]
+        if idx < len(self.signatures):
+            for table, code in enumerate(self.signatures[idx].tolist()):
+                self.buckets[table].get(code, set()).discard(idx)
+        else:
+            grown = np.zeros((idx + 1, self.n_tables), dtype=np.int64)
+            grown[:len(self.signatures)] = self.signatures
+            self.signatures = grown
+        self.signatures[idx] = new_signature
+        for table, code in enumerate(new_signature.tolist()):
+            self.buckets[table].setdefault(code, set()).add(idx)
+
+    def query(self, unit: np.ndarray, idx: int, k: int) -> List[int]:
+        signature = self.signatures[idx].tolist()
+        candidates = set()
+        for table, code in enumerate(signature):
+            candidates |= self.buckets[table].get(code, set())
+        if len(candidates) < k:
+            for table, code in enumerate(signature):
+                for bit in range(self.n_bits):
+                    candidates |= self.buckets[table].get(code ^ (1 << bit), set())
+        if len(candidates) < k:
+            return _rank_by_cosine(unit, idx, np.arange(len(unit)), k)
+        return _rank_by_cosine(unit, idx, np.fromiter(candidates, dtype=np.int64), k)
+
+
+NEIGHBOR_BACKENDS = ['brute', 'ball_tree', 'kd_tree', 'lsh']
+
+
+def create_neighbor_index(backend: str = 'brute', **options):
+    """Buat backend pencarian tetangga berdasarkan nama (lihat NEIGHBOR_BACKENDS)."""
+    if backend == 'brute':
+        return BruteForceIndex()
+    if backend in ('ball_tree', 'kd_tree'):
+        return TreeIndex(algorithm=backend, **options)
+    if backend == 'lsh':
+        return RandomProjectionLSHIndex(**options)
+    raise ValueError(f"Backend tetangga tidak dikenal: {backend}. Pilihan: {', '.join(NEIGHBOR_BACKENDS)}")
@@ -0,0 +1,122 @@
+from datetime import date
+from typing import Dict, List, Optional
+from sqlalchemy import delete, func, insert, select, update
+from app import db
+from app.models.food import Food
+from app.models.progress import DailyNutritionRollup
+from app.models.recommendation import Recommendation
+
+# Kolom rollup -> kolom nutrisi di tabel foods
+ROLLUP_NUTRIENTS = {
+    'kcal': 'caloric_value',
+    'protein': 'protein',
+    'carbs': 'carbohydrates',
+    'fat': 'fat',
+    'fiber': 'dietary_fiber',
+    'sodium': 'sodium',
+}
+
+
+def food_nutrients(food: Food) -> Dict[str, float]:
+    """Nilai nutrisi satu makanan dalam kolom rollup (NULL dihitung 0, sama seperti SUM)."""
+    return {name: getattr(food, column) or 0.0 for name, column in ROLLUP_NUTRIENTS.items()}
+
+
+def _nutrient_sums():
+    """SUM nutrisi per kolom rollup (NULL dihitung 0) untuk query Recommendation x Food."""
+    return [
+        func.coalesce(func.sum(getattr(Food, column)), 0.0).label(name)
+        for name, column in ROLLUP_NUTRIENTS.items()
+    ]
+
+
+def _add_to_day(user_id: int, day: date, nutrients: Dict[str, float], items: int, prune: bool = True) -> None:
+    """
+    Tambahkan nutrisi dan jumlah makanan (negatif untuk mengurangi) pada rollup harian dengan
+    UPDATE atomik, sehingga feedback bersamaan untuk hari yang sama tidak saling menimpa.
+    prune=False melewati penghapusan hari kosong (pemanggil menghapusnya sekaligus dengan _prune_days).
+    """
+    values = {name: getattr(DailyNutritionRollup, name) + amount for name, amount in nutrients.items()}
+    key = (DailyNutritionRollup.user_id == user_id, DailyNutritionRollup.date == day)
+    updated = db.session.execute(
+        update(DailyNutritionRollup).where(*key).values(items=DailyNutritionRollup.items + items, **values)
+    ).rowcount
+    if items > 0 and not updated:
+        db.session.add(DailyNutritionRollup(user_id=user_id, date=day, items=items, **nutrients))
+    elif items < 0 and updated and prune:
+        _prune_days(user_id, [day])
+
+
+def _prune_days(user_id: int, days: List[date]) -> None:
+    # Hari tanpa makanan dihapus agar sisa pembulatan float tidak tertinggal dan streak tetap benar
+    db.session.execute(delete(DailyNutritionRollup).where(
+        DailyNutritionRollup.user_id == user_id,
+        DailyNutritionRollup.date.in_(days),
+        DailyNutritionRollup.items <= 0
+    ))
+
+
+def apply_consumption_change(recommendation: Recommendation, previous_consumed_date: Optional[date]) -> None:
+    """
+    Pindahkan nutrisi makanan dari rollup previous_consumed_date ke recommendation.consumed_date.
+    Dipanggil setelah sync_consumed_date(); tidak melakukan apa-apa jika tanggalnya tidak berubah.
+    """
+    if recommendation.consumed_date == previous_consumed_date:
+        return
+    nutrients = food_nutrients(recommendation.food)
+    if previous_consumed_date is not None:
+        _add_to_day(recommendation.user_id, previous_consumed_date, {name: -value for name, value in nutrients.items()}, -1)
+    if recommendation.consumed_date is not None:
+        _add_to_day(recommendation.user_id, recommendation.consumed_date, nutrients, 1)
+
+
+def remove_consumed_recommendations(user_id: int, recommendation_date: date) -> None:
+    """
+    Kurangi rollup untuk rekomendasi yang sudah dikonsumsi pada recommendation_date, sebelum
+    rekomendasi tersebut dihapus (menu harian dibuat ulang): satu query agregat, satu UPDATE
+    per consumed_date dan satu DELETE untuk hari yang menjadi kosong.
+    """
+    rows = db.session.query(
+        Recommendation.consumed_date, *_nutrient_sums(), func.count().label('items')
+    ).join(
+        Food, Recommendation.food_id == Food.id
+    ).filter(
+        Recommendation.user_id == user_id,
+        Recommendation.recommendation_date == recommendation_date,
+        Recommendation.consumed_date.isnot(None)
+    ).group_by(Recommendation.consumed_date).all()
+    for row in rows:
+        nutrients = {name: -getattr(row, name) for name in ROLLUP_NUTRIENTS}
+        _add_to_day(user_id, row.consumed_date, nutrients, -row.items, prune=False)
+    if rows:
+        _prune_days(user_id, [row.consumed_date for row in rows])
+
+
+def rebuild_nutrition_rollup(user_id: Optional[int] = None) -> int:
+    """
+    Bangun ulang rollup dari Recommendation x Food dengan satu DELETE dan satu INSERT ... SELECT
+    (semua user, atau satu user). Tidak melakukan commit. Mengembalikan jumlah baris rollup.
+    """
+    source = select(
+        Recommendation.user_id, Recommendation.consumed_date, *_nutrient_sums(), func.count().label('items')
+    ).join(
+        Food, Recommendation.food_id == Food.id
+    ).where(
+        Recommendation.consumed_date.isnot(None)
+    ).group_by(
+        Recommendation.user_id, Recommendation.consumed_date
+    )
+
+    clear = delete(DailyNutritionRollup)
+    if user_id is not None:
+        source = source.where(Recommendation.user_id == user_id)
+        clear = clear.where(DailyNutritionRollup.user_id == user_id)
+    db.session.execute(clear)
+    db.session.execute(insert(DailyNutritionRollup).from_select(
+        ['user_id', 'date'] + list(ROLLUP_NUTRIENTS) + ['items'], source
+    ))
+
+    count = select(func.count()).select_from(DailyNutritionRollup)
+    if user_id is not None:
+        count = count.where(DailyNutritionRollup.user_id == user_id)
+    return db.session.execute(count).scalar()
@@ -0,0 +1,94 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.utils.decision_tree import NutritionDecisionTree
+from app.utils.food_catalog import PREFERENCE_FLAGS, preference_bits
+
+# Nama khusus indeks: berbeda isi dan urutan dengan MEAL_TYPES/MEDICAL_CONDITIONS di ml_features (one-hot)
+INDEX_MEAL_TYPES = ['Sarapan', 'Makan Siang', 'Makan Malam', 'Cemilan']
+INDEX_MEDICAL_CONDITIONS = ['none', 'diabetes', 'hypertension', 'obesity']
+PREFERENCE_COMBINATIONS = 1 << len(PREFERENCE_FLAGS)
+
+
+class PreferenceIndex:
+    """
+    Indeks kandidat per (meal_type, medical_condition) untuk satu versi katalog.
+    Kandidat = makanan yang punya kalori dan cocok secara medis (NutritionDecisionTree);
+    meal_type None (atau di luar INDEX_MEAL_TYPES) berarti semua meal type. Jumlah makanan untuk
+    setiap bitmask preferensi (2^7 kombinasi) dihitung sekali dari histogram bitmask pelanggaran,
+    sehingga count() hanya lookup array; daftar posisi per bitmask dibuat saat pertama diminta lalu di-cache.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._groups: Dict[Tuple[Optional[str], str], np.ndarray] = {}
+        self._counts: Dict[Tuple[Optional[str], str], np.ndarray] = {}
+        self._candidates: Dict[Tuple[Optional[str], str, int], np.ndarray] = {}
+
+        # compatible[v, m]: makanan dengan pelanggaran v boleh dimakan user dengan preferensi m
+        combinations = np.arange(PREFERENCE_COMBINATIONS)
+        compatible = (combinations[:, None] & combinations[None, :]) == 0
+
+        positions = catalog.select(['caloric_value'])
+        meal_codes = catalog.codes['meal_type'][positions]
+        recommender = NutritionDecisionTree()
+        for medical_condition in INDEX_MEDICAL_CONDITIONS:
+            keep = recommender._suitable_mask(catalog, positions, medical_condition)
+            suitable, suitable_codes = positions[keep], meal_codes[keep]
+            groups = {None: suitable}
+            for meal_type in INDEX_MEAL_TYPES:
+                groups[meal_type] = suitable[suitable_codes == catalog.code_of('meal_type', meal_type)]
+            for meal_type, group in groups.items():
+                histogram = np.bincount(catalog.preference_violations[group], minlength=PREFERENCE_COMBINATIONS)
+                self._groups[(meal_type, medical_condition)] = group
+                self._counts[(meal_type, medical_condition)] = histogram @ compatible
+
+    def _key(self, meal_type: Optional[str], medical_condition: Optional[str]) -> Tuple[Optional[str], str]:
+        # Kondisi di luar INDEX_MEDICAL_CONDITIONS tidak punya aturan medis, sama seperti 'none'
+        condition = medical_condition if medical_condition in INDEX_MEDICAL_CONDITIONS else 'none'
+        return (meal_type if meal_type in INDEX_MEAL_TYPES else None), condition
+
+    def candidates(self, preferences: List[str], meal_type: Optional[str] = None, medical_condition: str = 'none') -> np.ndarray:
+        """Posisi katalog (urut id) kandidat yang cocok dengan preferensi."""
+        group_key = self._key(meal_type, medical_condition)
+        bits = preference_bits(preferences)
+        key = group_key + (bits,)
+        positions = self._candidates.get(key)
+        if positions is None:
+            group = self._groups[group_key]
+            positions = group[(self.catalog.preference_violations[group] & bits) == 0]
+            with self._lock:
+                positions = self._candidates.setdefault(key, positions)
+        return positions
+
+    def count(self, preferences: List[str], meal_type: Optional[str] = None, medical_condition: str = 'none') -> int:
+        """Jumlah kandidat yang cocok dengan preferensi (tanpa membuat daftar posisi)."""
+        return int(self._counts[self._key(meal_type, medical_condition)][preference_bits(preferences)])
+
+    def eligible_counts(self, preferences: List[str], medical_condition: str = 'none') -> Dict:
+        """Ringkasan "berapa makanan yang bisa saya makan" untuk halaman preferensi."""
+        return {
+            'total': self.count(preferences, None, medical_condition),
+            'by_meal_type': {
+                meal_type: self.count(preferences, meal_type, medical_condition) for meal_type in INDEX_MEAL_TYPES
+            },
+            'medical_condition': self._key(None, medical_condition)[1],
+        }
+
+
+_preference_index = None
+_preference_index_lock = threading.Lock()
+
+
+def get_preference_index(catalog) -> PreferenceIndex:
+    """Indeks preferensi untuk versi katalog ini, dibangun sekali lalu dipakai bersama."""
+    global _preference_index
+    index = _preference_index
+    if index is None or index.catalog is not catalog:
+        with _preference_index_lock:
+            index = _preference_index
+            if index is None or index.catalog is not catalog:
+                index = PreferenceIndex(catalog)
+                _preference_index = index  # Hanya versi katalog terbaru yang disimpan
+    return index
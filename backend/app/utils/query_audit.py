@@ -0,0 +1,123 @@
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app import db
+from app.models.progress import DailyNutritionRollup, WeightProgress
+from app.models.recommendation import DietGoal, FoodPreference, Recommendation
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN untuk statement SELECT; parameter bind diproses oleh dialek seperti query biasa."""
+    inherit_cache = False
+
+    def __init__(self, stmt):
+        self.stmt = stmt
+
+
+@compiles(Explain)
+def _explain_default(element, compiler, **kw):
+    return 'EXPLAIN ' + compiler.process(element.stmt, **kw)
+
+
+@compiles(Explain, 'sqlite')
+def _explain_sqlite(element, compiler, **kw):
+    return 'EXPLAIN QUERY PLAN ' + compiler.process(element.stmt, **kw)
+
+
+def hot_queries(user_id: int) -> List[Tuple[str, object]]:
+    """
+    Query per user yang dijalankan di setiap request (menu harian, progress, CF, preferensi),
+    disusun sama seperti di routes/utils. Query yang memang membaca seluruh tabel
+    (katalog foods, profil CF semua user) tidak dimasukkan.
+    """
+    today = datetime.now().date()
+    week_ago = today - timedelta(days=6)
+    return [
+        ('menu harian (rekomendasi hari ini)', select(Recommendation.id, Recommendation.food_id).where(
+            Recommendation.user_id == user_id,
+            Recommendation.recommendation_date == today
+        ).order_by(Recommendation.id)),
+        ('makanan terbaru user (7 hari)', select(Recommendation.food_id).where(
+            Recommendation.user_id == user_id,
+            Recommendation.recommendation_date >= today - timedelta(days=7),
+            (Recommendation.is_consumed == True) | (Recommendation.rating >= 4)
+        )),
+        ('jumlah rating user (bobot hybrid)', select(func.count()).select_from(Recommendation).where(
+            Recommendation.user_id == user_id,
+            Recommendation.rating.isnot(None)
+        )),
+        ('progress kalori harian (rollup)', select(DailyNutritionRollup.date, DailyNutritionRollup.kcal).where(
+            DailyNutritionRollup.user_id == user_id,
+            DailyNutritionRollup.date >= week_ago,
+            DailyNutritionRollup.date < today + timedelta(days=1)
+        )),
+        ('streak konsumsi (rollup)', select(DailyNutritionRollup.date).where(
+            DailyNutritionRollup.user_id == user_id
+        ).order_by(DailyNutritionRollup.date.desc())),
+        ('CF: makanan disukai user serupa', select(
+            Recommendation.user_id, Recommendation.food_id, Recommendation.rating
+        ).where(
+            Recommendation.user_id.in_([user_id, user_id + 1]),
+            Recommendation.rating >= 4
+        )),
+        ('CF: rata-rata rating user', select(func.avg(Recommendation.rating)).where(
+            Recommendation.user_id == user_id
+        )),
+        ('goal aktif terbaru', select(DietGoal.id).where(
+            DietGoal.user_id == user_id,
+            DietGoal.status == 'active'
+        ).order_by(DietGoal.created_at.desc()).limit(1)),
+        ('preferensi aktif', select(FoodPreference.preference_type).where(
+            FoodPreference.user_id == user_id,
+            FoodPreference.is_active == True
+        )),
+        ('progress berat 30 hari', select(WeightProgress.date, WeightProgress.weight).where(
+            WeightProgress.user_id == user_id,
+            WeightProgress.date >= datetime.utcnow() - timedelta(days=30)
+        ).order_by(WeightProgress.date.asc())),
+    ]
+
+
+def _sqlite_full_scans(rows, tables) -> List[str]:
+    # detail "SCAN <tabel>" tanpa "USING ... INDEX" = full table scan; "SEARCH" selalu lewat index
+    scans = []
+    for row in rows:
+        match = re.match(r'SCAN (\w+)', row[-1])
+        if match and match.group(1) in tables and 'INDEX' not in row[-1]:
+            scans.append(match.group(1))
+    return scans
+
+
+def _mysql_full_scans(rows, tables) -> List[str]:
+    return [row._mapping['table'] for row in rows if row._mapping.get('type') == 'ALL']
+
+
+def _postgresql_full_scans(rows, tables) -> List[str]:
+    return [match.group(1) for row in rows for match in [re.search(r'Seq Scan on (\w+)', row[0])] if match]
+
+
+FULL_SCAN_DETECTORS = {
+    'sqlite': _sqlite_full_scans,
+    'mysql': _mysql_full_scans,
+    'postgresql': _postgresql_full_scans,
+}
+
+
+def explain(stmt) -> Dict:
+    """Jalankan EXPLAIN untuk satu statement; hasil berisi baris plan dan tabel yang di-full scan."""
+    dialect = db.engine.dialect.name
+    rows = db.session.execute(Explain(stmt)).all()
+    detector = FULL_SCAN_DETECTORS.get(dialect)
+    return {
+        'plan': [' | '.join('' if value is None else str(value) for value in row) for row in rows],
+        'full_scans': detector(rows, set(db.metadata.tables)) if detector else [],
+        'supported': detector is not None,
+    }
+
+
+def audit_hot_queries(user_id: int) -> List[Dict]:
+    """EXPLAIN untuk setiap query di hot_queries()."""
+    return [dict(explain(stmt), name=name, sql=str(stmt.compile(db.engine))) for name, stmt in hot_queries(user_id)]
@@ -0,0 +1,139 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Dict, List
+import numpy as np
+
+
+class _ScoringRequest:
+    __slots__ = ['key', 'user_vector', 'catalog', 'future']
+
+    def __init__(self, key: bytes, user_vector: np.ndarray, catalog):
+        self.key = key
+        self.user_vector = user_vector
+        self.catalog = catalog
+        self.future = Future()
+
+
+class ScoringBatcher:
+    """
+    Micro-batching skor decision tree antar request.
+    Request yang datang bersamaan dikumpulkan paling lama max_wait_ms (atau sampai max_size)
+    lalu dievaluasi sebagai satu batch users x foods dengan satu kali jalan tree; setiap
+    pemanggil menerima baris probabilitasnya sendiri. Request dengan key (path signature)
+    yang sama dalam satu batch hanya dihitung sekali. Worker hanya menunggu selama masih ada
+    request aktif (lihat active()) yang belum masuk antrian, sehingga request tunggal tidak
+    tertahan. Worker thread dibuat saat dibutuhkan dan berhenti sendiri jika tidak ada
+    request selama idle_seconds. Pemanggil menunggu hasil paling lama timeout_ms, lalu
+    menghitung skornya sendiri (lihat fallbacks).
+    """
+
+    def __init__(self, tree, builder, max_size: int = 32, max_wait_ms: float = 2.0, idle_seconds: float = 30.0,
+                 timeout_ms: float = 1000.0):
+        self.tree = tree
+        self.builder = builder
+        self.max_size = max(1, int(max_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.idle_seconds = idle_seconds
+        self.timeout = max(0.0, timeout_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._active = 0
+        self._food_rows = {}  # Per versi katalog (worker, dan pemanggil saat fallback)
+        self.batches = 0
+        self.requests = 0
+        self.fallbacks = 0
+
+    @contextmanager
+    def active(self):
+        """Tandai request yang sedang menuju scoring (mungkin memanggil score())."""
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def score(self, key: bytes, user_vector: np.ndarray, catalog) -> np.ndarray:
+        """Probabilitas kelas 'direkomendasikan' untuk seluruh katalog (blocking)."""
+        request = _ScoringRequest(key, user_vector, catalog)
+        # put dan cek worker di bawah lock yang sama dengan keputusan berhenti di _run():
+        # worker melihat request ini di antrian, atau sudah berhenti dan diganti worker baru
+        with self._lock:
+            self._queue.put(request)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='ml-scoring-batcher', daemon=True)
+                self._worker.start()
+        try:
+            return request.future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Worker terlambat/macet: hitung langsung agar request tidak tertahan
+            self.fallbacks += 1
+            return self.score_many(user_vector[np.newaxis], catalog)[0]
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._worker = None
+                        return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or len(batch) >= self._active:
+                    break
+                try:
+                    # Cek ulang jumlah request aktif secara berkala (request bisa selesai dari cache)
+                    batch.append(self._queue.get(timeout=min(remaining, 0.0005)))
+                except queue.Empty:
+                    pass
+            self._evaluate(batch)
+
+    def _evaluate(self, batch: List[_ScoringRequest]) -> None:
+        self.batches += 1
+        self.requests += len(batch)
+        # Katalog bisa berganti versi di tengah batch; setiap versi dievaluasi terpisah
+        by_catalog: Dict[int, List[_ScoringRequest]] = {}
+        for request in batch:
+            by_catalog.setdefault(id(request.catalog), []).append(request)
+
+        for requests in by_catalog.values():
+            try:
+                catalog = requests[0].catalog
+                unique: Dict[bytes, int] = {}
+                for request in requests:
+                    unique.setdefault(request.key, len(unique))
+                user_vectors = [None] * len(unique)
+                for request in requests:
+                    user_vectors[unique[request.key]] = request.user_vector
+                scores = self.score_many(np.stack(user_vectors), catalog)
+                for request in requests:
+                    request.future.set_result(scores[unique[request.key]])
+            except Exception as e:
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def score_many(self, user_vectors: np.ndarray, catalog) -> np.ndarray:
+        """Skor seluruh katalog untuk beberapa user sekaligus (n_users x n_foods)."""
+        food_rows = self._food_rows.get(catalog.version)
+        if food_rows is None:
+            food_rows = self.builder.food_rows(catalog)
+            self._food_rows = {catalog.version: food_rows}
+        leaves = self.tree.apply_cross(self.builder.user_rows(user_vectors), food_rows, self.builder.user_targets)
+        return self.tree.proba[leaves, self.tree.positive_class_index].reshape(len(user_vectors), catalog.size)
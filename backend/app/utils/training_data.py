@@ -0,0 +1,317 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from app.utils.decision_tree import NutritionDecisionTree
+from app.utils.ml_features import FEATURE_COLUMNS, FeatureMatrixBuilder
+
+SCORE_COLUMN = 'raw_nutrition_score'
+LABEL_COLUMN = 'label_recommended'
+
+# Kolom katalog dan set kata kunci yang dibutuhkan skor dataset training
+SCORE_NUTRIENTS = [
+    'caloric_value', 'protein', 'carbohydrates', 'fat', 'dietary_fiber', 'sodium',
+    'potassium', 'iron', 'calcium', 'zinc', 'vitamin_c'
+]
+SCORE_KEYWORD_SETS = ['high_carb', 'high_sodium', 'high_cal_fried', 'added_sugar']
+
+
+class FoodArrays:
+    """
+    Snapshot array katalog yang bisa di-pickle untuk worker process pool.
+    Menyediakan column()/keyword_mask() seperti FoodCatalog sehingga scorer vektor
+    NutritionDecisionTree bisa dipakai langsung, plus baris fitur makanan model.
+    """
+
+    def __init__(self, catalog, feature_columns: Sequence[str] = FEATURE_COLUMNS):
+        self.size = catalog.size
+        self.ids = catalog.ids.copy()
+        self.columns = {name: catalog.column(name).copy() for name in SCORE_NUTRIENTS}
+        self.masks = {name: catalog.keyword_mask(name).copy() for name in SCORE_KEYWORD_SETS}
+        self.food_rows = FeatureMatrixBuilder(feature_columns).food_rows(catalog)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def keyword_mask(self, name: str) -> np.ndarray:
+        return self.masks[name]
+
+
+def score_weights(recommender: NutritionDecisionTree) -> Dict[str, float]:
+    """Bobot komponen skor yang dinormalisasi (urutan penjumlahan sama dengan versi skalar)."""
+    weights = {
+        'calorie': getattr(recommender, 'calorie_match_weight', 0.3),
+        'protein': getattr(recommender, 'protein_match_weight', 0.25),
+        'carb': getattr(recommender, 'carb_match_weight', 0.2),
+        'fat': getattr(recommender, 'fat_match_weight', 0.15),
+        'micro': getattr(recommender, 'micronutrient_adjustment_weight', 0.1)
+    }
+    total_weight = sum(weights.values())
+    if total_weight > 0:
+        for key in weights:
+            weights[key] /= total_weight
+    else:
+        weights['calorie'] = 1.0
+    return weights
+
+
+def _closeness(values: np.ndarray, target: float) -> np.ndarray:
+    """max(0, 1 - ((value - target) / target)^2), 0 untuk NULL."""
+    with np.errstate(invalid='ignore'):
+        score = np.maximum(0, 1 - (np.abs(values - target) / target) ** 2)
+    return np.where(np.isnan(values), 0.0, score)
+
+
+def training_scores(
+    recommender: NutritionDecisionTree, foods, positions: np.ndarray, nutritional_needs: Dict
+) -> np.ndarray:
+    """
+    Versi vektor get_nutrition_score_for_single_food (commands.py) untuk satu user
+    dan banyak makanan; hasilnya sama dengan versi skalar (selisih paling banyak 1 ULP
+    karena kuadrat dihitung dengan x*x, bukan pow() libm).
+    """
+    medical_condition = nutritional_needs['medical_condition']
+    num_main_meals = nutritional_needs.get('num_main_meals', 4 if medical_condition == 'obesity' else 3)
+    if num_main_meals == 0:
+        num_main_meals = 3
+
+    calories_per_meal = nutritional_needs['daily_calories'] / num_main_meals
+    protein_per_meal = nutritional_needs['protein_g_per_day'] / num_main_meals
+    carbs_per_meal = nutritional_needs['carbs_g_per_day'] / num_main_meals
+    fat_per_meal = nutritional_needs['fat_g_per_day'] / num_main_meals
+
+    max_calories_per_meal = nutritional_needs.get('max_calories_per_meal', calories_per_meal * 1.5)
+    base_carbs_target_diabetes = carbs_per_meal * 0.5
+    max_carbs_per_meal_strict = (
+        nutritional_needs.get('max_carbs_per_meal_diabetes', base_carbs_target_diabetes)
+        if medical_condition == 'diabetes' else carbs_per_meal * 1.5
+    )
+    max_sodium_per_meal = nutritional_needs.get('target_sodium_mg_per_meal', 700)
+
+    column = lambda name: foods.column(name)[positions]
+    calories, protein, carbs, fat, sodium = (
+        column('caloric_value'), column('protein'), column('carbohydrates'), column('fat'), column('sodium')
+    )
+
+    # Penalti jika melebihi batas (NaN tidak pernah melebihi, sama seperti cek None)
+    penalty_score = np.ones(len(positions))
+    penalty_score = np.where(calories > max_calories_per_meal * 1.1, penalty_score * 0.7, penalty_score)
+    if medical_condition == 'diabetes':
+        penalty_score = np.where(carbs > max_carbs_per_meal_strict * 1.1, penalty_score * 0.6, penalty_score)
+    if medical_condition == 'hypertension':
+        penalty_score = np.where(sodium > max_sodium_per_meal * 1.1, penalty_score * 0.7, penalty_score)
+
+    calorie_score = np.zeros(len(positions))
+    if calories_per_meal > 0:
+        calorie_score = _closeness(calories, calories_per_meal)
+        if medical_condition == 'obesity':
+            calorie_score = np.where(
+                calories < calories_per_meal * 0.8, np.minimum(1, calorie_score * 1.15),
+                np.where(calories > calories_per_meal * 1.05, calorie_score * 0.8, calorie_score)
+            )
+
+    protein_score = np.zeros(len(positions))
+    if protein_per_meal > 0:
+        protein_score = _closeness(protein, protein_per_meal)
+        if medical_condition == 'obesity':
+            protein_score = np.where(protein > protein_per_meal * 0.9, np.minimum(1, protein_score * 1.1), protein_score)
+
+    carb_score = np.zeros(len(positions))
+    if carbs_per_meal > 0:
+        carb_target_for_scoring = max_carbs_per_meal_strict if medical_condition == 'diabetes' else carbs_per_meal
+        if carb_target_for_scoring > 0:
+            carb_score = _closeness(carbs, carb_target_for_scoring)
+            if medical_condition == 'diabetes':
+                carb_score = np.where(carbs > carb_target_for_scoring, carb_score * 0.7, carb_score)
+        else:
+            carb_score = np.where(np.isnan(carbs), 0.0, np.where(carbs <= 1, 1.0, 0.0))
+
+    fat_score = np.zeros(len(positions))
+    if fat_per_meal > 0:
+        fat_score = _closeness(fat, fat_per_meal)
+        if medical_condition in ['hypertension', 'obesity']:
+            fat_score = np.where(fat > fat_per_meal * 1.05, fat_score * 0.8, fat_score)
+
+    micronutrient_score_adj = recommender._micronutrient_scores(foods, positions, nutritional_needs)
+
+    weights = score_weights(recommender)
+    weighted_score = (
+        calorie_score * weights['calorie'] +
+        protein_score * weights['protein'] +
+        carb_score * weights['carb'] +
+        fat_score * weights['fat'] +
+        micronutrient_score_adj * weights['micro']
+    )
+    final_score = np.clip(weighted_score * penalty_score, 0, 1)
+
+    # Makanan yang tidak cocok secara medis mendapat skor sangat rendah (bukan nol)
+    suitable = recommender._suitable_mask(foods, positions, medical_condition)
+    return np.where(suitable, final_score, 0.01)
+
+
+# State worker process pool (diisi sekali oleh _init_worker)
+_worker_state = {}
+
+
+def _init_worker(foods: FoodArrays) -> None:
+    _worker_state['foods'] = foods
+    _worker_state['recommender'] = NutritionDecisionTree()
+
+
+def build_shard(shard: List[Tuple[np.ndarray, Dict, Optional[np.ndarray]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Blok fitur (float32) dan skor mentah untuk satu shard user.
+    Setiap elemen shard: (baris fitur user lebar penuh, kebutuhan nutrisi, posisi makanan atau None).
+    """
+    foods = _worker_state['foods']
+    recommender = _worker_state['recommender']
+    feature_blocks, score_blocks = [], []
+    for user_row, nutritional_needs, positions in shard:
+        if positions is None:
+            positions = np.arange(foods.size)
+        block = foods.food_rows[positions]  # Salinan; kolom user masih 0
+        user_columns = np.flatnonzero(user_row)
+        block[:, user_columns] = user_row[user_columns]
+        feature_blocks.append(block)
+        score_blocks.append(training_scores(recommender, foods, positions, nutritional_needs))
+    if not feature_blocks:
+        return np.zeros((0, foods.food_rows.shape[1]), dtype=np.float32), np.zeros(0)
+    return np.concatenate(feature_blocks), np.concatenate(score_blocks)
+
+
+class TrainingDataWriter:
+    """Tulis dataset training per chunk ke CSV atau Parquet (butuh pyarrow) sesuai ekstensi file."""
+
+    def __init__(self, path: str, feature_columns: Sequence[str]):
+        self.path = path
+        self.columns = list(feature_columns) + [SCORE_COLUMN, LABEL_COLUMN]
+        self.rows = 0
+        self._parquet = path.endswith('.parquet')
+        self._writer = None
+        if self._parquet:
+            try:
+                import pyarrow  # noqa: F401
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Output .parquet membutuhkan pyarrow (pip install pyarrow)")
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def write(self, features: np.ndarray, scores: np.ndarray, labels: np.ndarray) -> None:
+        frame = pd.DataFrame(features, columns=self.columns[:-2])
+        frame[SCORE_COLUMN] = scores
+        frame[LABEL_COLUMN] = labels.astype(np.int8)
+        self.write_frame(frame)
+
+    def write_frame(self, frame: pd.DataFrame) -> None:
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a', header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def generate_training_data(
+    tasks: List[Tuple[np.ndarray, Dict, Optional[np.ndarray]]],
+    foods: FoodArrays,
+    writer: TrainingDataWriter,
+    threshold: float,
+    shard_size: int = 64,
+    workers: int = 1
+) -> np.ndarray:
+    """
+    Hitung dan tulis dataset untuk semua user, satu shard user per chunk output.
+    Shard dikerjakan paralel di process pool jika workers > 1; urutan output tetap urutan user.
+    Mengembalikan semua skor mentah untuk statistik.
+    """
+    shards = [tasks[i:i + shard_size] for i in range(0, len(tasks), shard_size)]
+    all_scores = []
+
+    def consume(results: Iterator[Tuple[np.ndarray, np.ndarray]]) -> None:
+        for features, scores in results:
+            writer.write(features, scores, scores >= threshold)
+            all_scores.append(scores)
+
+    try:
+        if workers > 1 and len(shards) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(foods,)) as pool:
+                consume(pool.map(build_shard, shards))
+        else:
+            _init_worker(foods)
+            consume(build_shard(shard) for shard in shards)
+    finally:
+        writer.close()
+    return np.concatenate(all_scores) if all_scores else np.zeros(0)
+
+
+def read_training_chunks(path: str, chunk_size: int = 200000, dtype: Optional[Dict] = None) -> Iterator[pd.DataFrame]:
+    """Baca dataset training (CSV/Parquet) per chunk, opsional dengan dtype per kolom."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            frame = batch.to_pandas()
+            yield frame.astype(dtype) if dtype else frame
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=dtype)
+
+
+def training_columns(path: str) -> List[str]:
+    """Nama kolom dataset training tanpa membaca isinya."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def load_training_matrix(path: str, chunk_size: int = 200000) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Muat dataset training sebagai (X float32, y int8, kolom fitur).
+    Dibaca per chunk dengan dtype yang sudah ditentukan sehingga pandas tidak pernah
+    membuat salinan float64 dari seluruh dataset. raw_nutrition_score tidak ikut menjadi
+    fitur (kebocoran target); NULL diisi 0 seperti saat serving (ml_features).
+    """
+    feature_columns = [col for col in training_columns(path) if col not in (SCORE_COLUMN, LABEL_COLUMN)]
+    dtype = {col: np.float32 for col in feature_columns}
+    dtype[LABEL_COLUMN] = np.int8
+    X_blocks, y_blocks = [], []
+    for frame in read_training_chunks(path, chunk_size, dtype):
+        X_blocks.append(np.nan_to_num(frame[feature_columns].to_numpy(dtype=np.float32), nan=0.0))
+        y_blocks.append(frame[LABEL_COLUMN].to_numpy(dtype=np.int8))
+    if not X_blocks:
+        return np.zeros((0, len(feature_columns)), dtype=np.float32), np.zeros(0, dtype=np.int8), feature_columns
+    return np.concatenate(X_blocks), np.concatenate(y_blocks), feature_columns
+
+
+def relabel_training_data(input_path: str, output_path: str, threshold: float, chunk_size: int = 200000) -> Tuple[int, int]:
+    """
+    Hitung ulang label dari raw_nutrition_score dengan threshold baru tanpa menghitung skor lagi.
+    Mengembalikan (jumlah baris, jumlah label positif).
+    """
+    writer = None
+    positives = 0
+    temp_path = output_path + '.tmp' + os.path.splitext(output_path)[1]
+    try:
+        for frame in read_training_chunks(input_path, chunk_size):
+            if writer is None:
+                writer = TrainingDataWriter(temp_path, [col for col in frame.columns if col not in (SCORE_COLUMN, LABEL_COLUMN)])
+            frame[LABEL_COLUMN] = (frame[SCORE_COLUMN] >= threshold).astype(np.int8)
+            positives += int(frame[LABEL_COLUMN].sum())
+            writer.write_frame(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        return 0, 0
+    os.replace(temp_path, output_path)
+    return writer.rows, positives
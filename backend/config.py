@@ -10,3 +10,20 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = 'sadjfdsahfjkashjfshdkjfhsakjdhfkjsadhfkjsadhfjkhsadkjfhkjsadhfkj'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    # Interval muat ulang penuh matriks profil collaborative filtering (detik)
+    CF_PROFILE_MAX_AGE_SECONDS = int(os.getenv('CF_PROFILE_MAX_AGE_SECONDS', 300))
+    # Backend pencarian tetangga CF: brute, ball_tree, kd_tree, atau lsh
+    CF_NEIGHBOR_BACKEND = os.getenv('CF_NEIGHBOR_BACKEND', 'brute')
+    CF_LSH_TABLES = int(os.getenv('CF_LSH_TABLES', 8))
+    CF_LSH_BITS = int(os.getenv('CF_LSH_BITS', 12))
+    # Interval pengecekan artefak model baru di dataset-diet/ (detik) dan preload saat start
+    ML_MODEL_RECHECK_SECONDS = int(os.getenv('ML_MODEL_RECHECK_SECONDS', 30))
+    ML_MODEL_PRELOAD = os.getenv('ML_MODEL_PRELOAD', 'false').lower() == 'true'
+    # Jumlah maksimum vektor probabilitas ML (per path signature user) yang di-cache
+    ML_SIGNATURE_CACHE_SIZE = int(os.getenv('ML_SIGNATURE_CACHE_SIZE', 256))
+    # Micro-batching skor ML antar request yang bersamaan (ukuran batch dan waktu tunggu maksimum)
+    ML_BATCH_ENABLED = os.getenv('ML_BATCH_ENABLED', 'true').lower() == 'true'
+    ML_BATCH_MAX_SIZE = int(os.getenv('ML_BATCH_MAX_SIZE', 32))
+    ML_BATCH_MAX_WAIT_MS = float(os.getenv('ML_BATCH_MAX_WAIT_MS', 2))
+    # Batas tunggu hasil batch sebelum request menghitung skornya sendiri
+    ML_BATCH_TIMEOUT_MS = float(os.getenv('ML_BATCH_TIMEOUT_MS', 1000))
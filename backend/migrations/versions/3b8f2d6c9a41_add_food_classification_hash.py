@@ -0,0 +1,26 @@
+"""Add classification hash to foods for incremental classification
+
+Revision ID: 3b8f2d6c9a41
+Revises: ae2015de7610
+Create Date: 2026-10-17 09:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8f2d6c9a41'
+down_revision = 'ae2015de7610'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('foods', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('classification_hash', sa.String(length=40), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('foods', schema=None) as batch_op:
+        batch_op.drop_column('classification_hash')
@@ -0,0 +1,48 @@
+"""Add composite indexes for hot query paths
+
+Revision ID: 5d0c7e91a2f3
+Revises: 3b8f2d6c9a41
+Create Date: 2026-10-17 14:03:27.281946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0c7e91a2f3'
+down_revision = '3b8f2d6c9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.create_index('ix_recommendations_user_date', ['user_id', 'recommendation_date'], unique=False)
+        batch_op.create_index('ix_recommendations_user_consumed_feedback', ['user_id', 'is_consumed', 'feedback_date'], unique=False)
+        batch_op.create_index('ix_recommendations_user_rating', ['user_id', 'rating'], unique=False)
+
+    with op.batch_alter_table('diet_goals', schema=None) as batch_op:
+        batch_op.create_index('ix_diet_goals_user_status_created', ['user_id', 'status', 'created_at'], unique=False)
+
+    with op.batch_alter_table('food_preferences', schema=None) as batch_op:
+        batch_op.create_index('ix_food_preferences_user_active', ['user_id', 'is_active'], unique=False)
+
+    with op.batch_alter_table('weight_progress', schema=None) as batch_op:
+        batch_op.create_index('ix_weight_progress_user_date', ['user_id', 'date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('weight_progress', schema=None) as batch_op:
+        batch_op.drop_index('ix_weight_progress_user_date')
+
+    with op.batch_alter_table('food_preferences', schema=None) as batch_op:
+        batch_op.drop_index('ix_food_preferences_user_active')
+
+    with op.batch_alter_table('diet_goals', schema=None) as batch_op:
+        batch_op.drop_index('ix_diet_goals_user_status_created')
+
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.drop_index('ix_recommendations_user_rating')
+        batch_op.drop_index('ix_recommendations_user_consumed_feedback')
+        batch_op.drop_index('ix_recommendations_user_date')
@@ -0,0 +1,45 @@
+"""Add consumed_date to recommendations for sargable progress queries
+
+Revision ID: 9e1f4b7c2d58
+Revises: 5d0c7e91a2f3
+Create Date: 2026-10-17 16:41:09.734120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e1f4b7c2d58'
+down_revision = '5d0c7e91a2f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('consumed_date', sa.Date(), nullable=True))
+
+    # Isi dari data lama: tanggal feedback untuk makanan yang sudah dikonsumsi
+    recommendations = sa.table(
+        'recommendations',
+        sa.column('is_consumed', sa.Boolean),
+        sa.column('feedback_date', sa.DateTime),
+        sa.column('consumed_date', sa.Date)
+    )
+    op.execute(
+        recommendations.update()
+        .where(recommendations.c.is_consumed == sa.true(), recommendations.c.feedback_date.isnot(None))
+        .values(consumed_date=sa.func.date(recommendations.c.feedback_date))
+    )
+
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.create_index('ix_recommendations_user_consumed', ['user_id', 'consumed_date', 'food_id'], unique=False)
+        batch_op.drop_index('ix_recommendations_user_consumed_feedback')
+
+
+def downgrade():
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.create_index('ix_recommendations_user_consumed_feedback', ['user_id', 'is_consumed', 'feedback_date'], unique=False)
+        batch_op.drop_index('ix_recommendations_user_consumed')
+        batch_op.drop_column('consumed_date')
@@ -0,0 +1,65 @@
+"""Add daily nutrition rollup table
+
+Revision ID: c47a9d2e6b13
+Revises: 9e1f4b7c2d58
+Create Date: 2026-10-17 18:22:51.406377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47a9d2e6b13'
+down_revision = '9e1f4b7c2d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_nutrition_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('kcal', sa.Float(), nullable=False),
+    sa.Column('protein', sa.Float(), nullable=False),
+    sa.Column('carbs', sa.Float(), nullable=False),
+    sa.Column('fat', sa.Float(), nullable=False),
+    sa.Column('fiber', sa.Float(), nullable=False),
+    sa.Column('sodium', sa.Float(), nullable=False),
+    sa.Column('items', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'date')
+    )
+
+    # Isi dari konsumsi yang sudah ada (sama dengan `flask backfill-nutrition-rollup`)
+    recommendations = sa.table(
+        'recommendations',
+        sa.column('user_id', sa.Integer),
+        sa.column('food_id', sa.Integer),
+        sa.column('consumed_date', sa.Date)
+    )
+    foods = sa.table(
+        'foods',
+        sa.column('id', sa.Integer),
+        *[sa.column(name, sa.Float) for name in ('caloric_value', 'protein', 'carbohydrates', 'fat', 'dietary_fiber', 'sodium')]
+    )
+    rollup = sa.table(
+        'daily_nutrition_rollup',
+        *[sa.column(name) for name in ('user_id', 'date', 'kcal', 'protein', 'carbs', 'fat', 'fiber', 'sodium', 'items')]
+    )
+    source = sa.select(
+        recommendations.c.user_id,
+        recommendations.c.consumed_date,
+        *[sa.func.coalesce(sa.func.sum(foods.c[name]), 0.0)
+          for name in ('caloric_value', 'protein', 'carbohydrates', 'fat', 'dietary_fiber', 'sodium')],
+        sa.func.count()
+    ).select_from(
+        recommendations.join(foods, recommendations.c.food_id == foods.c.id)
+    ).where(
+        recommendations.c.consumed_date.isnot(None)
+    ).group_by(recommendations.c.user_id, recommendations.c.consumed_date)
+    op.execute(rollup.insert().from_select(list(rollup.c.keys()), source))
+
+
+def downgrade():
+    op.drop_table('daily_nutrition_rollup')